@@ -0,0 +1,175 @@
+"""
+In-process fake of the Docker Engine API used by the benchmarks.
+
+Only the endpoints the exporter calls are implemented. Responses are
+generated once per container and served from memory, so the engine's own
+cost stays small next to the exporter under test. Calls are counted per
+endpoint and exposed at ``GET /_bench/calls`` (``DELETE`` resets them).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import Counter
+from dataclasses import dataclass
+
+from aiohttp import web
+
+API_VERSION = "1.43"
+
+
+@dataclass(frozen=True)
+class EngineConfig:
+    containers: int
+    label_bytes: int = 64
+    extra_labels: int = 4
+    latency_seconds: float = 0.0
+
+
+def _container(i: int, cfg: EngineConfig) -> tuple[dict, dict]:
+    """
+    Builds the list entry and inspect payload of the i-th fake container.
+
+    Every 10th container is unhealthy, every 10th (offset 1) has no
+    healthcheck, every 25th (offset 2) exited with code 1 and the rest are
+    healthy.
+    """
+    cid = f"{i:064x}"
+    name = f"bench-{i}"
+    image = f"registry.local/team-{i % 50}/app:{i % 7}"
+    labels = {
+        "com.docker.compose.project": f"project-{i % 40}",
+        "com.docker.compose.service": f"service-{i % 200}",
+        "monitor": "true" if i % 2 == 0 else "false",
+    }
+    filler = "x" * cfg.label_bytes
+    for k in range(cfg.extra_labels):
+        labels[f"bench.label.{k}"] = filler
+
+    health: str | None = "healthy"
+    state = {"Status": "running", "Running": True, "ExitCode": 0, "RestartCount": 0}
+    status = "Up 2 hours"
+    if i % 10 == 0:
+        health = "unhealthy"
+    elif i % 10 == 1:
+        health = None
+    elif i % 25 == 2:
+        health = None
+        state = {"Status": "exited", "Running": False, "ExitCode": 1, "RestartCount": 3}
+        status = "Exited (1) 5 minutes ago"
+    if health is not None:
+        status = f"{status} ({health})"
+        state["Health"] = {
+            "Status": health,
+            "FailingStreak": 0 if health == "healthy" else 3,
+            "Log": [
+                {
+                    "Start": "2024-01-01T00:00:00.000000000Z",
+                    "End": "2024-01-01T00:00:00.120000000Z",
+                    "ExitCode": 0 if health == "healthy" else 1,
+                    "Output": "",
+                }
+            ],
+        }
+
+    entry = {
+        "Id": cid,
+        "Names": [f"/{name}"],
+        "Image": image,
+        "ImageID": f"sha256:{i % 50:064x}",
+        "Command": "/entrypoint.sh",
+        "Created": 1700000000 + i,
+        "State": state["Status"],
+        "Status": status,
+        "Labels": labels,
+    }
+    info = {
+        "Id": cid,
+        "Name": f"/{name}",
+        "Created": "2024-01-01T00:00:00.000000000Z",
+        "RestartCount": state["RestartCount"],
+        "Config": {"Image": image, "Labels": labels},
+        "State": {
+            **state,
+            "OOMKilled": False,
+            "StartedAt": "2024-01-01T00:00:00.000000000Z",
+            "FinishedAt": "0001-01-01T00:00:00Z",
+        },
+    }
+    return entry, info
+
+
+class FakeEngine:
+    def __init__(self, cfg: EngineConfig) -> None:
+        self.cfg = cfg
+        self.calls: Counter[str] = Counter()
+        self._entries: list[dict] = []
+        self._inspect: dict[str, bytes] = {}
+        for i in range(cfg.containers):
+            entry, info = _container(i, cfg)
+            self._entries.append(entry)
+            self._inspect[entry["Id"]] = json.dumps(info).encode()
+        self._list_all = json.dumps(self._entries).encode()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/version", self._version)
+        app.router.add_get("/{ver}/containers/json", self._list)
+        app.router.add_get("/{ver}/containers/{id}/json", self._show)
+        app.router.add_get("/_bench/calls", self._get_calls)
+        app.router.add_delete("/_bench/calls", self._reset_calls)
+        return app
+
+    async def _delay(self) -> None:
+        if self.cfg.latency_seconds:
+            await asyncio.sleep(self.cfg.latency_seconds)
+
+    async def _version(self, request: web.Request) -> web.Response:
+        self.calls["version"] += 1
+        return web.json_response({"ApiVersion": API_VERSION, "Version": "bench"})
+
+    async def _list(self, request: web.Request) -> web.Response:
+        self.calls["containers_list"] += 1
+        await self._delay()
+        filters = json.loads(request.query.get("filters", "{}") or "{}")
+        wanted = filters.get("label") or []
+        if not wanted:
+            return web.Response(body=self._list_all, content_type="application/json")
+        out = []
+        for entry in self._entries:
+            labels = entry["Labels"]
+            ok = True
+            for expr in wanted:
+                key, sep, value = expr.partition("=")
+                if key not in labels or (sep and labels[key] != value):
+                    ok = False
+                    break
+            if ok:
+                out.append(entry)
+        return web.json_response(out)
+
+    async def _show(self, request: web.Request) -> web.Response:
+        self.calls["containers_inspect"] += 1
+        await self._delay()
+        body = self._inspect.get(request.match_info["id"])
+        if body is None:
+            return web.json_response({"message": "No such container"}, status=404)
+        return web.Response(body=body, content_type="application/json")
+
+    async def _get_calls(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.calls))
+
+    async def _reset_calls(self, request: web.Request) -> web.Response:
+        self.calls.clear()
+        return web.json_response({})
+
+
+def serve(socket_path: str, cfg: EngineConfig) -> None:
+    """
+    Runs the fake engine on a unix socket until the process is terminated.
+
+    :param socket_path: The unix socket path to listen on.
+    :param cfg: The engine configuration.
+    """
+    web.run_app(FakeEngine(cfg).app(), path=socket_path, print=None, handle_signals=True)
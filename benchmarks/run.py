@@ -0,0 +1,328 @@
+"""
+Benchmarks for collection, rendering and the /metrics route.
+
+Each case starts the fake Docker Engine (`benchmarks.fake_engine`) on a unix
+socket in its own process and measures the exporter in a second, fresh
+process, so peak RSS belongs to the exporter alone. Results are written as
+JSON:
+
+    python -m benchmarks.run --containers 100 1000 10000 --output bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any
+
+from benchmarks.fake_engine import EngineConfig, serve
+
+DEFAULT_CONTAINERS = (100, 1000, 10000, 50000)
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    """
+    Summarizes latency samples.
+
+    :param samples: The samples in seconds.
+    :return: min, p50, p90, p99 and max of the samples.
+    """
+    if len(samples) < 2:
+        v = samples[0] if samples else 0.0
+        return {"min": v, "p50": v, "p90": v, "p99": v, "max": v}
+    q = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"min": min(samples), "p50": q[49], "p90": q[89], "p99": q[98], "max": max(samples)}
+
+
+def _peak_rss_bytes() -> int:
+    """
+    Returns the peak resident set size of the current process.
+
+    Reads ``VmHWM`` from ``/proc/self/status`` where available: ``ru_maxrss``
+    survives exec, so in a spawn-started worker it may report the parent's
+    high-water mark instead of the worker's own.
+
+    :return: The peak RSS in bytes.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+async def _asgi_get(app: Any, path: str, headers: list[tuple[bytes, bytes]]) -> tuple[int, bytes]:
+    """
+    Sends a GET request through the ASGI app without a network listener.
+
+    :param app: The ASGI application.
+    :param path: The request path.
+    :param headers: The request headers.
+    :return: The response status and body.
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 0),
+    }
+    status = 0
+    body: list[bytes] = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(body)
+
+
+async def _measure(socket_path: str, case: dict) -> dict:
+    """
+    Measures one case against a running fake engine.
+
+    :param socket_path: The unix socket of the fake engine.
+    :param case: The case parameters.
+    :return: The measurements.
+    """
+    import aiohttp
+
+    os.environ.update(
+        {
+            "DOCKER_HOST": f"unix://{socket_path}",
+            "LISTEN": "127.0.0.1:9102",
+            "INSTANCE_NAME": "bench",
+            "SERVICES_IGNORE_LIST": "none",
+            "COLLECT_MODE": case["collect_mode"],
+            "MAX_CONCURRENCY": str(case["max_concurrency"]),
+            "INSPECT_CACHE_SIZE": str(case["inspect_cache_size"]),
+        }
+    )
+    if case.get("include_label"):
+        os.environ["INCLUDE_LABEL"] = case["include_label"]
+
+    t0 = time.perf_counter()
+    import docker_healthcheck_exporter.app as app_module
+    from docker_healthcheck_exporter.metrics import render_container_metrics
+
+    import_seconds = time.perf_counter() - t0
+    state = app_module.state
+
+    connector = aiohttp.UnixConnector(path=socket_path)
+    async with aiohttp.ClientSession(connector=connector) as bench:
+
+        async def calls() -> dict[str, int]:
+            async with bench.get("http://engine/_bench/calls") as resp:
+                return await resp.json()
+
+        await state.collector.start()
+        refreshes = []
+        try:
+            for _ in range(case["refreshes"]):
+                await bench.delete("http://engine/_bench/calls")
+                t0 = time.perf_counter()
+                ok = await state._refresh()
+                seconds = time.perf_counter() - t0
+                refreshes.append(
+                    {
+                        "ok": ok,
+                        "seconds": seconds,
+                        "containers": len(state.snapshot),
+                        "docker_calls": await calls(),
+                    }
+                )
+        finally:
+            await state.collector.stop()
+
+    render = []
+    for _ in range(3):
+        t0 = time.perf_counter()
+        text = render_container_metrics(instance_name="bench", snapshot=state.snapshot)
+        render.append(time.perf_counter() - t0)
+
+    scrapes: dict[str, Any] = {}
+    for encoding, headers in (("identity", []), ("gzip", [(b"accept-encoding", b"gzip")])):
+        latencies = []
+        size = 0
+        for _ in range(case["scrapes"]):
+            t0 = time.perf_counter()
+            status, body = await _asgi_get(app_module.app, "/metrics", headers)
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                raise RuntimeError(f"/metrics returned {status}")
+            size = len(body)
+        scrapes[encoding] = {"latency_seconds": _percentiles(latencies), "bytes": size}
+
+    return {
+        **case,
+        "import_seconds": import_seconds,
+        "refreshes": refreshes,
+        "refresh_seconds": _percentiles([r["seconds"] for r in refreshes]),
+        "phase_mean_seconds": {
+            phase: hist.sum / hist.count
+            for phase, hist in state.instruments.phases.items()
+            if hist.count
+        },
+        "render_seconds": min(render),
+        "render_bytes": len(text.encode()),
+        "scrape": scrapes,
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+
+
+def _worker(socket_path: str, case: dict, results: Any) -> None:
+    """
+    Process entry point that measures one case and reports the result.
+    """
+    try:
+        results.put(asyncio.run(_measure(socket_path, case)))
+    except BaseException as e:
+        results.put({**case, "error": repr(e)})
+
+
+def _wait_for_socket(path: str, timeout: float) -> None:
+    """
+    Waits until the fake engine listens on the unix socket.
+    """
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"fake engine did not start on {path}")
+        time.sleep(0.05)
+
+
+def run_case(
+    containers: int,
+    *,
+    label_bytes: int = 64,
+    extra_labels: int = 4,
+    latency_ms: float = 0.0,
+    refreshes: int = 3,
+    scrapes: int = 200,
+    collect_mode: str = "inspect",
+    max_concurrency: int = 20,
+    inspect_cache_size: int = 4096,
+    include_label: str | None = None,
+    timeout: float = 600.0,
+) -> dict:
+    """
+    Runs one benchmark case in fresh processes.
+
+    :return: The measurements, or the case with an ``error`` key.
+    """
+    cfg = EngineConfig(
+        containers=containers,
+        label_bytes=label_bytes,
+        extra_labels=extra_labels,
+        latency_seconds=latency_ms / 1000.0,
+    )
+    case = {
+        "containers": containers,
+        "label_bytes": label_bytes,
+        "extra_labels": extra_labels,
+        "latency_ms": latency_ms,
+        "refreshes": refreshes,
+        "scrapes": scrapes,
+        "collect_mode": collect_mode,
+        "max_concurrency": max_concurrency,
+        "inspect_cache_size": inspect_cache_size,
+        "include_label": include_label,
+    }
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="dhe-bench-") as tmp:
+        socket_path = os.path.join(tmp, "docker.sock")
+        engine = ctx.Process(target=serve, args=(socket_path, cfg), daemon=True)
+        engine.start()
+        try:
+            _wait_for_socket(socket_path, timeout)
+            results = ctx.Queue()
+            worker = ctx.Process(target=_worker, args=(socket_path, case, results))
+            worker.start()
+            try:
+                return results.get(timeout=timeout)
+            finally:
+                worker.join(timeout=10)
+                if worker.is_alive():
+                    worker.kill()
+        finally:
+            engine.terminate()
+            engine.join(timeout=10)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--containers", type=int, nargs="+", default=list(DEFAULT_CONTAINERS))
+    parser.add_argument("--label-bytes", type=int, default=64)
+    parser.add_argument("--extra-labels", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="per Docker API call")
+    parser.add_argument("--refreshes", type=int, default=3)
+    parser.add_argument("--scrapes", type=int, default=200)
+    parser.add_argument("--collect-mode", choices=("inspect", "list"), default="inspect")
+    parser.add_argument("--max-concurrency", type=int, default=20)
+    parser.add_argument("--inspect-cache-size", type=int, default=4096)
+    parser.add_argument("--include-label", default=None)
+    parser.add_argument("--output", default="-", help="JSON output path, - for stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    for n in args.containers:
+        print(f"benchmark: {n} containers", file=sys.stderr)
+        results.append(
+            run_case(
+                n,
+                label_bytes=args.label_bytes,
+                extra_labels=args.extra_labels,
+                latency_ms=args.latency_ms,
+                refreshes=args.refreshes,
+                scrapes=args.scrapes,
+                collect_mode=args.collect_mode,
+                max_concurrency=args.max_concurrency,
+                inspect_cache_size=args.inspect_cache_size,
+                include_label=args.include_label,
+            )
+        )
+
+    doc = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+        },
+        "results": results,
+    }
+    out = json.dumps(doc, indent=2)
+    if args.output == "-":
+        print(out)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(out + "\n")
+    return 1 if any("error" in r for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
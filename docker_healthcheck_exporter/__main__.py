@@ -1,20 +1,110 @@
 from __future__ import annotations
 
-import uvicorn
+import argparse
+import asyncio
+import sys
 
-from docker_healthcheck_exporter.app import app
 from docker_healthcheck_exporter.config import load_settings
 from docker_healthcheck_exporter.logger import configure_logging, get_logger
 
 logger = get_logger(__name__)
 
 
-def main() -> None:
+async def run_textfile_only() -> None:
+    """
+    Runs the refresh loop and writes METRICS_FILE until SIGINT or SIGTERM.
+
+    No HTTP server is started and no port is bound.
+
+    :return: None
+    """
+    from docker_healthcheck_exporter.state import ExporterState, wait_for_shutdown_signal
+
+    state = ExporterState()
+    await state.start()
+    try:
+        await wait_for_shutdown_signal()
+    finally:
+        await state.stop()
+
+
+async def run_once() -> bool:
+    """
+    Collects once and writes METRICS_FILE, or prints the metrics to stdout
+    if METRICS_FILE is not set.
+
+    :return: True if the collection succeeded, False otherwise.
+    """
+    from docker_healthcheck_exporter.state import ExporterState
+
+    state = ExporterState()
+    ok = await state.run_once()
+    if state.textfile is None:
+        sys.stdout.write(state.metrics_text())
+        sys.stdout.flush()
+    return ok
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="docker-healthcheck-exporter")
+    parser.add_argument(
+        "--server",
+        choices=("fastapi", "builtin"),
+        default=None,
+        help="HTTP server to use (default: HTTP_SERVER or fastapi)",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--textfile-only",
+        action="store_true",
+        help="refresh METRICS_FILE in the background without serving HTTP",
+    )
+    mode.add_argument(
+        "--once",
+        action="store_true",
+        help="collect once, write METRICS_FILE (or print to stdout) and exit",
+    )
+    args = parser.parse_args(argv)
+
     configure_logging()
     s = load_settings()
+    if args.textfile_only:
+        if not s.metrics_file:
+            parser.error("--textfile-only requires METRICS_FILE")
+        if s.refresh_mode == "scrape":
+            parser.error("--textfile-only cannot be used with REFRESH_MODE=scrape")
+        logger.info(f"Starting in textfile-only mode (metrics_file={s.metrics_file})")
+        asyncio.run(run_textfile_only())
+        return
+    if args.once:
+        if not asyncio.run(run_once()):
+            sys.exit(1)
+        return
+
+    if s.http_workers:
+        logger.info(
+            f"Starting a collector process and {s.http_workers} HTTP worker processes "
+            f"on {s.listen_host}:{s.listen_port} (metrics_file={s.metrics_file})"
+        )
+        from docker_healthcheck_exporter.workers import run_workers
+
+        sys.exit(run_workers(s))
+
+    server = args.server or s.http_server
     logger.info(
-        f"Starting server on {s.listen_host}:{s.listen_port} (metrics_file={s.metrics_file})"
+        f"Starting {server} server on {s.listen_host}:{s.listen_port} (metrics_file={s.metrics_file})"
     )
+    if server == "builtin":
+        from docker_healthcheck_exporter.server import serve
+
+        asyncio.run(serve(s.listen_host, s.listen_port))
+        return
+
+    # Imported here so the builtin server never loads the FastAPI stack
+    import uvicorn
+
+    from docker_healthcheck_exporter.app import app
+
     uvicorn.run(
         app,
         host=s.listen_host,
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+from docker_healthcheck_exporter.collector import ContainerStatus, ServiceStatus
+
+# Container counts of a group, indexed by ``status - ServiceStatus.CRIT``.
+Counts = list[int]
+
+_OFFSET = int(ServiceStatus.CRIT)
+
+
+def worst_status(counts: Counts) -> int:
+    """
+    Returns the worst status present in a group.
+
+    :param counts: The container counts of the group.
+    :return: The lowest `ServiceStatus` value with at least one container.
+    """
+    for i, n in enumerate(counts):
+        if n:
+            return i + _OFFSET
+    return int(ServiceStatus.HEALTHY)
+
+
+def _bump(groups: dict, key: tuple, index: int, delta: int) -> None:
+    """
+    Adds ``delta`` containers to one status of a group, dropping emptied groups.
+
+    :param groups: The groups of one dimension.
+    :param key: The group key.
+    :param index: The status index.
+    :param delta: 1 or -1.
+    :return: None
+    """
+    counts = groups.get(key)
+    if counts is None:
+        counts = groups[key] = [0] * len(ServiceStatus)
+    counts[index] += delta
+    if delta < 0 and not any(counts):
+        del groups[key]
+
+
+def _same_group(a: ContainerStatus, b: ContainerStatus) -> bool:
+    """
+    Checks whether two statuses count towards the same groups and status.
+
+    :param a: One status.
+    :param b: The other status.
+    :return: True if replacing ``a`` with ``b`` leaves every aggregate unchanged.
+    """
+    return (
+        a.status == b.status
+        and a.image == b.image
+        and a.compose_project == b.compose_project
+        and a.compose_service == b.compose_service
+        and a.docker_host == b.docker_host
+    )
+
+
+class Aggregates:
+    __slots__ = ("projects", "services", "images", "_members")
+
+    def __init__(self) -> None:
+        """
+        Initializes an Aggregates instance.
+
+        Counts containers by status per compose project, compose service and
+        image. The counts are updated incrementally as containers change,
+        appear or leave the snapshot, so exporting them costs one pass over
+        the groups rather than over the containers. Unchanged containers are
+        recognized by identity first (see `DockerCollector._reuse_unchanged`).
+
+        Containers without a compose project (service) are not counted in the
+        project (service) groups. Every group key starts with the container's
+        ``docker_host``, which is "" for a single daemon.
+
+        Attributes:
+            projects (dict[tuple[str, str], Counts]): Counts per ``(docker_host, project)``.
+            services (dict[tuple[str, str, str], Counts]): Counts per
+                ``(docker_host, project, service)``.
+            images (dict[tuple[str, str], Counts]): Counts per ``(docker_host, image)``.
+        """
+        self.projects: dict[tuple[str, str], Counts] = {}
+        self.services: dict[tuple[str, str, str], Counts] = {}
+        self.images: dict[tuple[str, str], Counts] = {}
+        self._members: dict[str, ContainerStatus] = {}
+
+    def _count(self, st: ContainerStatus, delta: int) -> None:
+        """
+        Adds a container to, or removes it from, its groups.
+
+        :param st: The container status.
+        :param delta: 1 to add, -1 to remove.
+        :return: None
+        """
+        i = st.status - _OFFSET
+        if st.compose_project:
+            _bump(self.projects, (st.docker_host, st.compose_project), i, delta)
+        if st.compose_service:
+            key = (st.docker_host, st.compose_project, st.compose_service)
+            _bump(self.services, key, i, delta)
+        _bump(self.images, (st.docker_host, st.image), i, delta)
+
+    def observe(self, key: str, status: ContainerStatus) -> bool:
+        """
+        Records the current status of one container.
+
+        :param key: The snapshot key of the container.
+        :param status: The current status.
+        :return: True if any aggregate changed.
+        """
+        prev = self._members.get(key)
+        self._members[key] = status
+        if prev is status or (prev is not None and _same_group(prev, status)):
+            return False
+        if prev is not None:
+            self._count(prev, -1)
+        self._count(status, 1)
+        return True
+
+    def remove(self, key: str) -> bool:
+        """
+        Removes a container that left the snapshot.
+
+        :param key: The snapshot key of the container.
+        :return: True if any aggregate changed.
+        """
+        prev = self._members.pop(key, None)
+        if prev is None:
+            return False
+        self._count(prev, -1)
+        return True
+
+    def update(self, snapshot: Mapping[str, ContainerStatus]) -> bool:
+        """
+        Applies a full snapshot.
+
+        Only containers whose record changed are recounted. Containers that
+        left the snapshot are looked for only when the snapshot does not
+        cover every counted container.
+
+        :param snapshot: The new snapshot.
+        :return: True if any aggregate changed.
+        """
+        changed = False
+        members = self._members
+        before = len(members)
+        kept = 0
+        for key, st in snapshot.items():
+            prev = members.get(key)
+            if prev is not None:
+                kept += 1
+                if prev is st:
+                    continue
+            changed = self.observe(key, st) or changed
+        if kept != before:
+            for key in [k for k in members if k not in snapshot]:
+                changed = self.remove(key) or changed
+        return changed
@@ -1,15 +1,43 @@
 from __future__ import annotations
 
 import asyncio
-from dataclasses import dataclass
+import os
+import re
+import ssl
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, replace
+from datetime import datetime
 from enum import IntEnum
 
 import aiodocker
+from aiodocker.containers import DockerContainer
+from aiodocker.exceptions import DockerError
 
+from docker_healthcheck_exporter.filters import compile_filter
+from docker_healthcheck_exporter.histogram import PROBE_BUCKETS, Histogram
+from docker_healthcheck_exporter.instruments import Instruments
+from docker_healthcheck_exporter.limiter import ConcurrencyLimiter
 from docker_healthcheck_exporter.logger import get_logger
+from docker_healthcheck_exporter.stats import ContainerStats, StatsSampler
 
 logger = get_logger(__name__)
 
+COLLECT_MODES = ("inspect", "list")
+
+# Container events that can change the exported status of a single container.
+EVENT_ACTIONS = (
+    "health_status",
+    "start",
+    "die",
+    "restart",
+    "destroy",
+    "rename",
+    "pause",
+    "unpause",
+)
+
 
 class ServiceStatus(IntEnum):
     CRIT = -2  # not running / unreachable
@@ -19,7 +47,7 @@ class ServiceStatus(IntEnum):
     HEALTHY = 2  # healthy
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ContainerStatus:
     name: str
     status: int
@@ -28,25 +56,24 @@ class ContainerStatus:
     image: str
     compose_project: str
     compose_service: str
-
-
-def _is_ignored(name: str, ignore_list: set[str]) -> bool:
-    """
-    Check if a container should be ignored based on its name and the ignore_list.
-
-    If "IGNORE_ALL" is in the ignore_list, all containers are ignored.
-    Otherwise, the function checks if the container's name is in the ignore_list.
-
-    Args:
-        name (str): The name of the container.
-        ignore_list (set[str]): A set of container names to ignore.
-
-    Returns:
-        bool: True if the container should be ignored, False otherwise.
-    """
-    if "IGNORE_ALL" in ignore_list:
-        return True
-    return name in ignore_list
+    # UNIX time since which the status could not be refreshed (0 = fresh)
+    stale_since: float = 0.0
+    # Docker endpoint alias when collecting from several daemons ("" = single daemon)
+    docker_host: str = ""
+    # Values of the projected container labels, in the configured order ("" = missing)
+    extra_labels: tuple[str, ...] = ()
+    # Runtime details from the inspect payload (None = not collected, e.g. list mode)
+    restart_count: int | None = None
+    oom_killed: bool | None = None
+    exit_code: int | None = None
+    started_at: float | None = None
+    # Latest resource stats sample, only with stats sampling enabled
+    stats: ContainerStats | None = None
+    # Health log details, only with health probe metrics enabled (None = not collected).
+    # health_probe is never mutated once set, so equality by identity tracks new probes.
+    health_failing_streak: int | None = None
+    health_exit_code: int | None = None
+    health_probe: Histogram | None = None
 
 
 def _parse_include_label(expr: str | None) -> tuple[str | None, str | None]:
@@ -71,12 +98,284 @@ def _parse_include_label(expr: str | None) -> tuple[str | None, str | None]:
     return expr.strip() or None, None
 
 
+# Marks a heartbeat timeout in `DockerCollector.events`.
+_IDLE = object()
+
+_EXIT_CODE_RE = re.compile(r"^Exited \((-?\d+)\)")
+_TIME_RE = re.compile(r"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)$")
+
+
+def _parse_time(value: object) -> float:
+    """
+    Parse a Docker RFC 3339 timestamp with up to nanosecond precision.
+
+    Args:
+        value (object): A timestamp such as "2024-01-01T00:00:00.123456789Z".
+
+    Returns:
+        float: The UNIX time, or 0.0 if the value is missing, unparsable or
+        Docker's zero time ("0001-01-01T00:00:00Z").
+    """
+    m = _TIME_RE.match(value) if isinstance(value, str) else None
+    if m is None or m.group(1).startswith("0001-"):
+        return 0.0
+    tz = "+00:00" if m.group(3) == "Z" else m.group(3)
+    ts = datetime.fromisoformat(m.group(1) + tz).timestamp()
+    return ts + float(f"0.{m.group(2)}") if m.group(2) else ts
+
+
+def _has_healthcheck(entry: dict) -> bool:
+    """
+    Check whether a list entry reports a container healthcheck.
+
+    Args:
+        entry (dict): A ``GET /containers/json`` entry.
+
+    Returns:
+        bool: True if the ``Status`` field carries a health suffix.
+    """
+    status = str(entry.get("Status") or "")
+    return "(health" in status or "(unhealthy)" in status
+
+
+def _inspect_status(state: dict) -> ServiceStatus | None:
+    """
+    Derive the service status from the ``State`` section of an inspect payload.
+
+    Args:
+        state (dict): The ``State`` object returned by ``GET /containers/{id}/json``.
+
+    Returns:
+        ServiceStatus | None: The derived status, or None for one-shot containers
+        that exited with code 0 and should not be reported.
+    """
+    status = state.get("Status", "")  # running/exited/restarting/paused...
+    exit_code = state.get("ExitCode")
+    running = bool(state.get("Running", False))
+    health = (state.get("Health", {}) or {}).get("Status")
+    restarting = bool(state.get("Restarting", False))
+
+    if status == "exited" and exit_code == 0:
+        return None
+
+    if status == "restarting" or restarting:
+        return ServiceStatus.FAIL
+    if not running:
+        return ServiceStatus.CRIT
+    if health is None:
+        return ServiceStatus.RUNNING
+    if health == "healthy":
+        return ServiceStatus.HEALTHY
+    if health == "unhealthy":
+        return ServiceStatus.UNHEALTHY
+    return ServiceStatus.FAIL
+
+
+def _list_exit_code(status: str) -> int | None:
+    """
+    Extract the exit code from a list ``Status`` string such as "Exited (1) 2 minutes ago".
+
+    Args:
+        status (str): The human readable ``Status`` field of a list entry.
+
+    Returns:
+        int | None: The exit code, or None if it cannot be parsed.
+    """
+    m = _EXIT_CODE_RE.match(status)
+    return int(m.group(1)) if m else None
+
+
+def _list_status(state: str, status: str) -> ServiceStatus | None:
+    """
+    Derive the service status from a ``GET /containers/json`` entry.
+
+    The mapping mirrors `_inspect_status`. Entries whose status cannot be
+    derived unambiguously (paused containers, unknown states, unparsable
+    exit codes) return None so the caller can fall back to inspect.
+
+    Args:
+        state (str): The ``State`` field of the list entry (running/exited/...).
+        status (str): The human readable ``Status`` field of the list entry.
+
+    Returns:
+        ServiceStatus | None: The derived status, or None if ambiguous.
+    """
+    if state == "restarting":
+        return ServiceStatus.FAIL
+    if state == "running":
+        if "(unhealthy)" in status:
+            return ServiceStatus.UNHEALTHY
+        if "(healthy)" in status:
+            return ServiceStatus.HEALTHY
+        if "(health: starting)" in status:
+            return ServiceStatus.FAIL
+        if "(" in status:
+            return None
+        return ServiceStatus.RUNNING
+    if state == "exited":
+        return ServiceStatus.CRIT if _list_exit_code(status) is not None else None
+    if state in ("created", "dead"):
+        return ServiceStatus.CRIT
+    return None
+
+
+def _list_name(entry: dict) -> str:
+    """
+    Return the primary container name from a list entry.
+
+    Legacy links add extra ``/parent/alias`` names; the primary name is the one
+    without a nested path.
+
+    Args:
+        entry (dict): A ``GET /containers/json`` entry.
+
+    Returns:
+        str: The container name without the leading slash, or "" if missing.
+    """
+    names = entry.get("Names") or []
+    for n in names:
+        n = n.lstrip("/")
+        if n and "/" not in n:
+            return n
+    return ""
+
+
+def _fingerprint(entry: dict) -> tuple:
+    """
+    Build a cheap fingerprint of a container from its list entry.
+
+    Everything that can change the derived `ContainerStatus` of an existing
+    container (state, health in the status string, name, image, labels) is
+    part of the fingerprint, so an unchanged fingerprint means the previous
+    inspect result can be reused.
+
+    Args:
+        entry (dict): A ``GET /containers/json`` entry.
+
+    Returns:
+        tuple: A hashable fingerprint.
+    """
+    labels = entry.get("Labels") or {}
+    return (
+        entry.get("State"),
+        entry.get("Status"),
+        entry.get("Created"),
+        tuple(entry.get("Names") or ()),
+        entry.get("Image"),
+        hash(frozenset(labels.items())),
+    )
+
+
+def _share(strings: dict[str, str] | None, value: str) -> str:
+    """
+    Returns the shared copy of a string, registering ``value`` if it is new.
+
+    :param strings: The shared strings, or None to share nothing.
+    :param value: The string.
+    :return: The shared string equal to ``value``.
+    """
+    return value if strings is None else strings.setdefault(value, value)
+
+
+def _make_status(
+    name: str,
+    st: ServiceStatus,
+    container_id: str,
+    image: str,
+    labels: dict,
+    projection: tuple[str, ...] = (),
+    strings: dict[str, str] | None = None,
+    **details,
+) -> ContainerStatus:
+    """
+    Build a `ContainerStatus` from already extracted container fields.
+
+    The image and label strings are looked up in ``strings``, so containers of
+    the same image, project or service share one string object, and so do
+    successive refreshes. Names are unique per container and not shared.
+
+    Args:
+        name (str): The container name.
+        st (ServiceStatus): The derived service status.
+        container_id (str): The full or short container id.
+        image (str): The configured image reference.
+        labels (dict): The container labels.
+        projection (tuple[str, ...], optional): The label keys copied to ``extra_labels``.
+            Defaults to ().
+        strings (dict[str, str] | None, optional): The shared strings, updated in place.
+            Defaults to None, which shares nothing.
+        **details: Optional `ContainerStatus` fields taken from the inspect payload.
+
+    Returns:
+        ContainerStatus: The container status record.
+    """
+    project = str(labels.get("com.docker.compose.project") or "")
+    service = str(labels.get("com.docker.compose.service") or "")
+    return ContainerStatus(
+        name=name,
+        status=int(st),
+        status_text=st.name,
+        container_id=container_id[:12],
+        image=_share(strings, image),
+        compose_project=_share(strings, project),
+        compose_service=_share(strings, service),
+        extra_labels=tuple(_share(strings, str(labels.get(k) or "")) for k in projection),
+        **details,
+    )
+
+
+def tls_context(tls_verify: str | None, cert_path: str | None) -> ssl.SSLContext | None:
+    """
+    Build a TLS context for tcp Docker endpoints from the Docker CLI settings.
+
+    Follows the Docker CLI conventions: ``ca.pem``, ``cert.pem`` and
+    ``key.pem`` in ``cert_path``, with server verification only if
+    ``tls_verify`` is "1".
+
+    Args:
+        tls_verify (str | None): The DOCKER_TLS_VERIFY value.
+        cert_path (str | None): The DOCKER_CERT_PATH value.
+
+    Returns:
+        ssl.SSLContext | None: The TLS context, or None if TLS is not configured.
+    """
+    verify = tls_verify == "1"
+    if not verify and not cert_path:
+        return None
+    if verify:
+        ctx = ssl.create_default_context(
+            cafile=os.path.join(cert_path, "ca.pem") if cert_path else None
+        )
+    else:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+    if cert_path:
+        ctx.load_cert_chain(os.path.join(cert_path, "cert.pem"), os.path.join(cert_path, "key.pem"))
+    return ctx
+
+
 class DockerCollector:
     def __init__(
         self,
         ignore_list: set[str],
         include_label: str | None,
         max_concurrency: int = 20,
+        collect_mode: str = "inspect",
+        inspect_cache_size: int = 4096,
+        inspect_timeout_seconds: float = 10.0,
+        adaptive_concurrency: bool = False,
+        latency_target_seconds: float = 0.25,
+        docker_url: str | None = None,
+        ssl_context: ssl.SSLContext | None = None,
+        limiter: ConcurrencyLimiter | None = None,
+        health_probe_metrics: bool = False,
+        stats_budget_calls: int = 0,
+        stats_budget_seconds: float = 2.0,
+        instruments: Instruments | None = None,
+        docker_host: str = "",
+        container_filter: str | None = None,
+        label_projection: tuple[str, ...] = (),
     ):
         """
         Initializes a DockerCollector instance.
@@ -85,17 +384,97 @@ class DockerCollector:
             ignore_list (set[str]): A set of container names to ignore.
             include_label (str | None): A label to filter containers by.
             max_concurrency (int, optional): The maximum number of concurrent API requests. Defaults to 20.
+            collect_mode (str, optional): "inspect" to inspect every container, or "list" to derive
+                the status from the list payload and inspect only ambiguous entries.
+                Defaults to "inspect".
+            inspect_cache_size (int, optional): The maximum number of inspect results cached by
+                container id. 0 disables the cache. Defaults to 4096.
+            inspect_timeout_seconds (float, optional): The timeout for a single inspect call.
+                Defaults to 10.
+            adaptive_concurrency (bool, optional): Whether to adapt the inspect concurrency to
+                inspect latency, with max_concurrency as the ceiling. Defaults to False.
+            latency_target_seconds (float, optional): Inspects slower than this reduce the
+                adaptive concurrency. Defaults to 0.25.
+            docker_url (str | None, optional): The Docker endpoint (unix://, tcp://, ...).
+                Defaults to None, which lets aiodocker use DOCKER_HOST or the local socket.
+            ssl_context (ssl.SSLContext | None, optional): The TLS context for tcp endpoints.
+                Defaults to None.
+            limiter (ConcurrencyLimiter | None, optional): A limiter shared with other
+                collectors, overriding the concurrency arguments. Defaults to None.
+            health_probe_metrics (bool, optional): Whether to collect healthcheck probe
+                durations, the failing streak and the last probe exit code from the health
+                log. Containers with a healthcheck are then inspected on every refresh,
+                bypassing the list fast path and the inspect cache. Defaults to False.
+            stats_budget_calls (int, optional): The maximum number of resource stats calls
+                per refresh. 0 disables stats sampling. Defaults to 0.
+            stats_budget_seconds (float, optional): The maximum time spent on stats calls
+                per refresh. Defaults to 2.
+            instruments (Instruments | None, optional): Phase timings and API call
+                counters shared with other components. Defaults to None.
+            docker_host (str, optional): The endpoint alias stamped on every status when
+                collecting from several daemons. Defaults to "".
+            container_filter (str | None, optional): Filter rules (see `compile_filter`)
+                combined with the ignore list and the include label. Defaults to None.
+            label_projection (tuple[str, ...], optional): The container label keys whose
+                values are kept in ``ContainerStatus.extra_labels``. Defaults to ().
 
         Attributes:
             ignore_list (set[str]): The set of container names to ignore.
             include_label_key (str | None): The key of the label to filter by.
             include_label_value (str | None): The value of the label to filter by.
+            filter (ContainerFilter): The compiled ignore list, include label and filter rules.
             max_concurrency (int): The maximum number of concurrent API requests.
+            collect_mode (str): The collection mode.
+            inspect_cache_size (int): The maximum number of cached inspect results.
+            cache_hits_total (int): The number of inspects saved by the cache.
+            cache_misses_total (int): The number of inspects done after a cache lookup.
+            inspect_timeout_seconds (float): The timeout for a single inspect call.
+            inspect_failures_total (int): The number of failed or timed out inspects.
+            last_inspect_failure (tuple[str, float] | None): The short container id and
+                UNIX time of the latest failed inspect.
+            limiter (ConcurrencyLimiter): The inspect concurrency limiter, shared by refreshes.
+            instruments (Instruments): The phase timings and API call counters.
+            docker_host (str): The endpoint alias stamped on every status.
+            label_projection (tuple[str, ...]): The projected container label keys.
             docker (aio.Docker | None): The aiODocker client instance.
         """
         self.ignore_list = ignore_list
         self.include_label_key, self.include_label_value = _parse_include_label(include_label)
+        self.filter = compile_filter(
+            container_filter, ignore_list, self.include_label_key, self.include_label_value
+        )
         self.max_concurrency = max(1, max_concurrency)
+        if collect_mode not in COLLECT_MODES:
+            raise ValueError(f"collect_mode must be one of {COLLECT_MODES}, got {collect_mode!r}")
+        self.collect_mode = collect_mode
+        self.inspect_cache_size = max(0, inspect_cache_size)
+        self.cache_hits_total = 0
+        self.cache_misses_total = 0
+        self._cache: OrderedDict[str, tuple[tuple, ContainerStatus | None]] = OrderedDict()
+        self.inspect_timeout_seconds = inspect_timeout_seconds
+        self.inspect_failures_total = 0
+        self.last_inspect_failure: tuple[str, float] | None = None
+        self._last_known: dict[str, ContainerStatus] = {}
+        # Image and label strings shared between statuses, pruned to the live set on each refresh
+        self._strings: dict[str, str] = {}
+        self.limiter = limiter or ConcurrencyLimiter(
+            self.max_concurrency,
+            adaptive=adaptive_concurrency,
+            latency_target_seconds=latency_target_seconds,
+        )
+        self.instruments = instruments or Instruments()
+        self.docker_url = docker_url
+        self.docker_host = docker_host
+        self.label_projection = label_projection
+        self.ssl_context = ssl_context
+        self.health_probe_metrics = health_probe_metrics
+        # Per full container id: Start time of the newest counted probe and its histogram
+        self._probes: dict[str, tuple[float, Histogram]] = {}
+        self.stats = (
+            StatsSampler(stats_budget_calls, stats_budget_seconds, self.instruments)
+            if stats_budget_calls > 0
+            else None
+        )
         self.docker: aiodocker.Docker | None = None
 
     async def start(self) -> None:
@@ -105,10 +484,17 @@ class DockerCollector:
         This method initializes the aiODocker client instance.
         The instance is stored in the `docker` attribute.
 
+        aiodocker switches ``tcp://`` endpoints to HTTPS only when it builds
+        the TLS context itself, so with an explicit `ssl_context` the scheme is
+        rewritten here; otherwise the API would be spoken in plain HTTP.
+
         :return: None
         """
-        logger.info("Starting Docker client")
-        self.docker = aiodocker.Docker()
+        url = self.docker_url
+        if self.ssl_context is not None and url and url.startswith("tcp://"):
+            url = "https://" + url[len("tcp://") :]
+        logger.info(f"Starting Docker client ({url or 'default endpoint'})")
+        self.docker = aiodocker.Docker(url=url, ssl_context=self.ssl_context)
 
     async def stop(self) -> None:
         """
@@ -124,25 +510,296 @@ class DockerCollector:
             await self.docker.close()
             self.docker = None
 
-    def _label_match(self, labels: dict) -> bool:
+    @property
+    def stats_failures_total(self) -> int:
+        """
+        Returns the number of failed or timed out stats calls.
+
+        :return: The counter, 0 if stats sampling is disabled.
+        """
+        return self.stats.failures_total if self.stats is not None else 0
+
+    async def ping(self) -> None:
+        """
+        Checks that the Docker daemon answers API calls.
+
+        Uses the cheap ``/version`` endpoint; raises if the call fails.
+
+        :return: None
+        """
+        if self.docker is None:
+            raise RuntimeError("DockerCollector not started")
+        await self.instruments.call("version", self.docker.version())
+
+    def _label_filters(self) -> dict[str, list[str]]:
         """
-        Checks if a container's labels match the configured include label.
+        Returns the label filters implied by the filter rules as a Docker API ``filters`` argument.
 
-        If no include label is configured, this method always returns True.
-        If the include label key is not present in the container's labels, this method returns False.
-        If the include label value is None, this method returns True if the key is present in the container's labels.
-        Otherwise, this method returns True if the value of the key matches the configured include label value.
+        The Docker ``label`` filter has the same semantics as the rules it is
+        derived from: "key" requires the key to be present, "key=value"
+        requires an exact value, and several filters must all match.
 
-        :param labels: The container's labels as a dictionary.
-        :return: Whether the container's labels match the configured include label.
+        :return: A ``{"label": [...]}`` mapping, or an empty dict if nothing can be pushed down.
         """
-        if not self.include_label_key:
+        if not self.filter.label_filters:
+            return {}
+        return {"label": list(self.filter.label_filters)}
+
+    def _skip_listed(self, entry: dict) -> bool:
+        """
+        Checks whether a container can be dropped from its list entry alone.
+
+        Containers rejected by the filter and one-shot containers that exited
+        with code 0 are dropped before any inspect is scheduled. Entries that
+        lack a field the filter reads are kept and decided after inspect; so
+        are image rules when the list reports the image id instead of the
+        configured reference.
+
+        :param entry: The ``GET /containers/json`` entry.
+        :return: True if the container must be skipped.
+        """
+        if entry.get("State") == "exited" and _list_exit_code(str(entry.get("Status"))) == 0:
             return True
-        if self.include_label_key not in labels:
+        fields = self.filter.fields
+        name = _list_name(entry)
+        labels = entry.get("Labels")
+        image = str(entry.get("Image") or "")
+        if (
+            ("name" in fields and not name)
+            or ("labels" in fields and not isinstance(labels, dict))
+            or ("image" in fields and (not image or image.startswith("sha256:")))
+        ):
             return False
-        if self.include_label_value is None:
-            return True
-        return str(labels.get(self.include_label_key)) == self.include_label_value
+        return not self.filter.accepts(name, image, labels or {})
+
+    def _from_list(self, entry: dict) -> ContainerStatus | None:
+        """
+        Resolve a container from its list entry without inspecting it.
+
+        The entry must already have passed `_skip_listed`. Entries it deferred
+        because a field the filter reads is missing are left to inspect.
+
+        :param entry: The ``GET /containers/json`` entry.
+        :return: A `ContainerStatus`, or None if the entry is ambiguous and the
+            container has to be inspected.
+        """
+        name = _list_name(entry)
+        if not name:
+            return None
+        labels = entry.get("Labels")
+        if not isinstance(labels, dict):
+            if "labels" in self.filter.fields:
+                return None
+            labels = {}
+        st = _list_status(str(entry.get("State") or ""), str(entry.get("Status") or ""))
+        image = str(entry.get("Image") or "")
+        # The list reports the image id when the tag has moved; inspect keeps
+        # the configured reference, so defer to it to keep labels stable.
+        if st is None or not image or image.startswith("sha256:"):
+            return None
+        return _make_status(
+            name,
+            st,
+            str(entry.get("Id") or ""),
+            image,
+            labels,
+            self.label_projection,
+            self._strings,
+            docker_host=self.docker_host,
+        )
+
+    def _from_inspect(self, info: dict) -> ContainerStatus | None:
+        """
+        Resolve a container from its inspect payload.
+
+        :param info: The ``GET /containers/{id}/json`` payload.
+        :return: A `ContainerStatus`, or None if the container must be skipped.
+        """
+        name = (info.get("Name") or "").lstrip("/")
+        if not name:
+            return None
+
+        config = info.get("Config", {}) or {}
+        labels = config.get("Labels", {}) or {}
+        if not self.filter.accepts(name, str(config.get("Image") or ""), labels):
+            return None
+
+        state = info.get("State", {}) or {}
+        st = _inspect_status(state)
+        if st is None:
+            return None
+
+        cid = str(info.get("Id") or "")
+        details: dict = {
+            "restart_count": int(info.get("RestartCount") or 0),
+            "oom_killed": bool(state.get("OOMKilled", False)),
+            "started_at": _parse_time(state.get("StartedAt")),
+        }
+        if isinstance(state.get("ExitCode"), int):
+            details["exit_code"] = state["ExitCode"]
+        health = state.get("Health")
+        if self.health_probe_metrics and isinstance(health, dict) and cid:
+            log = health.get("Log") or []
+            details["health_failing_streak"] = int(health.get("FailingStreak") or 0)
+            if log and isinstance(log[-1].get("ExitCode"), int):
+                details["health_exit_code"] = log[-1]["ExitCode"]
+            details["health_probe"] = self._observe_probes(cid, log)
+
+        details["docker_host"] = self.docker_host
+        image = str(config.get("Image") or "")
+        return _make_status(
+            name, st, cid, image, labels, self.label_projection, self._strings, **details
+        )
+
+    def _observe_probes(self, container_id: str, log: list) -> Histogram:
+        """
+        Adds the durations of new health log entries to the container's probe histogram.
+
+        Docker keeps only the last few probes in the log, so entries are
+        counted by their start time: anything not newer than the last counted
+        probe was already observed. The histogram is copied before it changes,
+        so statuses handed out earlier are never mutated.
+
+        :param container_id: The full container id.
+        :param log: The ``State.Health.Log`` entries.
+        :return: The container's probe histogram.
+        """
+        last, hist = self._probes.get(container_id, (0.0, None))
+        newest = last
+        fresh = []
+        for entry in log:
+            start = _parse_time(entry.get("Start"))
+            end = _parse_time(entry.get("End"))
+            if start > last and end >= start:
+                fresh.append(end - start)
+                newest = max(newest, start)
+        if hist is None or fresh:
+            hist = hist.copy() if hist is not None else Histogram(PROBE_BUCKETS)
+            for d in fresh:
+                hist.observe(d)
+        self._probes[container_id] = (newest, hist)
+        return hist
+
+    async def _show(self, container: DockerContainer) -> dict:
+        """
+        Inspects a container inside an inspect limiter slot.
+
+        Client errors (4xx), e.g. a container removed after the list call,
+        are raised only after the slot is released as a success: they say
+        nothing about daemon congestion and must not shrink the adaptive
+        limit.
+
+        The time spent waiting for the slot is recorded as the "inspect_wait"
+        phase.
+
+        :param container: The aiodocker container to inspect.
+        :return: The inspect payload.
+        """
+        t0 = time.perf_counter()
+        async with self.limiter.slot():
+            self.instruments.observe("inspect_wait", time.perf_counter() - t0)
+            try:
+                return await self.instruments.call(
+                    "containers/{id}/json",
+                    asyncio.wait_for(container.show(), timeout=self.inspect_timeout_seconds),
+                )
+            except DockerError as e:
+                if e.status >= 500:
+                    raise
+                client_error = e
+        raise client_error
+
+    async def inspect_one(self, container_id: str) -> ContainerStatus | None:
+        """
+        Inspects a single container.
+
+        Containers that no longer exist are reported as None, the same as
+        containers that are filtered out. Other failures, including timeouts,
+        are counted in `inspect_failures_total` and raised.
+
+        :param container_id: The full or short container id.
+        :return: A `ContainerStatus`, or None if the container is gone or skipped.
+        """
+        if self.docker is None:
+            raise RuntimeError("DockerCollector not started")
+        try:
+            info = await self._show(self.docker.containers.container(container_id))
+        except Exception as e:
+            if isinstance(e, DockerError) and e.status == 404:
+                return None
+            self.inspect_failures_total += 1
+            self.last_inspect_failure = (container_id[:12], time.time())
+            raise
+        st = self._from_inspect(info)
+        sample = self.stats.samples.get(st.container_id) if st and self.stats else None
+        return replace(st, stats=sample) if st is not None and sample is not None else st
+
+    async def events(
+        self, since: float | None = None, heartbeat: float | None = None
+    ) -> AsyncIterator[tuple[str, str] | None]:
+        """
+        Follows the Docker events stream for container status changes.
+
+        Yields ``(action, container_id)`` tuples for the actions listed in
+        `EVENT_ACTIONS`. Health events are reported as "health_status"
+        regardless of the new health value. If ``heartbeat`` is set, None is
+        yielded whenever no event arrived for that many seconds. A heartbeat
+        only means the stream is quiet; it cannot tell an idle stream from a
+        stalled connection, so the caller should probe the daemon (see `ping`).
+
+        The iterator ends when the daemon closes the stream.
+
+        aiodocker opens the stream in a background task, so the subscription
+        is counted as an API call once the daemon has answered it, or with
+        its error when opening it failed.
+
+        :param since: Replay events newer than this UNIX timestamp.
+        :param heartbeat: Idle timeout in seconds after which None is yielded.
+        :return: An async iterator of ``(action, container_id)`` tuples or None.
+        """
+        if self.docker is None:
+            raise RuntimeError("DockerCollector not started")
+
+        params: dict = {
+            "filters": {
+                "type": ["container"],
+                "event": list(EVENT_ACTIONS),
+                **self._label_filters(),
+            }
+        }
+        if since is not None:
+            params["since"] = int(since)
+        events = self.docker.events
+        subscriber = events.subscribe(**params)
+        established = False
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    event = _IDLE
+                if not established and (
+                    events.json_stream is not None or event not in (None, _IDLE)
+                ):
+                    established = True
+                    self.instruments.count("events", "200")
+                if event is _IDLE:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                action = str(event.get("Action") or event.get("status") or "")
+                action = action.split(":", 1)[0]
+                cid = str((event.get("Actor") or {}).get("ID") or event.get("id") or "")
+                if action in EVENT_ACTIONS and cid:
+                    yield action, cid
+        finally:
+            try:
+                await events.stop()
+            except Exception as e:
+                if not established:
+                    self.instruments.count_error("events", e)
+                raise
 
     async def collect(self) -> dict[str, ContainerStatus]:
         """
@@ -152,6 +809,20 @@ class DockerCollector:
         `REFRESH_INTERVAL_SECONDS` seconds. The loop collects the
         health status of all Docker containers and caches the results.
 
+        Label rules that can be pushed down (see `ContainerFilter`) are passed
+        to ``containers.list`` as a Docker API filter, and containers rejected
+        by the filter and one-shot containers are dropped from the list
+        payload before any inspect is scheduled.
+
+        In "list" mode the status is derived from the ``containers.list``
+        payload and only ambiguous entries are inspected, so a refresh
+        usually costs a single Docker API call.
+
+        Inspect failures are isolated per container: containers removed
+        after the list call are dropped, while containers whose inspect
+        fails or times out keep their last known status with `stale_since`
+        set. Only a failing list call fails the whole collection.
+
         The method returns a dictionary with container names as keys and
         `ContainerStatus` instances as values. The dictionary contains
         only containers that match the configured include label.
@@ -159,71 +830,172 @@ class DockerCollector:
         If the Docker collector is not started, this method raises a
         `RuntimeError`.
 
+        The "list", "inspect", "stats" and "build" phases are timed in
+        `instruments`.
+
         :return: A dictionary with container names as keys and
             `ContainerStatus` instances as values.
         """
         if self.docker is None:
             raise RuntimeError("DockerCollector not started")
 
-        containers = await self.docker.containers.list(all=True)
-
-        sem = asyncio.Semaphore(self.max_concurrency)
+        observe = self.instruments.observe
+        t0 = time.perf_counter()
+        filters = self._label_filters()
+        if filters:
+            listing = self.docker.containers.list(all=True, filters=filters)
+        else:
+            listing = self.docker.containers.list(all=True)
+        containers = await self.instruments.call("containers/json", listing)
+        t1 = time.perf_counter()
+        observe("list", t1 - t0)
 
-        async def _one(c) -> ContainerStatus | None:
-            async with sem:
-                info = await c.show()
-
-            name = (info.get("Name") or "").lstrip("/")
-            if not name or _is_ignored(name, self.ignore_list):
-                return None
-
-            config = info.get("Config", {}) or {}
-            labels = config.get("Labels", {}) or {}
-            if not self._label_match(labels):
-                return None
+        list_mode = self.collect_mode == "list"
 
-            state = info.get("State", {}) or {}
-            status = state.get("Status", "")  # running/exited/restarting/paused...
-            exit_code = state.get("ExitCode")
-            running = bool(state.get("Running", False))
-            health = (state.get("Health", {}) or {}).get("Status")
-            restarting = bool(state.get("Restarting", False))
+        use_cache = self.inspect_cache_size > 0
+        seen: set[str] = set()
 
-            if status == "exited" and exit_code == 0:
+        async def _one(c) -> ContainerStatus | None:
+            entry = getattr(c, "_container", None) or {}
+            if self._skip_listed(entry):
                 return None
-
-            if status == "restarting" or restarting:
-                st = ServiceStatus.FAIL
-            elif not running:
-                st = ServiceStatus.CRIT
-            elif health is None:
-                st = ServiceStatus.RUNNING
-            elif health == "healthy":
-                st = ServiceStatus.HEALTHY
-            elif health == "unhealthy":
-                st = ServiceStatus.UNHEALTHY
-            else:
-                st = ServiceStatus.FAIL
-
-            cid = (info.get("Id") or "")[:12]
-            image = str(config.get("Image") or "")
-            compose_project = str(labels.get("com.docker.compose.project") or "")
-            compose_service = str(labels.get("com.docker.compose.service") or "")
-
-            return ContainerStatus(
-                name=name,
-                status=int(st),
-                status_text=st.name,
-                container_id=cid,
-                image=image,
-                compose_project=compose_project,
-                compose_service=compose_service,
-            )
+            # The health log is only in the inspect payload and changes with every probe
+            probe = self.health_probe_metrics and _has_healthcheck(entry)
+            if list_mode and not probe:
+                resolved = self._from_list(entry)
+                if resolved is not None:
+                    return resolved
+
+            cid = str(entry.get("Id") or "") if use_cache and not probe else ""
+            if cid:
+                seen.add(cid)
+                fp = _fingerprint(entry)
+                cached = self._cache.get(cid)
+                if cached is not None and cached[0] == fp:
+                    self._cache.move_to_end(cid)
+                    self.cache_hits_total += 1
+                    return cached[1]
+                self.cache_misses_total += 1
+
+            try:
+                info = await self._show(c)
+            except Exception as e:
+                if isinstance(e, DockerError) and e.status == 404:
+                    return None
+                return self._stale(entry, e)
+            st = self._from_inspect(info)
+
+            if cid:
+                self._cache[cid] = (fp, st)
+                self._cache.move_to_end(cid)
+                while len(self._cache) > self.inspect_cache_size:
+                    self._cache.popitem(last=False)
+            return st
 
         results = await asyncio.gather(*(_one(c) for c in containers), return_exceptions=False)
+        t2 = time.perf_counter()
+        observe("inspect", t2 - t1)
+        if use_cache:
+            for cid in [k for k in self._cache if k not in seen]:
+                del self._cache[cid]
+        if self._probes:
+            listed = {
+                str((getattr(c, "_container", None) or {}).get("Id") or "") for c in containers
+            }
+            for cid in [k for k in self._probes if k not in listed]:
+                del self._probes[cid]
         out: dict[str, ContainerStatus] = {}
         for item in results:
             if item is None:
                 continue
             out[item.name] = item
+        t3 = time.perf_counter()
+        observe("build", t3 - t2)
+        if self.stats is not None:
+            await self._sample_stats(out)
+            observe("stats", time.perf_counter() - t3)
+        self._reuse_unchanged(out)
+        self._last_known = {st.container_id: st for st in out.values()}
+        self._prune_strings(out)
         return out
+
+    def _prune_strings(self, out: dict[str, ContainerStatus]) -> None:
+        """
+        Drops shared strings no current status refers to.
+
+        Without pruning, every image and label value ever seen would stay
+        referenced for the lifetime of the collector.
+
+        :param out: The collected statuses by name.
+        :return: None
+        """
+        live: dict[str, str] = {}
+        for st in out.values():
+            live[st.image] = st.image
+            live[st.compose_project] = st.compose_project
+            live[st.compose_service] = st.compose_service
+            for value in st.extra_labels:
+                live[value] = value
+        self._strings = live
+
+    def _reuse_unchanged(self, out: dict[str, ContainerStatus]) -> None:
+        """
+        Replaces statuses equal to the previous refresh with the previous records.
+
+        Unchanged containers then keep one long-lived record across refreshes,
+        and the fresh copies are freed right away instead of piling up until
+        the next full garbage collection.
+
+        :param out: The collected statuses by name, updated in place.
+        :return: None
+        """
+        last = self._last_known
+        if not last:
+            return
+        for name, st in out.items():
+            prev = last.get(st.container_id)
+            if prev is not None and prev is not st and prev == st:
+                out[name] = prev
+
+    async def _sample_stats(self, out: dict[str, ContainerStatus]) -> None:
+        """
+        Samples resource stats within the budget and attaches them to the statuses.
+
+        Only running containers are sampled; unhealthy and failing ones first.
+        Containers not sampled in this refresh keep their previous sample.
+
+        :param out: The collected statuses by name, updated in place.
+        :return: None
+        """
+        if self.stats is None or self.docker is None:
+            return
+        running = [
+            (st.container_id, st.status in (ServiceStatus.UNHEALTHY, ServiceStatus.FAIL))
+            for st in out.values()
+            if st.status != ServiceStatus.CRIT and not st.stale_since
+        ]
+        await self.stats.sample(self.docker, running)
+        for name, st in out.items():
+            sample = self.stats.samples.get(st.container_id)
+            if sample is not st.stats:
+                out[name] = replace(st, stats=sample)
+
+    def _stale(self, entry: dict, error: BaseException) -> ContainerStatus | None:
+        """
+        Returns the last known status of a container whose inspect failed.
+
+        :param entry: The ``GET /containers/json`` entry of the container.
+        :param error: The inspect error.
+        :return: The last known `ContainerStatus` marked stale, or None if the
+            container was never collected successfully.
+        """
+        self.inspect_failures_total += 1
+        cid = str(entry.get("Id") or "")[:12]
+        self.last_inspect_failure = (cid, time.time())
+        logger.warning(f"Failed to inspect container {cid or '?'}: {error!r}")
+        prev = self._last_known.get(cid) if cid else None
+        if prev is None:
+            return None
+        if prev.stale_since:
+            return prev
+        return replace(prev, stale_since=time.time())
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
 import os
+import re
 from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from docker_healthcheck_exporter.filters import compile_filter
 
 
 def _env(name: str, default: str | None = None) -> str | None:
@@ -48,11 +52,130 @@ def _parse_set_csv(value: str | None, default: set[str]) -> set[str]:
     return set(default) | set(parts)
 
 
+def _parse_bool(value: str | None, default: bool = False) -> bool:
+    """
+    Parses a boolean flag.
+
+    "1", "true", "yes" and "on" (case-insensitive) are true, anything else is false.
+    If the input value is None, returns the default.
+
+    :param value: Input value to parse
+    :param default: Default value to return if the input value is None
+    :return: Parsed flag
+    :rtype: bool
+    """
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_docker_hosts(value: str | None) -> tuple[tuple[str, str], ...]:
+    """
+    Parses a list of Docker endpoints from a comma-separated string.
+
+    Each entry is either a URL or ``alias=URL``. Without an alias the URL's
+    host:port is used, or the socket path for unix:// URLs.
+
+    :param value: Input value to parse
+    :return: Parsed ``(alias, url)`` pairs, empty if the input value is None or empty
+    :rtype: tuple[tuple[str, str], ...]
+    """
+    if not value:
+        return ()
+    out: list[tuple[str, str]] = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        alias, sep, url = part.partition("=")
+        if not sep or "://" in alias:
+            alias, url = "", part
+        url = url.strip()
+        if "://" not in url:
+            raise ValueError(f"DOCKER_HOSTS entry must be a URL like tcp://host:2376: {part}")
+        alias = alias.strip() or urlsplit(url).netloc or urlsplit(url).path
+        out.append((alias, url))
+    aliases = [a for a, _ in out]
+    if len(set(aliases)) != len(aliases):
+        raise ValueError("DOCKER_HOSTS aliases must be unique")
+    return tuple(out)
+
+
+# Labels of the per-container series; projected labels must not shadow them.
+RESERVED_LABELS = frozenset(
+    (
+        "instance",
+        "docker_host",
+        "name",
+        "container_id",
+        "image",
+        "compose_project",
+        "compose_service",
+        "status_text",
+        "from",
+        "to",
+        "le",
+    )
+)
+
+_LABEL_NAME_RE = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]*$")
+
+
+def _sanitize_label(key: str) -> str:
+    """
+    Derives a Prometheus label name from a Docker label key.
+
+    Characters other than letters, digits and underscores become underscores,
+    and the result is prefixed with ``label_``, e.g. ``com.example.team``
+    becomes ``label_com_example_team``.
+
+    :param key: The Docker label key
+    :return: The Prometheus label name
+    :rtype: str
+    """
+    return "label_" + re.sub(r"[^a-zA-Z0-9_]", "_", key)
+
+
+def _parse_label_map(value: str | None) -> tuple[tuple[str, str], ...]:
+    """
+    Parses a Docker label to Prometheus label mapping from a comma-separated string.
+
+    Each entry is either a Docker label key, exported under its sanitized name
+    (see `_sanitize_label`), or ``key=name`` with an explicit Prometheus label name.
+
+    :param value: Input value to parse
+    :return: Parsed ``(docker_label, prometheus_label)`` pairs, empty if the input value is None or empty
+    :rtype: tuple[tuple[str, str], ...]
+    """
+    if not value:
+        return ()
+    out: list[tuple[str, str]] = []
+    for part in value.split(","):
+        key, sep, name = (p.strip() for p in part.partition("="))
+        if not key:
+            if sep or name:
+                raise ValueError(f"CONTAINER_LABELS entry needs a Docker label key: {part.strip()}")
+            continue
+        name = name if sep else _sanitize_label(key)
+        if not _LABEL_NAME_RE.match(name) or name.startswith("__"):
+            raise ValueError(f"CONTAINER_LABELS name is not a valid Prometheus label: {name}")
+        if name in RESERVED_LABELS:
+            raise ValueError(f"CONTAINER_LABELS name {name} clashes with a built-in label")
+        out.append((key, name))
+    names = [n for _, n in out]
+    if len(set(names)) != len(names):
+        raise ValueError("CONTAINER_LABELS names must be unique")
+    return tuple(out)
+
+
 @dataclass(frozen=True)
 class Settings:
     # Network
     listen_host: str
     listen_port: int
+    http_server: str
+    http_workers: int
+    snapshot_shm_bytes: int
 
     # Identity
     instance_name: str
@@ -61,13 +184,36 @@ class Settings:
     refresh_interval_seconds: float
     services_ignore_list: set[str]
     include_label: str | None
+    container_filter: str | None
     max_concurrency: int
+    adaptive_concurrency: bool
+    inspect_latency_target_seconds: float
     metrics_file: str | None
+    metrics_file_fsync: str
+    metrics_file_max_age_seconds: float
+    collect_mode: str
+    inspect_cache_size: int
+    inspect_timeout_seconds: float
+    refresh_mode: str
+    events_resync_seconds: float
+    scrape_max_age_seconds: float
+    scrape_timeout_seconds: float
+    health_probe_metrics: bool
+    transitions_retention_seconds: float
+    stats_budget_calls: int
+    stats_budget_seconds: float
+
+    # Exposition
+    container_labels: tuple[tuple[str, str], ...]
+    max_container_series: int
+    container_info_series: bool
+    aggregate_metrics: bool
 
     # Docker
     docker_host: str | None
     docker_tls_verify: str | None
     docker_cert_path: str | None
+    docker_hosts: tuple[tuple[str, str], ...]
 
 
 def load_settings() -> Settings:
@@ -77,15 +223,46 @@ def load_settings() -> Settings:
     Environment variables used:
 
     - LISTEN: host and port to listen on, like 0.0.0.0:9102
+    - HTTP_SERVER: "fastapi" (FastAPI/uvicorn) or "builtin" (minimal asyncio server), defaults to fastapi
+    - HTTP_WORKERS: number of HTTP processes serving a separate collector process over shared memory
+      (0 runs everything in one process), defaults to 0
+    - SNAPSHOT_SHM_BYTES: size of the shared memory region used with HTTP_WORKERS, defaults to 32 MiB
     - INSTANCE_NAME: name of the instance, defaults to FQDN or hostname
     - SERVICES_IGNORE_LIST: comma-separated list of services to ignore, defaults to vmagent and health-exporter
     - REFRESH_INTERVAL_SECONDS: interval between snapshots in seconds, defaults to 5
     - INCLUDE_LABEL: label to include in metrics, defaults to None
+    - CONTAINER_FILTER: rules selecting the exported containers, e.g.
+      ``project not in (ci, tmp) and (label.tier = prod or name =~ "edge-.*")``, defaults to None
     - MAX_CONCURRENCY: maximum number of concurrent snapshot collection, defaults to 20
+    - ADAPTIVE_CONCURRENCY: adapt inspect concurrency to latency with MAX_CONCURRENCY as the ceiling, defaults to false
+    - INSPECT_LATENCY_TARGET_SECONDS: inspect latency above which adaptive concurrency backs off, defaults to 0.25
     - METRICS_FILE: path to write metrics to, defaults to None
+    - METRICS_FILE_FSYNC: "none", "file" or "dir" fsync policy for the metrics file, defaults to none
+    - METRICS_FILE_MAX_AGE_SECONDS: rewrite an unchanged metrics file at least this often, defaults to 60
+    - COLLECT_MODE: "inspect" (inspect every container) or "list" (derive status from the list call), defaults to inspect
+    - INSPECT_CACHE_SIZE: number of inspect results cached by container id (0 disables), defaults to 4096
+    - INSPECT_TIMEOUT_SECONDS: timeout for a single container inspect, defaults to 10
+    - REFRESH_MODE: "poll" (full refresh every interval), "events" (follow the Docker events stream)
+      or "scrape" (refresh when /metrics is requested), defaults to poll
+    - EVENTS_RESYNC_SECONDS: interval between full resyncs in events mode, defaults to 300
+    - SCRAPE_MAX_AGE_SECONDS: snapshot age below which a scrape is served without refreshing, defaults to 5
+    - SCRAPE_TIMEOUT_SECONDS: time a scrape waits for its refresh before the last snapshot is served, defaults to 10
+    - HEALTH_PROBE_METRICS: export probe durations, failing streak and last exit code from the health log, defaults to false
+    - TRANSITIONS_RETENTION_SECONDS: how long status transitions of removed containers are kept, defaults to 3600
+    - STATS_BUDGET_CALLS: resource stats calls per refresh (0 disables stats sampling), defaults to 0
+    - STATS_BUDGET_SECONDS: time spent on resource stats calls per refresh, defaults to 2
+    - CONTAINER_LABELS: comma-separated Docker labels (key or key=prometheus_name) added to the
+      health status series, defaults to None
+    - MAX_CONTAINER_SERIES: maximum number of containers exported per metric family (0 is unlimited),
+      defaults to 0
+    - CONTAINER_INFO_SERIES: move container_id and image to a separate docker_container_info series,
+      defaults to false
+    - AGGREGATE_METRICS: export container counts and the worst status per compose project, compose
+      service and image, defaults to false
     - DOCKER_HOST: optional Docker host to connect to
     - DOCKER_TLS_VERIFY: optional Docker TLS verification setting
     - DOCKER_CERT_PATH: optional Docker certificate path
+    - DOCKER_HOSTS: optional comma-separated list of Docker endpoints ([alias=]url) to collect from in one process
 
     Returns a Settings object with the loaded values.
     """
@@ -95,6 +272,10 @@ def load_settings() -> Settings:
     host, port_s = listen.rsplit(":", 1)
     port = int(port_s)
 
+    http_server = (_env("HTTP_SERVER", "fastapi") or "fastapi").lower()
+    if http_server not in ("fastapi", "builtin"):
+        raise ValueError("HTTP_SERVER must be 'fastapi' or 'builtin'")
+
     instance = _env("INSTANCE_NAME") or _env("FQDN") or os.uname().nodename
 
     default_ignore = {"vmagent", "health-exporter"}
@@ -102,19 +283,66 @@ def load_settings() -> Settings:
 
     refresh = float(_env("REFRESH_INTERVAL_SECONDS", "5"))
     include_label = _env("INCLUDE_LABEL")
+    container_filter = _env("CONTAINER_FILTER")
+    # Compile once here so that syntax errors fail at startup
+    compile_filter(container_filter)
     max_concurrency = int(_env("MAX_CONCURRENCY", "20"))
     metrics_file = _env("METRICS_FILE")
+    metrics_file_fsync = (_env("METRICS_FILE_FSYNC", "none") or "none").lower()
+    if metrics_file_fsync not in ("none", "file", "dir"):
+        raise ValueError("METRICS_FILE_FSYNC must be 'none', 'file' or 'dir'")
+    collect_mode = (_env("COLLECT_MODE", "inspect") or "inspect").lower()
+    if collect_mode not in ("inspect", "list"):
+        raise ValueError("COLLECT_MODE must be 'inspect' or 'list'")
+    refresh_mode = (_env("REFRESH_MODE", "poll") or "poll").lower()
+    if refresh_mode not in ("poll", "events", "scrape"):
+        raise ValueError("REFRESH_MODE must be 'poll', 'events' or 'scrape'")
+    docker_hosts = _parse_docker_hosts(_env("DOCKER_HOSTS"))
+    max_container_series = int(_env("MAX_CONTAINER_SERIES", "0"))
+    if max_container_series < 0:
+        raise ValueError("MAX_CONTAINER_SERIES must be 0 or more")
+    if docker_hosts and refresh_mode == "events":
+        raise ValueError("REFRESH_MODE=events is not supported with DOCKER_HOSTS")
+    http_workers = int(_env("HTTP_WORKERS", "0"))
+    if http_workers < 0:
+        raise ValueError("HTTP_WORKERS must be 0 or more")
+    if http_workers and refresh_mode == "scrape":
+        raise ValueError("REFRESH_MODE=scrape is not supported with HTTP_WORKERS")
 
     return Settings(
         listen_host=host,
         listen_port=port,
+        http_server=http_server,
+        http_workers=http_workers,
+        snapshot_shm_bytes=int(_env("SNAPSHOT_SHM_BYTES", str(32 * 1024 * 1024))),
         instance_name=instance,
         refresh_interval_seconds=refresh,
         services_ignore_list=ignore,
         include_label=include_label,
+        container_filter=container_filter,
         max_concurrency=max_concurrency,
+        adaptive_concurrency=_parse_bool(_env("ADAPTIVE_CONCURRENCY")),
+        inspect_latency_target_seconds=float(_env("INSPECT_LATENCY_TARGET_SECONDS", "0.25")),
         metrics_file=metrics_file,
+        metrics_file_fsync=metrics_file_fsync,
+        metrics_file_max_age_seconds=float(_env("METRICS_FILE_MAX_AGE_SECONDS", "60")),
+        collect_mode=collect_mode,
+        inspect_cache_size=int(_env("INSPECT_CACHE_SIZE", "4096")),
+        inspect_timeout_seconds=float(_env("INSPECT_TIMEOUT_SECONDS", "10")),
+        refresh_mode=refresh_mode,
+        events_resync_seconds=float(_env("EVENTS_RESYNC_SECONDS", "300")),
+        scrape_max_age_seconds=float(_env("SCRAPE_MAX_AGE_SECONDS", "5")),
+        scrape_timeout_seconds=float(_env("SCRAPE_TIMEOUT_SECONDS", "10")),
+        health_probe_metrics=_parse_bool(_env("HEALTH_PROBE_METRICS")),
+        transitions_retention_seconds=float(_env("TRANSITIONS_RETENTION_SECONDS", "3600")),
+        stats_budget_calls=int(_env("STATS_BUDGET_CALLS", "0")),
+        stats_budget_seconds=float(_env("STATS_BUDGET_SECONDS", "2")),
+        container_labels=_parse_label_map(_env("CONTAINER_LABELS")),
+        max_container_series=max_container_series,
+        container_info_series=_parse_bool(_env("CONTAINER_INFO_SERIES")),
+        aggregate_metrics=_parse_bool(_env("AGGREGATE_METRICS")),
         docker_host=_env("DOCKER_HOST"),
         docker_tls_verify=_env("DOCKER_TLS_VERIFY"),
         docker_cert_path=_env("DOCKER_CERT_PATH"),
+        docker_hosts=docker_hosts,
     )
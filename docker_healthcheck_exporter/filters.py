@@ -0,0 +1,471 @@
+from __future__ import annotations
+
+import fnmatch
+import re
+from collections.abc import Callable, Collection, Mapping
+from dataclasses import dataclass
+
+# Fields a rule can test, besides ``label.<key>``.
+FIELDS = ("name", "image", "project", "service")
+
+_FIELD_LABELS = {
+    "project": "com.docker.compose.project",
+    "service": "com.docker.compose.service",
+}
+
+_TOKEN_RE = re.compile(
+    r"""\s*(?:
+        (?P<op>=~|!~|!=|=|\(|\)|,)
+      | "(?P<str>(?:[^"\\]|\\.)*)"
+      | (?P<word>[^\s()=!~,"]+)
+    )""",
+    re.VERBOSE,
+)
+_KEYWORDS = ("and", "or", "not", "in")
+_GLOB_CHARS = frozenset("*?[")
+
+Match = Callable[[str, str, Mapping[str, str]], bool]
+
+
+@dataclass(frozen=True)
+class _Const:
+    value: bool
+
+
+@dataclass(frozen=True)
+class _Exists:
+    key: str
+
+
+@dataclass(frozen=True)
+class _Pred:
+    # "name", "image" or "label:<key>" (project and service are resolved to their label)
+    field: str
+    values: frozenset[str]
+    # Regular expressions; globs are translated when parsed
+    patterns: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class _Not:
+    node: object
+
+
+@dataclass(frozen=True)
+class _And:
+    nodes: tuple
+
+
+@dataclass(frozen=True)
+class _Or:
+    nodes: tuple
+
+
+class ContainerFilter:
+    __slots__ = ("accepts", "label_filters", "fields")
+
+    def __init__(self, accepts: Match, label_filters: tuple[str, ...], fields: frozenset[str]):
+        """
+        Initializes a ContainerFilter instance.
+
+        Use `compile_filter` to build one from a rule expression.
+
+        Args:
+            accepts (Match): The decision function.
+            label_filters (tuple[str, ...]): Docker ``label`` list filters implied by the rules.
+            fields (frozenset[str]): The container fields the rules read.
+
+        Attributes:
+            accepts (Match): Called as ``accepts(name, image, labels)``; True if the
+                container is exported.
+            label_filters (tuple[str, ...]): ``key`` or ``key=value`` filters every
+                accepted container satisfies, safe to push down to the Docker list
+                and events APIs. Empty if no rule can be pushed down.
+            fields (frozenset[str]): The subset of "name", "image" and "labels" that
+                `accepts` reads.
+        """
+        self.accepts = accepts
+        self.label_filters = label_filters
+        self.fields = fields
+
+
+def _tokenize(expr: str) -> list[tuple[str, str]]:
+    """
+    Splits a rule expression into ``(kind, text)`` tokens.
+
+    :param expr: The rule expression.
+    :return: The tokens; kind is "op", "str", "word" or "kw".
+    """
+    tokens: list[tuple[str, str]] = []
+    pos = 0
+    end = len(expr.rstrip())
+    while pos < end:
+        m = _TOKEN_RE.match(expr, pos)
+        if m is None or m.end() == pos:
+            raise ValueError(f"Invalid container filter at position {pos}: {expr[pos:]!r}")
+        pos = m.end()
+        if m.group("op") is not None:
+            tokens.append(("op", m.group("op")))
+        elif m.group("str") is not None:
+            tokens.append(("str", re.sub(r"\\(.)", r"\1", m.group("str"))))
+        elif m.group("word").lower() in _KEYWORDS:
+            tokens.append(("kw", m.group("word").lower()))
+        else:
+            tokens.append(("word", m.group("word")))
+    return tokens
+
+
+def _field(word: str) -> str:
+    """
+    Resolves a field name from a rule to its internal form.
+
+    :param word: "name", "image", "project", "service" or ``label.<key>``.
+    :return: "name", "image" or ``label:<key>``.
+    """
+    if word in ("name", "image"):
+        return word
+    if word in _FIELD_LABELS:
+        return f"label:{_FIELD_LABELS[word]}"
+    if word.startswith("label.") and len(word) > 6:
+        return f"label:{word[6:]}"
+    raise ValueError(
+        f"Unknown container filter field {word!r}, expected one of {FIELDS} or label.<key>"
+    )
+
+
+def _value_pred(field: str, value: str, quoted: bool) -> _Pred:
+    """
+    Builds the predicate for ``field = value``.
+
+    Unquoted values with ``*``, ``?`` or ``[`` are globs.
+
+    :param field: The internal field name.
+    :param value: The value.
+    :param quoted: Whether the value was quoted.
+    :return: The predicate.
+    """
+    if not quoted and _GLOB_CHARS.intersection(value):
+        return _Pred(field, frozenset(), (fnmatch.translate(value),))
+    return _Pred(field, frozenset((value,)))
+
+
+class _Parser:
+    def __init__(self, expr: str) -> None:
+        """
+        Initializes a _Parser instance.
+
+        Grammar, lowest precedence first::
+
+            expr := term ("or" term)*
+            term := factor ("and" factor)*
+            factor := "not" factor | "(" expr ")" | predicate
+            predicate := field [("=" | "!=" | "=~" | "!~") value | ["not"] "in" "(" value ("," value)* ")"]
+
+        Args:
+            expr (str): The rule expression.
+        """
+        self.tokens = _tokenize(expr)
+        self.pos = 0
+
+    def _peek(self) -> tuple[str, str] | None:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self, what: str) -> tuple[str, str]:
+        tok = self._peek()
+        if tok is None:
+            raise ValueError(f"Unexpected end of container filter, expected {what}")
+        self.pos += 1
+        return tok
+
+    def _accept(self, kind: str, text: str) -> bool:
+        if self._peek() == (kind, text):
+            self.pos += 1
+            return True
+        return False
+
+    def parse(self) -> object:
+        node = self._expr()
+        if self._peek() is not None:
+            raise ValueError(f"Unexpected {self._peek()[1]!r} in container filter")
+        return node
+
+    def _expr(self) -> object:
+        nodes = [self._term()]
+        while self._accept("kw", "or"):
+            nodes.append(self._term())
+        return nodes[0] if len(nodes) == 1 else _Or(tuple(nodes))
+
+    def _term(self) -> object:
+        nodes = [self._factor()]
+        while self._accept("kw", "and"):
+            nodes.append(self._factor())
+        return nodes[0] if len(nodes) == 1 else _And(tuple(nodes))
+
+    def _factor(self) -> object:
+        if self._accept("kw", "not"):
+            return _Not(self._factor())
+        if self._accept("op", "("):
+            node = self._expr()
+            if not self._accept("op", ")"):
+                raise ValueError("Missing ')' in container filter")
+            return node
+        return self._predicate()
+
+    def _value(self) -> tuple[str, bool]:
+        kind, text = self._next("a value")
+        if kind not in ("str", "word"):
+            raise ValueError(f"Expected a value in container filter, got {text!r}")
+        return text, kind == "str"
+
+    def _predicate(self) -> object:
+        kind, word = self._next("a field")
+        if kind != "word":
+            raise ValueError(f"Expected a field in container filter, got {word!r}")
+        field = _field(word)
+        negate = self._accept("kw", "not")
+        if negate or self._accept("kw", "in"):
+            if negate and not self._accept("kw", "in"):
+                raise ValueError("Expected 'in' after 'not' in container filter")
+            if not self._accept("op", "("):
+                raise ValueError("Expected '(' after 'in' in container filter")
+            preds = [_value_pred(field, *self._value())]
+            while self._accept("op", ","):
+                preds.append(_value_pred(field, *self._value()))
+            if not self._accept("op", ")"):
+                raise ValueError("Missing ')' in container filter")
+            node = _merge(preds)
+            return _Not(node) if negate else node
+        tok = self._peek()
+        if tok is None or tok[0] != "op" or tok[1] not in ("=", "!=", "=~", "!~"):
+            if not field.startswith("label:"):
+                raise ValueError(f"Expected an operator after {word!r} in container filter")
+            return _Exists(field[6:])
+        self.pos += 1
+        value, quoted = self._value()
+        if tok[1] in ("=~", "!~"):
+            try:
+                re.compile(value)
+            except re.error as e:
+                raise ValueError(
+                    f"Invalid regular expression {value!r} in container filter: {e}"
+                ) from e
+            node = _Pred(field, frozenset(), (value,))
+        else:
+            node = _value_pred(field, value, quoted)
+        return _Not(node) if tok[1].startswith("!") else node
+
+
+def _merge(preds: list[_Pred]) -> _Pred:
+    """
+    Merges predicates on one field into a single predicate matching any of them.
+
+    :param preds: Predicates on the same field.
+    :return: The merged predicate.
+    """
+    values: set[str] = set()
+    patterns: list[str] = []
+    for p in preds:
+        values |= p.values
+        patterns += [x for x in p.patterns if x not in patterns]
+    return _Pred(preds[0].field, frozenset(values), tuple(patterns))
+
+
+def _simplify(node: object) -> object:
+    """
+    Flattens nested AND/OR nodes, folds constants and merges predicates.
+
+    Positive predicates on the same field under OR, and negated ones under
+    AND, become one predicate: a set lookup plus one combined regex. Allow
+    and deny lists therefore cost the same however long they are.
+
+    :param node: The parsed node.
+    :return: The simplified node.
+    """
+    if isinstance(node, _Not):
+        inner = _simplify(node.node)
+        if isinstance(inner, _Const):
+            return _Const(not inner.value)
+        if isinstance(inner, _Not):
+            return inner.node
+        return _Not(inner)
+    if not isinstance(node, (_And, _Or)):
+        return node
+    is_and = isinstance(node, _And)
+    flat: list = []
+    for child in map(_simplify, node.nodes):
+        if isinstance(child, type(node)):
+            flat.extend(child.nodes)
+        elif isinstance(child, _Const):
+            if child.value != is_and:
+                return child
+        else:
+            flat.append(child)
+    by_field: dict[str, list[_Pred]] = {}
+    rest: list = []
+    for child in flat:
+        pred = child.node if is_and and isinstance(child, _Not) else child
+        if isinstance(pred, _Pred) and (child is not pred) == is_and:
+            by_field.setdefault(pred.field, []).append(pred)
+        else:
+            rest.append(child)
+    for preds in by_field.values():
+        merged = _merge(preds)
+        rest.append(_Not(merged) if is_and else merged)
+    if not rest:
+        return _Const(is_and)
+    if len(rest) == 1:
+        return rest[0]
+    return _And(tuple(rest)) if is_and else _Or(tuple(rest))
+
+
+def _getter(field: str) -> Callable[[str, str, Mapping[str, str]], str]:
+    """
+    Returns a function reading one field of a container.
+
+    :param field: The internal field name.
+    :return: The reader; missing labels read as "".
+    """
+    if field == "name":
+        return lambda name, image, labels: name
+    if field == "image":
+        return lambda name, image, labels: image
+    key = field[6:]
+    return lambda name, image, labels: labels.get(key) or ""
+
+
+def _compile(node: object) -> Match:
+    """
+    Compiles a simplified node into a decision function.
+
+    :param node: The simplified node.
+    :return: The decision function.
+    """
+    if isinstance(node, _Const):
+        value = node.value
+        return lambda name, image, labels: value
+    if isinstance(node, _Exists):
+        key = node.key
+        return lambda name, image, labels: key in labels
+    if isinstance(node, _Pred):
+        get = _getter(node.field)
+        values = node.values
+        if not node.patterns:
+            return lambda name, image, labels: get(name, image, labels) in values
+        fullmatch = re.compile("|".join(f"(?:{p})" for p in node.patterns)).fullmatch
+
+        def _pred(name: str, image: str, labels: Mapping[str, str]) -> bool:
+            v = get(name, image, labels)
+            return v in values or fullmatch(v) is not None
+
+        return _pred
+    if isinstance(node, _Not):
+        inner = _compile(node.node)
+        return lambda name, image, labels: not inner(name, image, labels)
+    matches = tuple(_compile(child) for child in node.nodes)
+    if isinstance(node, _And):
+
+        def _and(name: str, image: str, labels: Mapping[str, str]) -> bool:
+            for m in matches:
+                if not m(name, image, labels):
+                    return False
+            return True
+
+        return _and
+
+    def _or(name: str, image: str, labels: Mapping[str, str]) -> bool:
+        for m in matches:
+            if m(name, image, labels):
+                return True
+        return False
+
+    return _or
+
+
+def _pushdown(node: object) -> frozenset[str]:
+    """
+    Returns the Docker ``label`` filters every container accepted by a node satisfies.
+
+    Label existence and single-value label equality can be pushed down;
+    AND combines the filters of its operands and OR keeps only those shared
+    by all of them. Names, images, patterns and negations cannot be pushed
+    down, since the Docker filters have different matching rules.
+
+    :param node: The simplified node.
+    :return: The label filters, empty if the node cannot be pushed down.
+    """
+    if isinstance(node, _Exists):
+        return frozenset((node.key,))
+    if isinstance(node, _Pred):
+        if node.field.startswith("label:") and len(node.values) == 1 and not node.patterns:
+            (value,) = node.values
+            if value:
+                return frozenset((f"{node.field[6:]}={value}",))
+        return frozenset()
+    if isinstance(node, _And):
+        return frozenset().union(*map(_pushdown, node.nodes))
+    if isinstance(node, _Or):
+        return frozenset.intersection(*map(_pushdown, node.nodes))
+    return frozenset()
+
+
+def _fields(node: object) -> frozenset[str]:
+    """
+    Returns the container fields a node reads.
+
+    :param node: The simplified node.
+    :return: A subset of "name", "image" and "labels".
+    """
+    if isinstance(node, _Exists):
+        return frozenset(("labels",))
+    if isinstance(node, _Pred):
+        return frozenset(("labels",) if node.field.startswith("label:") else (node.field,))
+    if isinstance(node, _Not):
+        return _fields(node.node)
+    if isinstance(node, (_And, _Or)):
+        return frozenset().union(*map(_fields, node.nodes))
+    return frozenset()
+
+
+def compile_filter(
+    expr: str | None,
+    ignore_names: Collection[str] = (),
+    include_label_key: str | None = None,
+    include_label_value: str | None = None,
+) -> ContainerFilter:
+    """
+    Compiles container filter rules into a single decision function.
+
+    The rule language combines predicates with ``and``, ``or``, ``not`` and
+    parentheses::
+
+        name =~ "ci-runner-.*"            regular expression (full match)
+        image = registry.example.com/*    glob (unquoted value with * ? [)
+        project in (shop, billing)        allow list; "not in" for a deny list
+        service != migrate                also !~ for a non-matching regex
+        label.team = payments             label value; missing labels read as ""
+        label.monitor                     label exists
+
+    The ignore list and the include label are folded into the same function.
+    Predicates on one field combined by ``or`` (``and`` for negations) are
+    merged into a set lookup and one combined regex, so the cost per
+    container does not grow with the length of allow and deny lists.
+
+    :param expr: The rule expression, None or empty to accept every container.
+    :param ignore_names: Container names to drop; "IGNORE_ALL" drops every container.
+    :param include_label_key: A label key accepted containers must have.
+    :param include_label_value: The value the include label must have, None for any.
+    :return: The compiled filter.
+    """
+    nodes: list = []
+    if "IGNORE_ALL" in ignore_names:
+        nodes.append(_Const(False))
+    elif ignore_names:
+        nodes.append(_Not(_Pred("name", frozenset(ignore_names))))
+    if include_label_key and include_label_value is None:
+        nodes.append(_Exists(include_label_key))
+    elif include_label_key:
+        nodes.append(_Pred(f"label:{include_label_key}", frozenset((include_label_value,))))
+    if expr and expr.strip():
+        nodes.append(_Parser(expr).parse())
+    node = _simplify(_And(tuple(nodes)))
+    return ContainerFilter(_compile(node), tuple(sorted(_pushdown(node))), _fields(node))
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+
+# Default buckets for Docker API call latencies, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Default buckets for healthcheck probe durations, in seconds.
+PROBE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """
+        Initializes a Histogram instance.
+
+        Observations are counted per bucket; cumulative counts are only
+        computed when rendering, so `observe` stays a bisect and two additions.
+
+        Args:
+            buckets (tuple[float, ...], optional): Sorted upper bounds of the buckets,
+                without +Inf. Defaults to `LATENCY_BUCKETS`.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """
+        Records a single observation.
+
+        :param value: The observed value.
+        :return: None
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self) -> Histogram:
+        """
+        Returns an independent copy of the histogram.
+
+        :return: A new `Histogram` with the same buckets and counts.
+        """
+        h = Histogram(self.buckets)
+        h.counts = list(self.counts)
+        h.sum = self.sum
+        h.count = self.count
+        return h
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """
+        Returns the cumulative bucket counts with their ``le`` label values.
+
+        :return: A list of ``(le, count)`` tuples ending with ``+Inf``.
+        """
+        out: list[tuple[str, int]] = []
+        total = 0
+        for bound, n in zip(self.buckets, self.counts, strict=False):
+            total += n
+            out.append((repr(float(bound)), total))
+        out.append(("+Inf", self.count))
+        return out
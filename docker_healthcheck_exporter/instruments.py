@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable
+from typing import TypeVar
+
+from aiodocker.exceptions import DockerError
+
+from docker_healthcheck_exporter.histogram import Histogram
+
+T = TypeVar("T")
+
+# Phases of a refresh, in the order they are rendered.
+PHASES = (
+    "list",
+    "inspect",
+    "inspect_wait",
+    "stats",
+    "build",
+    "refresh",
+    "render",
+    "textfile_write",
+)
+
+
+class Instruments:
+    __slots__ = ("phases", "api_calls")
+
+    def __init__(self) -> None:
+        """
+        Initializes an Instruments instance.
+
+        Collects the duration of each refresh phase (see `PHASES`) and counts
+        Docker API calls by endpoint and outcome. Recording is a dict lookup
+        and a histogram observation, cheap enough for every inspect.
+
+        Attributes:
+            phases (dict[str, Histogram]): Durations per phase, in seconds.
+            api_calls (dict[tuple[str, str], int]): Calls per ``(endpoint, status)``,
+                where status is the HTTP status code, "timeout" or "error".
+        """
+        self.phases: dict[str, Histogram] = {phase: Histogram() for phase in PHASES}
+        self.api_calls: dict[tuple[str, str], int] = {}
+
+    def observe(self, phase: str, seconds: float) -> None:
+        """
+        Records the duration of one phase.
+
+        :param phase: The phase name, one of `PHASES`.
+        :param seconds: The duration in seconds.
+        :return: None
+        """
+        self.phases[phase].observe(seconds)
+
+    def count(self, endpoint: str, status: str) -> None:
+        """
+        Counts one Docker API call.
+
+        :param endpoint: The API endpoint template, e.g. ``containers/{id}/json``.
+        :param status: The HTTP status code, "timeout" or "error".
+        :return: None
+        """
+        key = (endpoint, status)
+        self.api_calls[key] = self.api_calls.get(key, 0) + 1
+
+    async def call(self, endpoint: str, aw: Awaitable[T]) -> T:
+        """
+        Awaits a Docker API call and counts its outcome.
+
+        Successful calls are counted as status "200"; cancelled calls are not
+        counted.
+
+        :param endpoint: The API endpoint template.
+        :param aw: The awaitable making the call.
+        :return: The result of the call.
+        """
+        try:
+            result = await aw
+        except Exception as e:
+            self.count_error(endpoint, e)
+            raise
+        self.count(endpoint, "200")
+        return result
+
+    def count_error(self, endpoint: str, error: Exception) -> None:
+        """
+        Counts one failed Docker API call by the exception it raised.
+
+        :param endpoint: The API endpoint template.
+        :param error: The exception.
+        :return: None
+        """
+        if isinstance(error, DockerError):
+            self.count(endpoint, str(error.status))
+        elif isinstance(error, asyncio.TimeoutError):
+            self.count(endpoint, "timeout")
+        else:
+            self.count(endpoint, "error")
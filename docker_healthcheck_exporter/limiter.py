@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from docker_healthcheck_exporter.histogram import Histogram
+
+
+class ConcurrencyLimiter:
+    def __init__(
+        self,
+        max_limit: int,
+        adaptive: bool = False,
+        latency_target_seconds: float = 0.25,
+        min_limit: int = 1,
+    ) -> None:
+        """
+        Initializes a ConcurrencyLimiter instance.
+
+        Without ``adaptive`` the limiter behaves like an `asyncio.Semaphore`
+        of size ``max_limit``. With ``adaptive`` the limit follows AIMD on
+        call latency: it starts at ``min_limit``, grows by one per success
+        while no congestion was seen (slow start) and then by one per window
+        of ``limit`` successes, and is halved when a call fails or exceeds
+        ``latency_target_seconds``. ``max_limit`` is always the ceiling.
+
+        Args:
+            max_limit (int): The maximum number of concurrent calls.
+            adaptive (bool, optional): Whether to adapt the limit to latency. Defaults to False.
+            latency_target_seconds (float, optional): Calls slower than this count as
+                congestion. Defaults to 0.25.
+            min_limit (int, optional): The lower bound of the adaptive limit. Defaults to 1.
+
+        Attributes:
+            latency (Histogram): Latency of the calls made through `slot`.
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.adaptive = adaptive
+        self.latency_target_seconds = latency_target_seconds
+        self.latency = Histogram()
+
+        self._limit = float(self.min_limit if adaptive else self.max_limit)
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def limit(self) -> int:
+        """
+        Returns the current concurrency limit.
+
+        :return: The number of calls allowed in flight.
+        """
+        return int(self._limit)
+
+    async def acquire(self) -> None:
+        """
+        Waits until a call slot is free and takes it.
+
+        :return: None
+        """
+        while self._in_flight >= self.limit:
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut in self._waiters:
+                    self._waiters.remove(fut)
+                elif fut.done() and not fut.cancelled():
+                    self._wake()
+                raise
+        self._in_flight += 1
+
+    def release(self, latency: float, failed: bool = False) -> None:
+        """
+        Frees a call slot and records the call outcome.
+
+        :param latency: The call latency in seconds.
+        :param failed: Whether the call failed.
+        :return: None
+        """
+        self._in_flight -= 1
+        self.latency.observe(latency)
+        if self.adaptive:
+            self._adjust(latency, failed)
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Holds a call slot for the duration of the block.
+
+        The block's wall time is recorded as the call latency, and an
+        exception raised by the block counts as a failed call.
+
+        :return: An async context manager.
+        """
+        await self.acquire()
+        t0 = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.release(time.perf_counter() - t0, failed)
+
+    def _adjust(self, latency: float, failed: bool) -> None:
+        """
+        Applies the AIMD rule for one finished call.
+
+        Decreases happen at most once per latency target, so a burst of slow
+        calls that were in flight together halves the limit only once.
+
+        :param latency: The call latency in seconds.
+        :param failed: Whether the call failed.
+        :return: None
+        """
+        if failed or latency > self.latency_target_seconds:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.latency_target_seconds:
+                self._limit = max(float(self.min_limit), self._limit / 2)
+                self._last_decrease = now
+            self._slow_start = False
+        elif self._slow_start:
+            self._limit = min(float(self.max_limit), self._limit + 1)
+        else:
+            self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+
+    def _wake(self) -> None:
+        """
+        Wakes as many waiters as there are free slots.
+
+        :return: None
+        """
+        free = self.limit - self._in_flight
+        while free > 0 and self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                free -= 1
@@ -1,8 +1,20 @@
 from __future__ import annotations
 
-from collections.abc import Mapping
+from collections.abc import Mapping, Sequence
 
-from docker_healthcheck_exporter.collector import ContainerStatus
+from docker_healthcheck_exporter.aggregates import Aggregates, worst_status
+from docker_healthcheck_exporter.collector import ContainerStatus, ServiceStatus
+from docker_healthcheck_exporter.histogram import Histogram
+from docker_healthcheck_exporter.transitions import TrackedContainer
+
+TEXT_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Terminates every OpenMetrics exposition.
+OPENMETRICS_EOF = b"# EOF\n"
+
+# An exemplar: its labels and the UNIX time of the increment it stands for.
+Exemplar = tuple[Mapping[str, str], float]
 
 
 def _esc(v: str) -> str:
@@ -14,6 +26,191 @@ def _esc(v: str) -> str:
     return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
 
 
+def _unit(name: str) -> str | None:
+    """
+    Returns the OpenMetrics unit of a metric family from its name suffix.
+
+    :param name: the metric family name, without ``_total``
+    :return: the unit, or None if the name has no unit suffix
+    """
+    for unit in ("seconds", "bytes"):
+        if name.endswith(f"_{unit}"):
+            return unit
+    return None
+
+
+class Exposition:
+    __slots__ = ("_families",)
+
+    def __init__(self) -> None:
+        """
+        Initializes an empty Exposition.
+
+        Sample lines are formatted once and shared by both output formats;
+        only the metadata lines and the OpenMetrics-only suffixes (exemplars
+        and ``_created`` samples) differ, so rendering a second format costs
+        one join instead of a second pass over the data.
+        """
+        self._families: list[tuple[str, str, str, list[str], dict[int, str]]] = []
+
+    def family(self, name: str, kind: str, help_text: str) -> None:
+        """
+        Starts a metric family; the following samples belong to it.
+
+        :param name: the metric name as used in the classic text format
+        :param kind: the metric type, e.g. "gauge", "counter" or "histogram"
+        :param help_text: the help text
+        :return: None
+        """
+        self._families.append((name, kind, help_text, [], {}))
+
+    def sample(self, line: str, openmetrics_suffix: str = "") -> None:
+        """
+        Adds a sample line to the current family.
+
+        :param line: the sample line without the trailing newline
+        :param openmetrics_suffix: text appended to the line in OpenMetrics only,
+            such as an exemplar or a following ``_created`` sample
+        :return: None
+        """
+        _, _, _, samples, suffixes = self._families[-1]
+        if openmetrics_suffix:
+            suffixes[len(samples)] = openmetrics_suffix
+        samples.append(line)
+
+    def extend(self, lines: Sequence[str]) -> None:
+        """
+        Adds several sample lines to the current family.
+
+        :param lines: the sample lines
+        :return: None
+        """
+        self._families[-1][3].extend(lines)
+
+    def render(self, openmetrics: bool = False) -> str:
+        """
+        Renders the exposition.
+
+        The OpenMetrics output has counter families named without ``_total``,
+        ``# UNIT`` lines for names ending in a unit, exemplars and ``_created``
+        samples, but no ``# EOF``, so several expositions can be concatenated.
+
+        :param openmetrics: True for the OpenMetrics format, False for the classic text format
+        :return: the rendered lines
+        """
+        out: list[str] = []
+        for name, kind, help_text, samples, suffixes in self._families:
+            if not openmetrics:
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} {kind}")
+                out.extend(samples)
+                continue
+            base = name[: -len("_total")] if kind == "counter" and name.endswith("_total") else name
+            out.append(f"# HELP {base} {help_text}")
+            out.append(f"# TYPE {base} {kind}")
+            unit = _unit(base)
+            if unit is not None:
+                out.append(f"# UNIT {base} {unit}")
+            if suffixes:
+                out.extend(line + suffixes.get(i, "") for i, line in enumerate(samples))
+            else:
+                out.extend(samples)
+        return "\n".join(out) + "\n"
+
+
+def _exemplar(exemplar: Exemplar | None) -> str:
+    """
+    Renders an OpenMetrics exemplar for a single counter increment.
+
+    :param exemplar: the exemplar labels and timestamp, or None
+    :return: the exemplar suffix, or an empty string
+    """
+    if exemplar is None:
+        return ""
+    labels, ts = exemplar
+    rendered = ",".join(f'{k}="{_esc(v)}"' for k, v in labels.items())
+    return f" # {{{rendered}}} 1 {ts}"
+
+
+def _counter(
+    out: Exposition,
+    name: str,
+    labels: str,
+    value: float,
+    created: float | None,
+    exemplar: Exemplar | None = None,
+) -> None:
+    """
+    Adds a counter sample with its OpenMetrics exemplar and ``_created`` sample.
+
+    :param out: the exposition to add to
+    :param name: the counter name including ``_total``
+    :param labels: the rendered labels, without braces
+    :param value: the counter value
+    :param created: the UNIX time the counter started at zero, or None
+    :param exemplar: the exemplar of the last increment, or None
+    :return: None
+    """
+    suffix = _exemplar(exemplar)
+    if created is not None:
+        suffix += f"\n{name[: -len('_total')]}_created{{{labels}}} {created}"
+    out.sample(f"{name}{{{labels}}} {value}", suffix)
+
+
+def _container_labels(instance: str, st: ContainerStatus, with_id: bool = True) -> str:
+    """
+    Renders the labels that identify a container in every per-container series.
+
+    The ``docker_host`` label is only present when collecting from several daemons.
+
+    :param instance: the already escaped instance name
+    :param st: the container status
+    :param with_id: whether to include ``container_id``
+    :return: the rendered labels, without braces
+    """
+    host = f'docker_host="{_esc(st.docker_host)}",' if st.docker_host else ""
+    if not with_id:
+        return f'instance="{instance}",{host}name="{_esc(st.name)}"'
+    return (
+        f'instance="{instance}",{host}name="{_esc(st.name)}",container_id="{_esc(st.container_id)}"'
+    )
+
+
+def limit_series(
+    snapshot: Mapping[str, ContainerStatus], max_series: int
+) -> tuple[Mapping[str, ContainerStatus], int]:
+    """
+    Caps the number of containers exported per metric family.
+
+    The worst statuses are kept first, then containers in key order, so the
+    exported set stays stable between refreshes and never hides a failing
+    container behind healthy ones.
+
+    :param snapshot: the snapshot of container health status
+    :param max_series: the maximum number of containers, 0 for no limit
+    :return: the containers to export and the number of containers left out
+    """
+    if not max_series or len(snapshot) <= max_series:
+        return snapshot, 0
+    keep = sorted(snapshot.items(), key=lambda kv: (kv[1].status, kv[0]))[:max_series]
+    return dict(keep), len(snapshot) - max_series
+
+
+def _histogram_lines(name: str, labels: str, hist: Histogram) -> list[str]:
+    """
+    Renders the samples of a histogram.
+
+    :param name: the metric family name
+    :param labels: the rendered labels shared by all samples, without braces
+    :param hist: the histogram to render
+    :return: the ``_bucket``, ``_sum`` and ``_count`` sample lines
+    """
+    lines = [f'{name}_bucket{{{labels},le="{le}"}} {n}' for le, n in hist.cumulative()]
+    lines.append(f"{name}_sum{{{labels}}} {hist.sum}")
+    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+    return lines
+
+
 def render_metrics(
     instance_name: str,
     snapshot: Mapping[str, ContainerStatus],
@@ -21,6 +218,9 @@ def render_metrics(
     refresh_errors_total: int,
     refresh_duration_seconds: float,
     snapshot_age_seconds: float,
+    inspect_cache_hits_total: int = 0,
+    inspect_cache_misses_total: int = 0,
+    inspect_failures_total: int = 0,
 ) -> str:
     """
     Renders the Prometheus metrics for the exporter.
@@ -31,58 +231,578 @@ def render_metrics(
     :param refresh_errors_total: the total number of refresh errors
     :param refresh_duration_seconds: the duration of the last refresh in seconds
     :param snapshot_age_seconds: the age of the last successful snapshot in seconds
+    :param inspect_cache_hits_total: the number of container inspects saved by the cache
+    :param inspect_cache_misses_total: the number of container inspects done after a cache miss
+    :param inspect_failures_total: the number of failed or timed out container inspects
     :return: the rendered Prometheus metrics as a string
     """
-    lines: list[str] = []
+    return render_self_metrics(
+        instance_name=instance_name,
+        exporter_up=exporter_up,
+        refresh_errors_total=refresh_errors_total,
+        refresh_duration_seconds=refresh_duration_seconds,
+        snapshot_age_seconds=snapshot_age_seconds,
+        inspect_cache_hits_total=inspect_cache_hits_total,
+        inspect_cache_misses_total=inspect_cache_misses_total,
+        inspect_failures_total=inspect_failures_total,
+    ) + render_container_metrics(instance_name=instance_name, snapshot=snapshot)
 
-    lines.append(
-        "# HELP docker_healthcheck_exporter_up Exporter is running and can talk to Docker (1/0)."
+
+def _snapshot_age(out: Exposition, inst: str, snapshot_age_seconds: float) -> None:
+    """
+    Adds the snapshot age family.
+
+    :param out: the exposition to add to
+    :param inst: the rendered instance label
+    :param snapshot_age_seconds: the age of the last successful snapshot in seconds
+    :return: None
+    """
+    out.family(
+        "docker_healthcheck_exporter_snapshot_age_seconds",
+        "gauge",
+        "Age of the last successful snapshot in seconds.",
     )
-    lines.append("# TYPE docker_healthcheck_exporter_up gauge")
-    lines.append(
-        f'docker_healthcheck_exporter_up{{instance="{_esc(instance_name)}"}} {exporter_up}'
+    out.sample(f"docker_healthcheck_exporter_snapshot_age_seconds{{{inst}}} {snapshot_age_seconds}")
+
+
+def render_snapshot_age(
+    instance_name: str, snapshot_age_seconds: float, openmetrics: bool = False
+) -> str:
+    """
+    Renders only the snapshot age, for metrics published without it.
+
+    :param instance_name: the instance name for the exporter
+    :param snapshot_age_seconds: the age of the last successful snapshot in seconds
+    :param openmetrics: True to render the OpenMetrics format (without ``# EOF``)
+    :return: the rendered snapshot age as a string
+    """
+    out = Exposition()
+    _snapshot_age(out, f'instance="{_esc(instance_name)}"', snapshot_age_seconds)
+    return out.render(openmetrics)
+
+
+def render_self_metrics(
+    instance_name: str,
+    exporter_up: int,
+    refresh_errors_total: int,
+    refresh_duration_seconds: float,
+    snapshot_age_seconds: float | None,
+    inspect_cache_hits_total: int = 0,
+    inspect_cache_misses_total: int = 0,
+    inspect_failures_total: int = 0,
+    inspect_concurrency_limit: int | None = None,
+    inspect_latency: Histogram | None = None,
+    stats_failures_total: int | None = None,
+    hosts: Sequence[tuple[str, int, int]] | None = None,
+    response_size_bytes: Mapping[str, int] | None = None,
+    compression_ratio: float | None = None,
+    phases: Mapping[str, Histogram] | None = None,
+    api_calls: Mapping[tuple[str, str], int] | None = None,
+    series_dropped: int | None = None,
+    created: float | None = None,
+    refresh_error_exemplar: Exemplar | None = None,
+    inspect_failure_exemplar: Exemplar | None = None,
+    openmetrics: bool = False,
+) -> str:
+    """
+    Renders the exporter self-metrics.
+
+    These change on every scrape (e.g. the snapshot age) and are cheap to
+    render, unlike the per-container block.
+
+    :param instance_name: the instance name for the exporter
+    :param exporter_up: the exporter up status (1/0)
+    :param refresh_errors_total: the total number of refresh errors
+    :param refresh_duration_seconds: the duration of the last refresh in seconds
+    :param snapshot_age_seconds: the age of the last successful snapshot in seconds, None to
+        leave it out for a reader that renders it per scrape (see `render_snapshot_age`)
+    :param inspect_cache_hits_total: the number of container inspects saved by the cache
+    :param inspect_cache_misses_total: the number of container inspects done after a cache miss
+    :param inspect_failures_total: the number of failed or timed out container inspects
+    :param inspect_concurrency_limit: the current inspect concurrency limit
+    :param inspect_latency: the histogram of container inspect latencies
+    :param stats_failures_total: the number of failed or timed out stats calls, None without
+        stats sampling
+    :param hosts: ``(alias, up, refresh_errors_total)`` per Docker host when collecting from several daemons
+    :param response_size_bytes: the size of the last /metrics response by content encoding
+    :param compression_ratio: the gzip compression ratio of the per-container block, None before the first gzip body
+    :param phases: the duration histograms per refresh phase; phases without observations are skipped
+    :param api_calls: the number of Docker API calls per ``(endpoint, status)``
+    :param series_dropped: the number of containers currently left out by the series cap, None
+        without a cap
+    :param created: the UNIX time the exporter counters started, for OpenMetrics ``_created`` samples
+    :param refresh_error_exemplar: the exemplar of the last refresh error, for OpenMetrics
+    :param inspect_failure_exemplar: the exemplar of the last failed inspect, for OpenMetrics
+    :param openmetrics: True to render the OpenMetrics format (without ``# EOF``)
+    :return: the rendered self-metrics as a string
+    """
+    out = Exposition()
+    inst = f'instance="{_esc(instance_name)}"'
+
+    out.family(
+        "docker_healthcheck_exporter_up",
+        "gauge",
+        "Exporter is running and can talk to Docker (1/0).",
     )
+    out.sample(f"docker_healthcheck_exporter_up{{{inst}}} {exporter_up}")
 
-    lines.append(
-        "# HELP docker_healthcheck_exporter_refresh_errors_total Number of Docker refresh errors."
+    out.family(
+        "docker_healthcheck_exporter_refresh_errors_total",
+        "counter",
+        "Number of Docker refresh errors.",
     )
-    lines.append("# TYPE docker_healthcheck_exporter_refresh_errors_total counter")
-    lines.append(
-        f'docker_healthcheck_exporter_refresh_errors_total{{instance="{_esc(instance_name)}"}} {refresh_errors_total}'
+    _counter(
+        out,
+        "docker_healthcheck_exporter_refresh_errors_total",
+        inst,
+        refresh_errors_total,
+        created,
+        refresh_error_exemplar,
     )
 
-    lines.append(
-        "# HELP docker_healthcheck_exporter_refresh_duration_seconds Last refresh duration in seconds."
+    out.family(
+        "docker_healthcheck_exporter_refresh_duration_seconds",
+        "gauge",
+        "Last refresh duration in seconds.",
     )
-    lines.append("# TYPE docker_healthcheck_exporter_refresh_duration_seconds gauge")
-    lines.append(
-        f'docker_healthcheck_exporter_refresh_duration_seconds{{instance="{_esc(instance_name)}"}} {refresh_duration_seconds}'
+    out.sample(
+        f"docker_healthcheck_exporter_refresh_duration_seconds{{{inst}}} {refresh_duration_seconds}"
     )
 
-    lines.append(
-        "# HELP docker_healthcheck_exporter_snapshot_age_seconds Age of the last successful snapshot in seconds."
+    if snapshot_age_seconds is not None:
+        _snapshot_age(out, inst, snapshot_age_seconds)
+
+    out.family(
+        "docker_healthcheck_exporter_inspect_cache_hits_total",
+        "counter",
+        "Container inspects saved by the inspect cache.",
+    )
+    _counter(
+        out,
+        "docker_healthcheck_exporter_inspect_cache_hits_total",
+        inst,
+        inspect_cache_hits_total,
+        created,
+    )
+
+    out.family(
+        "docker_healthcheck_exporter_inspect_cache_misses_total",
+        "counter",
+        "Container inspects done after an inspect cache miss.",
+    )
+    _counter(
+        out,
+        "docker_healthcheck_exporter_inspect_cache_misses_total",
+        inst,
+        inspect_cache_misses_total,
+        created,
     )
-    lines.append("# TYPE docker_healthcheck_exporter_snapshot_age_seconds gauge")
-    lines.append(
-        f'docker_healthcheck_exporter_snapshot_age_seconds{{instance="{_esc(instance_name)}"}} {snapshot_age_seconds}'
+
+    out.family(
+        "docker_healthcheck_exporter_inspect_failures_total",
+        "counter",
+        "Container inspects that failed or timed out (partial refresh failures).",
+    )
+    _counter(
+        out,
+        "docker_healthcheck_exporter_inspect_failures_total",
+        inst,
+        inspect_failures_total,
+        created,
+        inspect_failure_exemplar,
     )
 
-    lines.append(
-        "# HELP docker_container_health_status Container health status (-2 crit, -1 fail, 0 unhealthy, 1 running(no healthcheck), 2 healthy)."
+    if inspect_concurrency_limit is not None:
+        out.family(
+            "docker_healthcheck_exporter_inspect_concurrency_limit",
+            "gauge",
+            "Current limit of concurrent container inspects.",
+        )
+        out.sample(
+            f"docker_healthcheck_exporter_inspect_concurrency_limit{{{inst}}} {inspect_concurrency_limit}"
+        )
+
+    if inspect_latency is not None:
+        out.family(
+            "docker_healthcheck_exporter_inspect_duration_seconds",
+            "histogram",
+            "Latency of container inspect calls in seconds.",
+        )
+        out.extend(
+            _histogram_lines(
+                "docker_healthcheck_exporter_inspect_duration_seconds", inst, inspect_latency
+            )
+        )
+
+    if stats_failures_total is not None:
+        out.family(
+            "docker_healthcheck_exporter_stats_failures_total",
+            "counter",
+            "Container stats calls that failed or did not finish within the budget.",
+        )
+        _counter(
+            out,
+            "docker_healthcheck_exporter_stats_failures_total",
+            inst,
+            stats_failures_total,
+            created,
+        )
+
+    if hosts:
+        out.family(
+            "docker_healthcheck_exporter_host_up",
+            "gauge",
+            "Exporter can talk to this Docker host (1/0).",
+        )
+        for alias, up, _ in hosts:
+            out.sample(
+                f'docker_healthcheck_exporter_host_up{{{inst},docker_host="{_esc(alias)}"}} {up}'
+            )
+        out.family(
+            "docker_healthcheck_exporter_host_refresh_errors_total",
+            "counter",
+            "Number of refresh errors per Docker host.",
+        )
+        for alias, _, errors in hosts:
+            _counter(
+                out,
+                "docker_healthcheck_exporter_host_refresh_errors_total",
+                f'{inst},docker_host="{_esc(alias)}"',
+                errors,
+                created,
+            )
+
+    if response_size_bytes:
+        out.family(
+            "docker_healthcheck_exporter_response_size_bytes",
+            "gauge",
+            "Size of the last /metrics response body in bytes.",
+        )
+        for encoding, size in sorted(response_size_bytes.items()):
+            out.sample(
+                f'docker_healthcheck_exporter_response_size_bytes{{{inst},encoding="{_esc(encoding)}"}} {size}'
+            )
+
+    if compression_ratio is not None:
+        out.family(
+            "docker_healthcheck_exporter_compression_ratio",
+            "gauge",
+            "Uncompressed to gzip size ratio of the container metrics.",
+        )
+        out.sample(f"docker_healthcheck_exporter_compression_ratio{{{inst}}} {compression_ratio}")
+
+    if phases and any(h.count for h in phases.values()):
+        out.family(
+            "docker_healthcheck_exporter_phase_duration_seconds",
+            "histogram",
+            "Duration of the refresh phases in seconds.",
+        )
+        for phase, hist in phases.items():
+            if hist.count:
+                out.extend(
+                    _histogram_lines(
+                        "docker_healthcheck_exporter_phase_duration_seconds",
+                        f'{inst},phase="{_esc(phase)}"',
+                        hist,
+                    )
+                )
+
+    if api_calls:
+        out.family(
+            "docker_healthcheck_exporter_docker_api_calls_total",
+            "counter",
+            "Docker API calls by endpoint and status (HTTP code, timeout or error).",
+        )
+        for (endpoint, status), n in sorted(api_calls.items()):
+            _counter(
+                out,
+                "docker_healthcheck_exporter_docker_api_calls_total",
+                f'{inst},endpoint="{_esc(endpoint)}",status="{_esc(status)}"',
+                n,
+                created,
+            )
+
+    if series_dropped is not None:
+        out.family(
+            "docker_healthcheck_exporter_series_dropped",
+            "gauge",
+            "Containers currently left out of the per-container series by MAX_CONTAINER_SERIES.",
+        )
+        out.sample(f"docker_healthcheck_exporter_series_dropped{{{inst}}} {series_dropped}")
+
+    return out.render(openmetrics)
+
+
+def render_container_metrics(
+    instance_name: str,
+    snapshot: Mapping[str, ContainerStatus],
+    transitions: Mapping[str, TrackedContainer] | None = None,
+) -> str:
+    """
+    Renders the per-container metrics in the classic text format.
+
+    :param instance_name: the instance name for the exporter
+    :param snapshot: the snapshot of container health status
+    :param transitions: the tracked status transitions per snapshot key, if tracked
+    :return: the rendered per-container metrics as a string
+    """
+    return container_exposition(instance_name, snapshot, transitions).render()
+
+
+def _aggregate_families(out: Exposition, inst: str, aggregates: Aggregates) -> None:
+    """
+    Adds the per compose project, compose service and image aggregate families.
+
+    Every group gets one count per `ServiceStatus`, zeros included, so the
+    series of a group do not come and go with its containers' statuses.
+
+    :param out: the exposition to add to
+    :param inst: the already escaped instance name
+    :param aggregates: the aggregated container counts
+    :return: None
+    """
+    statuses = sorted(ServiceStatus)
+    for prefix, what, groups, names in (
+        ("docker_compose_project", "compose project", aggregates.projects, ("compose_project",)),
+        (
+            "docker_compose_service",
+            "compose service",
+            aggregates.services,
+            ("compose_project", "compose_service"),
+        ),
+        ("docker_image", "image", aggregates.images, ("image",)),
+    ):
+        if not groups:
+            continue
+        rendered = []
+        for (host, *values), counts in sorted(groups.items()):
+            host_label = f'docker_host="{_esc(host)}",' if host else ""
+            labels = ",".join(f'{n}="{_esc(v)}"' for n, v in zip(names, values, strict=True))
+            rendered.append((f'instance="{inst}",{host_label}{labels}', counts))
+        out.family(f"{prefix}_containers", "gauge", f"Number of containers per {what} and status.")
+        for labels, counts in rendered:
+            for st in statuses:
+                out.sample(
+                    f'{prefix}_containers{{{labels},status_text="{st.name}"}} {counts[st - statuses[0]]}'
+                )
+        out.family(
+            f"{prefix}_worst_status",
+            "gauge",
+            f"Worst container health status per {what} (values as docker_container_health_status).",
+        )
+        for labels, counts in rendered:
+            out.sample(f"{prefix}_worst_status{{{labels}}} {worst_status(counts)}")
+
+
+def container_exposition(
+    instance_name: str,
+    snapshot: Mapping[str, ContainerStatus],
+    transitions: Mapping[str, TrackedContainer] | None = None,
+    extra_label_names: Sequence[str] = (),
+    info_series: bool = False,
+    aggregates: Aggregates | None = None,
+) -> Exposition:
+    """
+    Builds the per-container metrics.
+
+    The output depends only on the snapshot and the transition state, so
+    callers can cache it for as long as both are unchanged.
+
+    With ``info_series`` the volatile ``container_id`` and ``image`` labels
+    move to a ``docker_container_info`` series and every other series is
+    identified by instance, docker_host and name only, so a redeployed
+    container keeps its health series.
+
+    :param instance_name: the instance name for the exporter
+    :param snapshot: the snapshot of container health status
+    :param transitions: the tracked status transitions per snapshot key, if tracked
+    :param extra_label_names: the label names of ``ContainerStatus.extra_labels``, added to the
+        health status series
+    :param info_series: whether to split ``container_id`` and ``image`` into an info series
+    :param aggregates: the container counts per compose project, compose service and image,
+        if exported
+    :return: the per-container metrics
+    """
+    out = Exposition()
+
+    out.family(
+        "docker_container_health_status",
+        "gauge",
+        "Container health status (-2 crit, -1 fail, 0 unhealthy, 1 running(no healthcheck), 2 healthy).",
     )
-    lines.append("# TYPE docker_container_health_status gauge")
 
-    for name, st in snapshot.items():
-        lines.append(
+    inst = _esc(instance_name)
+    with_id = not info_series
+
+    def ident(st: ContainerStatus) -> str:
+        return _container_labels(inst, st, with_id)
+
+    for st in snapshot.values():
+        image = "" if info_series else f'image="{_esc(st.image)}",'
+        extra = "".join(
+            f',{n}="{_esc(v)}"' for n, v in zip(extra_label_names, st.extra_labels, strict=False)
+        )
+        out.sample(
             "docker_container_health_status{"
-            f'instance="{_esc(instance_name)}",'
-            f'name="{_esc(name)}",'
-            f'container_id="{_esc(st.container_id)}",'
-            f'image="{_esc(st.image)}",'
+            f"{ident(st)},"
+            f"{image}"
             f'compose_project="{_esc(st.compose_project)}",'
             f'compose_service="{_esc(st.compose_service)}",'
             f'status_text="{_esc(st.status_text)}"'
+            f"{extra}"
             f"}} {st.status}"
         )
 
-    return "\n".join(lines) + "\n"
+    if info_series and snapshot:
+        out.family(
+            "docker_container_info",
+            "gauge",
+            "Container id and image, always 1; join on name for the other container series.",
+        )
+        for st in snapshot.values():
+            out.sample(
+                f'docker_container_info{{{_container_labels(inst, st)},image="{_esc(st.image)}"}} 1'
+            )
+
+    stale = [st for st in snapshot.values() if st.stale_since]
+    if stale:
+        out.family(
+            "docker_container_stale_since_timestamp_seconds",
+            "gauge",
+            "UNIX time since which the container status could not be refreshed.",
+        )
+        for st in stale:
+            out.sample(
+                f"docker_container_stale_since_timestamp_seconds{{{ident(st)}}} {st.stale_since}"
+            )
+
+    inspected = [st for st in snapshot.values() if st.restart_count is not None]
+    if inspected:
+        out.family(
+            "docker_container_restarts_total",
+            "counter",
+            "Number of times Docker restarted the container.",
+        )
+        for st in inspected:
+            out.sample(f"docker_container_restarts_total{{{ident(st)}}} {st.restart_count}")
+        out.family(
+            "docker_container_oom_killed",
+            "gauge",
+            "Whether the last exit of the container was an OOM kill (1/0).",
+        )
+        for st in inspected:
+            out.sample(f"docker_container_oom_killed{{{ident(st)}}} {int(bool(st.oom_killed))}")
+        out.family("docker_container_exit_code", "gauge", "Exit code of the last container run.")
+        for st in inspected:
+            if st.exit_code is not None:
+                out.sample(f"docker_container_exit_code{{{ident(st)}}} {st.exit_code}")
+        out.family(
+            "docker_container_start_time_seconds",
+            "gauge",
+            "UNIX time the container was last started.",
+        )
+        for st in inspected:
+            if st.started_at:
+                out.sample(f"docker_container_start_time_seconds{{{ident(st)}}} {st.started_at}")
+
+    sampled = [(st, st.stats) for st in snapshot.values() if st.stats is not None]
+    if sampled:
+        for metric, kind, help_text, attr in (
+            (
+                "docker_container_cpu_seconds_total",
+                "counter",
+                "Cumulative CPU time consumed by the container.",
+                "cpu_seconds_total",
+            ),
+            (
+                "docker_container_memory_usage_bytes",
+                "gauge",
+                "Container memory usage without inactive page cache.",
+                "memory_usage_bytes",
+            ),
+            (
+                "docker_container_memory_limit_bytes",
+                "gauge",
+                "Container memory limit.",
+                "memory_limit_bytes",
+            ),
+            ("docker_container_pids", "gauge", "Number of processes in the container.", "pids"),
+            (
+                "docker_container_stats_sampled_timestamp_seconds",
+                "gauge",
+                "UNIX time of the latest resource stats sample.",
+                "sampled_at",
+            ),
+        ):
+            out.family(metric, kind, help_text)
+            for st, sample in sampled:
+                out.sample(f"{metric}{{{ident(st)}}} {getattr(sample, attr)}")
+
+    if transitions:
+        out.family(
+            "docker_container_health_status_since_timestamp_seconds",
+            "gauge",
+            "UNIX time since which the container is in its current status.",
+        )
+        for t in transitions.values():
+            if not t.removed_at:
+                out.sample(
+                    "docker_container_health_status_since_timestamp_seconds{"
+                    f"{ident(t.status)}"
+                    f"}} {t.since}"
+                )
+        out.family(
+            "docker_container_health_transitions_total",
+            "counter",
+            "Number of observed container status changes.",
+        )
+        for t in transitions.values():
+            for (src, dst), n in t.transitions.items():
+                out.sample(
+                    "docker_container_health_transitions_total{"
+                    f"{ident(t.status)},"
+                    f'from="{_esc(src)}",to="{_esc(dst)}"'
+                    f"}} {n}"
+                )
+
+    probed = [(st, st.health_probe) for st in snapshot.values() if st.health_probe is not None]
+    if probed:
+        out.family(
+            "docker_container_health_failing_streak",
+            "gauge",
+            "Number of consecutive failed healthcheck probes.",
+        )
+        for st, _ in probed:
+            out.sample(
+                "docker_container_health_failing_streak{"
+                f"{ident(st)}"
+                f"}} {st.health_failing_streak or 0}"
+            )
+        out.family(
+            "docker_container_health_probe_exit_code",
+            "gauge",
+            "Exit code of the last healthcheck probe.",
+        )
+        for st, _ in probed:
+            if st.health_exit_code is not None:
+                out.sample(
+                    f"docker_container_health_probe_exit_code{{{ident(st)}}} {st.health_exit_code}"
+                )
+        out.family(
+            "docker_container_health_probe_duration_seconds",
+            "histogram",
+            "Duration of the healthcheck probes seen in the health log.",
+        )
+        for st, hist in probed:
+            out.extend(
+                _histogram_lines(
+                    "docker_container_health_probe_duration_seconds",
+                    ident(st),
+                    hist,
+                )
+            )
+
+    if aggregates is not None:
+        _aggregate_families(out, inst, aggregates)
+
+    return out
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import asyncio
+import ssl
+import time
+from dataclasses import dataclass, field, replace
+
+from docker_healthcheck_exporter.collector import ContainerStatus, DockerCollector
+from docker_healthcheck_exporter.instruments import Instruments
+from docker_healthcheck_exporter.limiter import ConcurrencyLimiter
+from docker_healthcheck_exporter.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Upper bound of the per-host retry backoff, in seconds.
+MAX_BACKOFF_SECONDS = 300.0
+
+
+@dataclass
+class HostState:
+    alias: str
+    collector: DockerCollector
+    snapshot: dict[str, ContainerStatus] = field(default_factory=dict)
+    up: int = 0
+    # Whether a refresh of this host has finished, successfully or not
+    refreshed: bool = False
+    refresh_errors_total: int = 0
+    failures: int = 0
+    next_attempt: float = 0.0
+    task: asyncio.Task | None = None
+
+
+class CollectorPool:
+    def __init__(
+        self,
+        hosts: tuple[tuple[str, str], ...],
+        ignore_list: set[str],
+        include_label: str | None,
+        max_concurrency: int = 20,
+        collect_mode: str = "inspect",
+        inspect_cache_size: int = 4096,
+        inspect_timeout_seconds: float = 10.0,
+        adaptive_concurrency: bool = False,
+        latency_target_seconds: float = 0.25,
+        ssl_context: ssl.SSLContext | None = None,
+        host_timeout_seconds: float = 30.0,
+        retry_interval_seconds: float = 5.0,
+        refresh_wait_seconds: float = 5.0,
+        health_probe_metrics: bool = False,
+        stats_budget_calls: int = 0,
+        stats_budget_seconds: float = 2.0,
+        instruments: Instruments | None = None,
+        container_filter: str | None = None,
+        label_projection: tuple[str, ...] = (),
+    ):
+        """
+        Initializes a CollectorPool instance.
+
+        The pool runs one `DockerCollector` per Docker endpoint, each with its
+        own aiodocker client and connection pool, and merges their snapshots.
+        All collectors share one inspect limiter, so ``max_concurrency`` caps
+        the in-flight inspects across every host, and one set of instruments.
+
+        Every host refreshes in its own task. A refresh waits at most
+        ``refresh_wait_seconds`` for them and merges the latest snapshot of
+        each host, so a slow or hung host does not hold back the others: it
+        keeps its previous snapshot until its own refresh finishes or times
+        out. A failed host's snapshot is marked stale and the host is retried
+        with exponential backoff.
+
+        Args:
+            hosts (tuple[tuple[str, str], ...]): ``(alias, url)`` pairs, one per endpoint.
+            ignore_list (set[str]): A set of container names to ignore.
+            include_label (str | None): A label to filter containers by.
+            max_concurrency (int, optional): The global limit of concurrent inspects. Defaults to 20.
+            collect_mode (str, optional): The collection mode of every collector. Defaults to "inspect".
+            inspect_cache_size (int, optional): The inspect cache size per collector. Defaults to 4096.
+            inspect_timeout_seconds (float, optional): The timeout for a single inspect call.
+                Defaults to 10.
+            adaptive_concurrency (bool, optional): Whether the shared limiter adapts to latency.
+                Defaults to False.
+            latency_target_seconds (float, optional): The adaptive latency target. Defaults to 0.25.
+            ssl_context (ssl.SSLContext | None, optional): The TLS context for tcp endpoints.
+                Defaults to None.
+            host_timeout_seconds (float, optional): The timeout for a full refresh of one host.
+                Defaults to 30.
+            retry_interval_seconds (float, optional): The first retry delay after a host
+                failure, doubled on each further failure. Defaults to 5.
+            refresh_wait_seconds (float, optional): How long `collect` waits for the
+                host refreshes before merging. Defaults to 5.
+            health_probe_metrics (bool, optional): Whether every collector collects health
+                log details. Defaults to False.
+            stats_budget_calls (int, optional): The stats call budget per host and refresh.
+                Defaults to 0 (disabled).
+            stats_budget_seconds (float, optional): The stats time budget per host and
+                refresh. Defaults to 2.
+            instruments (Instruments | None, optional): Phase timings and API call
+                counters shared by all collectors. Defaults to None.
+            container_filter (str | None, optional): The filter rules of every collector.
+                Defaults to None.
+            label_projection (tuple[str, ...], optional): The container label keys every
+                collector keeps in ``ContainerStatus.extra_labels``. Defaults to ().
+        """
+        self.limiter = ConcurrencyLimiter(
+            max_concurrency,
+            adaptive=adaptive_concurrency,
+            latency_target_seconds=latency_target_seconds,
+        )
+        self.instruments = instruments or Instruments()
+        self.host_timeout_seconds = host_timeout_seconds
+        self.retry_interval_seconds = retry_interval_seconds
+        self.refresh_wait_seconds = refresh_wait_seconds
+        self._clock = time.monotonic
+        self.hosts = [
+            HostState(
+                alias=alias,
+                collector=DockerCollector(
+                    ignore_list=ignore_list,
+                    include_label=include_label,
+                    max_concurrency=max_concurrency,
+                    collect_mode=collect_mode,
+                    inspect_cache_size=inspect_cache_size,
+                    inspect_timeout_seconds=inspect_timeout_seconds,
+                    docker_url=url,
+                    ssl_context=ssl_context if url.startswith(("tcp://", "https://")) else None,
+                    limiter=self.limiter,
+                    health_probe_metrics=health_probe_metrics,
+                    stats_budget_calls=stats_budget_calls,
+                    stats_budget_seconds=stats_budget_seconds,
+                    instruments=self.instruments,
+                    docker_host=alias,
+                    container_filter=container_filter,
+                    label_projection=label_projection,
+                ),
+            )
+            for alias, url in hosts
+        ]
+
+    @property
+    def cache_hits_total(self) -> int:
+        """
+        Returns the number of inspects saved by the inspect caches across all hosts.
+
+        :return: The summed counter.
+        """
+        return sum(h.collector.cache_hits_total for h in self.hosts)
+
+    @property
+    def cache_misses_total(self) -> int:
+        """
+        Returns the number of inspects done after an inspect cache miss across all hosts.
+
+        :return: The summed counter.
+        """
+        return sum(h.collector.cache_misses_total for h in self.hosts)
+
+    @property
+    def inspect_failures_total(self) -> int:
+        """
+        Returns the number of failed or timed out inspects across all hosts.
+
+        :return: The summed counter.
+        """
+        return sum(h.collector.inspect_failures_total for h in self.hosts)
+
+    @property
+    def stats_failures_total(self) -> int:
+        """
+        Returns the number of failed or timed out stats calls across all hosts.
+
+        :return: The summed counter.
+        """
+        return sum(h.collector.stats_failures_total for h in self.hosts)
+
+    @property
+    def last_inspect_failure(self) -> tuple[str, float] | None:
+        """
+        Returns the latest failed inspect across all hosts.
+
+        :return: The short container id and UNIX time, or None.
+        """
+        failures = [h.collector.last_inspect_failure for h in self.hosts]
+        return max((f for f in failures if f is not None), key=lambda f: f[1], default=None)
+
+    def host_status(self) -> list[tuple[str, int, int]]:
+        """
+        Returns the per-host state for the self-metrics.
+
+        :return: ``(alias, up, refresh_errors_total)`` per host.
+        """
+        return [(h.alias, h.up, h.refresh_errors_total) for h in self.hosts]
+
+    async def start(self) -> None:
+        """
+        Starts the collectors of all hosts.
+
+        :return: None
+        """
+        for h in self.hosts:
+            await h.collector.start()
+
+    async def stop(self) -> None:
+        """
+        Stops the collectors of all hosts.
+
+        :return: None
+        """
+        for h in self.hosts:
+            if h.task is not None:
+                h.task.cancel()
+                await asyncio.gather(h.task, return_exceptions=True)
+            await h.collector.stop()
+
+    async def collect(self) -> dict[str, ContainerStatus]:
+        """
+        Collects the health status from all hosts concurrently.
+
+        Snapshot keys are ``"<alias>/<name>"`` and every `ContainerStatus`
+        carries its host alias in ``docker_host``. Hosts that are backing off
+        after a failure or still refreshing contribute their last snapshot.
+
+        If every host failed, this method raises a `RuntimeError`. Hosts whose
+        first refresh is still running are not counted as failed.
+
+        :return: A dictionary with ``"<alias>/<name>"`` keys and
+            `ContainerStatus` instances as values.
+        """
+        now = self._clock()
+        for h in self.hosts:
+            if h.task is None and now >= h.next_attempt:
+                h.task = asyncio.create_task(self._collect_host(h))
+        pending = [h.task for h in self.hosts if h.task is not None]
+        if pending:
+            await asyncio.wait(pending, timeout=self.refresh_wait_seconds)
+        if not any(h.up or not h.refreshed for h in self.hosts):
+            raise RuntimeError("All Docker hosts failed")
+        out: dict[str, ContainerStatus] = {}
+        for h in self.hosts:
+            out.update(h.snapshot)
+        return out
+
+    async def _collect_host(self, h: HostState) -> None:
+        """
+        Refreshes the snapshot of one host, isolating its failures.
+
+        :param h: The host state.
+        :return: None
+        """
+        try:
+            snap = await asyncio.wait_for(h.collector.collect(), timeout=self.host_timeout_seconds)
+        except Exception:
+            h.up = 0
+            h.refresh_errors_total += 1
+            h.failures += 1
+            backoff = self.retry_interval_seconds * 2 ** (h.failures - 1)
+            h.next_attempt = self._clock() + min(MAX_BACKOFF_SECONDS, backoff)
+            logger.exception(f"Failed to collect Docker health status from {h.alias}")
+            stale_since = time.time()
+            h.snapshot = {
+                k: st if st.stale_since else replace(st, stale_since=stale_since)
+                for k, st in h.snapshot.items()
+            }
+            return
+        finally:
+            h.task = None
+            h.refreshed = True
+        h.up = 1
+        h.failures = 0
+        h.next_attempt = 0.0
+        h.snapshot = {
+            f"{h.alias}/{name}": st
+            if st.docker_host == h.alias
+            else replace(st, docker_host=h.alias)
+            for name, st in snap.items()
+        }
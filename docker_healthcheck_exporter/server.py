@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from collections.abc import Sequence
+from typing import Protocol
+
+from docker_healthcheck_exporter.logger import get_logger
+from docker_healthcheck_exporter.metrics import OPENMETRICS_CONTENT_TYPE, TEXT_CONTENT_TYPE
+from docker_healthcheck_exporter.state import ExporterState, wait_for_shutdown_signal
+
+logger = get_logger(__name__)
+
+HEALTH_BODY = "{'status': 'ok'}"
+
+# Idle keep-alive connections are closed after this many seconds.
+IDLE_TIMEOUT_SECONDS = 60.0
+
+# A response body, or its chunks written one after another without joining them.
+Body = bytes | Sequence[bytes | memoryview]
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    503: "Service Unavailable",
+}
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Checks whether an Accept-Encoding header allows a gzip response.
+
+    :param accept_encoding: The Accept-Encoding header value.
+    :return: True if gzip is accepted with a non-zero quality.
+    """
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def accepts_openmetrics(accept: str) -> bool:
+    """
+    Checks whether an Accept header prefers OpenMetrics over the text format.
+
+    Only OpenMetrics 1.0.0 (or an unversioned request) is served; ties go to
+    OpenMetrics, the same as Prometheus' own client libraries.
+
+    :param accept: The Accept header value.
+    :return: True if the response should use the OpenMetrics format.
+    """
+    om = text = 0.0
+    for part in accept.split(","):
+        media_type, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        version = None
+        for param in params:
+            key, _, value = param.partition("=")
+            key = key.strip().lower()
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+            elif key == "version":
+                version = value.strip()
+        media_type = media_type.lower()
+        if media_type == "application/openmetrics-text" and version in (None, "1.0.0"):
+            om = max(om, q)
+        elif media_type in ("text/plain", "text/*", "*/*"):
+            text = max(text, q)
+    return om > 0 and om >= text
+
+
+class MetricsSource(Protocol):
+    async def ensure_fresh(self) -> None: ...
+
+    def ready(self) -> bool: ...
+
+    def metrics_bytes(self, openmetrics: bool = False) -> Body: ...
+
+    def metrics_gzip(self, openmetrics: bool = False) -> Body: ...
+
+
+class HttpServer:
+    def __init__(
+        self, state: MetricsSource, host: str, port: int, reuse_port: bool = False
+    ) -> None:
+        """
+        Initializes an HttpServer instance.
+
+        A minimal asyncio HTTP/1.1 server for ``/metrics`` and ``/health``,
+        serving the same bodies as the FastAPI app without importing the
+        FastAPI, pydantic, starlette and uvicorn stack. Keep-alive is
+        supported; request bodies are not.
+
+        Args:
+            state (MetricsSource): The metrics to serve, usually an `ExporterState`.
+            host (str): The address to listen on.
+            port (int): The port to listen on.
+            reuse_port (bool, optional): Whether to set SO_REUSEPORT, so several
+                processes can listen on the same port. Defaults to False.
+        """
+        self.state = state
+        self.host = host
+        self.port = port
+        self.reuse_port = reuse_port
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        """
+        Starts listening.
+
+        :return: None
+        """
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port, reuse_port=self.reuse_port
+        )
+
+    async def stop(self) -> None:
+        """
+        Stops listening and closes the listener.
+
+        :return: None
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    @property
+    def sockets(self) -> list:
+        """
+        Returns the listening sockets.
+
+        :return: The sockets, empty if the server is not started.
+        """
+        return list(self._server.sockets) if self._server is not None else []
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serves the requests of one connection.
+
+        :param reader: The connection reader.
+        :param writer: The connection writer.
+        :return: None
+        """
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), timeout=IDLE_TIMEOUT_SECONDS
+                    )
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    return
+                except asyncio.TimeoutError:
+                    return
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                parts = request_line.split(" ")
+                if len(parts) != 3:
+                    await self._send(writer, 400, "GET", [("Connection", "close")], b"")
+                    return
+                method, target, version = parts
+                headers: dict[str, str] = {}
+                for line in header_lines:
+                    if line:
+                        k, _, v = line.partition(":")
+                        headers[k.strip().lower()] = v.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = (
+                    connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                )
+                if headers.get("content-length", "0") != "0" or "transfer-encoding" in headers:
+                    keep_alive = False
+                status, response_headers, body = await self._route(
+                    method, target.split("?", 1)[0], headers
+                )
+                if not keep_alive:
+                    response_headers.append(("Connection", "close"))
+                await self._send(writer, status, method, response_headers, body)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            return
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def _route(
+        self, method: str, path: str, headers: dict[str, str]
+    ) -> tuple[int, list[tuple[str, str]], Body]:
+        """
+        Produces the response for one request.
+
+        :param method: The request method.
+        :param path: The request path without the query string.
+        :param headers: The request headers with lower-case names.
+        :return: The status code, response headers and body.
+        """
+        plain = ("Content-Type", "text/plain; charset=utf-8")
+        if path not in ("/metrics", "/health"):
+            return 404, [plain], b"Not Found"
+        if method not in ("GET", "HEAD"):
+            return 405, [plain, ("Allow", "GET, HEAD")], b"Method Not Allowed"
+        if path == "/health":
+            return 200, [plain], HEALTH_BODY.encode("utf-8")
+        await self.state.ensure_fresh()
+        if not self.state.ready():
+            return 503, [plain], b"Metrics not available yet"
+        openmetrics = accepts_openmetrics(headers.get("accept", ""))
+        out = [
+            ("Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else TEXT_CONTENT_TYPE),
+            ("Vary", "Accept, Accept-Encoding"),
+        ]
+        if accepts_gzip(headers.get("accept-encoding", "")):
+            out.append(("Content-Encoding", "gzip"))
+            return 200, out, self.state.metrics_gzip(openmetrics)
+        return 200, out, self.state.metrics_bytes(openmetrics)
+
+    @staticmethod
+    async def _send(
+        writer: asyncio.StreamWriter,
+        status: int,
+        method: str,
+        headers: list[tuple[str, str]],
+        body: Body,
+    ) -> None:
+        """
+        Writes one response.
+
+        :param writer: The connection writer.
+        :param status: The status code.
+        :param method: The request method; HEAD responses carry no body.
+        :param headers: The response headers, without Content-Length.
+        :param body: The response body.
+        :return: None
+        """
+        chunks = (body,) if isinstance(body, bytes) else body
+        lines = [
+            f"HTTP/1.1 {status} {_REASONS[status]}",
+            *(f"{k}: {v}" for k, v in headers),
+            f"Content-Length: {sum(len(c) for c in chunks)}",
+        ]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if method != "HEAD":
+            writer.writelines(chunks)
+        await writer.drain()
+
+
+async def serve(host: str, port: int) -> None:
+    """
+    Runs the exporter with the built-in HTTP server until SIGINT or SIGTERM.
+
+    :param host: The address to listen on.
+    :param port: The port to listen on.
+    :return: None
+    """
+    state = ExporterState()
+    server = HttpServer(state, host, port)
+    await state.start()
+    try:
+        await server.start()
+        await wait_for_shutdown_signal()
+    finally:
+        await server.stop()
+        await state.stop()
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import tempfile
+from typing import NamedTuple
+
+# seq, generation, then the length of each section
+_HEADER = struct.Struct("<QQQQQQQ")
+_SEQ = struct.Struct("<Q")
+
+# How often a reader retries while the writer is in the middle of a publish.
+READ_RETRIES = 1000
+
+
+class Published(NamedTuple):
+    generation: int
+    meta: memoryview
+    text: memoryview
+    text_gzip: memoryview
+    openmetrics: memoryview
+    openmetrics_gzip: memoryview
+
+
+def _default_dir() -> str | None:
+    """
+    Returns the directory for the region file, preferring tmpfs.
+
+    :return: ``/dev/shm`` if it exists, otherwise None for the temp directory.
+    """
+    return "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+class SnapshotRegion:
+    def __init__(self, path: str, size: int, create: bool = False) -> None:
+        """
+        Initializes a SnapshotRegion instance.
+
+        A fixed-size memory-mapped file shared between the collector process
+        (one writer) and the HTTP worker processes (readers). A publish is
+        guarded by a seqlock: the writer makes the sequence number odd, writes
+        the sections, and makes it even again; a reader copies the data out
+        and retries if the sequence number was odd or changed meanwhile.
+
+        Readers keep the last consistent copy and only copy again when the
+        sequence number moved, so a scrape between two publishes costs one
+        8-byte read of the mapping.
+
+        Args:
+            path (str): The path of the backing file.
+            size (int): The size of the region in bytes, including the header.
+            create (bool, optional): Whether to create (or truncate) the file.
+                Defaults to False.
+        """
+        if size <= _HEADER.size:
+            raise ValueError(f"size must be larger than {_HEADER.size} bytes, got {size}")
+        self.path = path
+        self.size = size
+        flags = os.O_RDWR | (os.O_CREAT | os.O_TRUNC if create else 0)
+        fd = os.open(path, flags, 0o600)
+        try:
+            if create:
+                os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._cached: tuple[int, Published] | None = None
+
+    @classmethod
+    def create(cls, size: int, directory: str | None = None) -> SnapshotRegion:
+        """
+        Creates a region backed by a new temporary file.
+
+        :param size: The size of the region in bytes.
+        :param directory: The directory of the file. Defaults to ``/dev/shm`` if present.
+        :return: The new region.
+        """
+        fd, path = tempfile.mkstemp(
+            prefix="docker-healthcheck-exporter-", dir=directory or _default_dir()
+        )
+        os.close(fd)
+        return cls(path, size, create=True)
+
+    def close(self) -> None:
+        """
+        Unmaps the region.
+
+        :return: None
+        """
+        self._cached = None
+        self._mm.close()
+
+    def unlink(self) -> None:
+        """
+        Removes the backing file.
+
+        :return: None
+        """
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def publish(
+        self,
+        generation: int,
+        meta: bytes,
+        text: bytes,
+        text_gzip: bytes,
+        openmetrics: bytes,
+        openmetrics_gzip: bytes,
+    ) -> None:
+        """
+        Publishes a new version of the sections.
+
+        Must only be called from the single writer process.
+
+        :param generation: The snapshot generation of the sections.
+        :param meta: The compact snapshot and self-state as JSON.
+        :param text: The rendered metrics in the classic text format.
+        :param text_gzip: ``text`` as gzip members.
+        :param openmetrics: The rendered metrics in the OpenMetrics format, without ``# EOF``.
+        :param openmetrics_gzip: ``openmetrics`` as gzip members.
+        :return: None
+        """
+        sections = (meta, text, text_gzip, openmetrics, openmetrics_gzip)
+        total = _HEADER.size + sum(len(s) for s in sections)
+        if total > self.size:
+            raise ValueError(f"snapshot of {total} bytes does not fit the {self.size} byte region")
+        mm = self._mm
+        seq = _SEQ.unpack_from(mm, 0)[0]
+        _SEQ.pack_into(mm, 0, seq + 1)
+        _HEADER.pack_into(mm, 0, seq + 1, generation, *(len(s) for s in sections))
+        offset = _HEADER.size
+        for s in sections:
+            mm[offset : offset + len(s)] = s
+            offset += len(s)
+        _SEQ.pack_into(mm, 0, seq + 2)
+
+    def read(self) -> Published | None:
+        """
+        Returns the latest consistent publish.
+
+        :return: The published sections, or None if nothing was published yet.
+            If the writer kept the region busy for `READ_RETRIES` attempts, the
+            previous consistent copy is returned.
+        """
+        mm = self._mm
+        for _ in range(READ_RETRIES):
+            seq = _SEQ.unpack_from(mm, 0)[0]
+            if seq == 0:
+                return None
+            if seq & 1:
+                continue
+            cached = self._cached
+            if cached is not None and cached[0] == seq:
+                return cached[1]
+            _, generation, *lengths = _HEADER.unpack_from(mm, 0)
+            data = mm[_HEADER.size : _HEADER.size + sum(lengths)]
+            if _SEQ.unpack_from(mm, 0)[0] != seq:
+                continue
+            view = memoryview(data)
+            parts = []
+            offset = 0
+            for n in lengths:
+                parts.append(view[offset : offset + n])
+                offset += n
+            published = Published(generation, *parts)
+            self._cached = (seq, published)
+            return published
+        cached = self._cached
+        return cached[1] if cached is not None else None
@@ -0,0 +1,668 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import signal
+import time
+from dataclasses import replace
+
+from docker_healthcheck_exporter.aggregates import Aggregates
+from docker_healthcheck_exporter.collector import ContainerStatus, DockerCollector, tls_context
+from docker_healthcheck_exporter.config import load_settings
+from docker_healthcheck_exporter.instruments import Instruments
+from docker_healthcheck_exporter.logger import get_logger
+from docker_healthcheck_exporter.metrics import (
+    OPENMETRICS_EOF,
+    Exposition,
+    container_exposition,
+    limit_series,
+    render_self_metrics,
+)
+from docker_healthcheck_exporter.pool import CollectorPool
+from docker_healthcheck_exporter.shm import SnapshotRegion
+from docker_healthcheck_exporter.textfile import TextfileWriter
+from docker_healthcheck_exporter.transitions import TransitionTracker
+
+logger = get_logger(__name__)
+
+# How long shutdown waits for a pending METRICS_FILE write.
+TEXTFILE_FLUSH_TIMEOUT_SECONDS = 5.0
+
+_OPENMETRICS_EOF_GZIP = gzip.compress(OPENMETRICS_EOF, mtime=0)
+
+
+async def wait_for_shutdown_signal() -> None:
+    """
+    Waits until the process receives SIGINT or SIGTERM.
+
+    :return: None
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+
+
+class ExporterState:
+    def __init__(self) -> None:
+        """
+        Initializes the exporter state.
+
+        This includes loading the configuration, creating a collector
+        instance, and initializing the state variables.
+
+        :return: None
+        """
+        self.settings = load_settings()
+        self.instruments = Instruments()
+        self.collector: DockerCollector | CollectorPool
+        if self.settings.docker_hosts:
+            self.collector = CollectorPool(
+                hosts=self.settings.docker_hosts,
+                ignore_list=self.settings.services_ignore_list,
+                include_label=self.settings.include_label,
+                max_concurrency=self.settings.max_concurrency,
+                collect_mode=self.settings.collect_mode,
+                inspect_cache_size=self.settings.inspect_cache_size,
+                inspect_timeout_seconds=self.settings.inspect_timeout_seconds,
+                adaptive_concurrency=self.settings.adaptive_concurrency,
+                latency_target_seconds=self.settings.inspect_latency_target_seconds,
+                ssl_context=tls_context(
+                    self.settings.docker_tls_verify, self.settings.docker_cert_path
+                ),
+                retry_interval_seconds=max(1.0, self.settings.refresh_interval_seconds),
+                refresh_wait_seconds=max(1.0, self.settings.refresh_interval_seconds),
+                health_probe_metrics=self.settings.health_probe_metrics,
+                stats_budget_calls=self.settings.stats_budget_calls,
+                stats_budget_seconds=self.settings.stats_budget_seconds,
+                instruments=self.instruments,
+                container_filter=self.settings.container_filter,
+                label_projection=tuple(k for k, _ in self.settings.container_labels),
+            )
+        else:
+            self.collector = DockerCollector(
+                ignore_list=self.settings.services_ignore_list,
+                include_label=self.settings.include_label,
+                max_concurrency=self.settings.max_concurrency,
+                collect_mode=self.settings.collect_mode,
+                inspect_cache_size=self.settings.inspect_cache_size,
+                inspect_timeout_seconds=self.settings.inspect_timeout_seconds,
+                adaptive_concurrency=self.settings.adaptive_concurrency,
+                latency_target_seconds=self.settings.inspect_latency_target_seconds,
+                docker_url=self.settings.docker_host,
+                health_probe_metrics=self.settings.health_probe_metrics,
+                stats_budget_calls=self.settings.stats_budget_calls,
+                stats_budget_seconds=self.settings.stats_budget_seconds,
+                instruments=self.instruments,
+                container_filter=self.settings.container_filter,
+                label_projection=tuple(k for k, _ in self.settings.container_labels),
+            )
+
+        self.textfile = (
+            TextfileWriter(
+                self.settings.metrics_file,
+                fsync=self.settings.metrics_file_fsync,
+                max_age_seconds=self.settings.metrics_file_max_age_seconds,
+                instruments=self.instruments,
+            )
+            if self.settings.metrics_file
+            else None
+        )
+
+        self.snapshot: dict[str, ContainerStatus] = {}
+        self.transitions = TransitionTracker(
+            retention_seconds=self.settings.transitions_retention_seconds
+        )
+        # maintained with the snapshot, exported with AGGREGATE_METRICS
+        self.aggregates = Aggregates()
+        self.generation: int = 0
+        self.last_ok_ts: float = 0.0
+
+        self.exporter_up: int = 0
+        self.refresh_errors_total: int = 0
+        self.refresh_duration_seconds: float = 0.0
+        # UNIX time the counters started, exported as OpenMetrics _created
+        self.started_at: float = time.time()
+        # exception type and UNIX time of the latest refresh error, for exemplars
+        self.last_refresh_error: tuple[str, float] | None = None
+
+        self._container_exposition: tuple[int, Exposition] | None = None
+        # keyed by format: True for OpenMetrics, False for the classic text format
+        self._container_block: dict[bool, tuple[int, bytes]] = {}
+        self._container_block_gzip: dict[bool, tuple[int, bytes]] = {}
+        self.response_size_bytes: dict[str, int] = {}
+        self.compression_ratio: float | None = None
+        # whether the last rendered generation exceeded MAX_CONTAINER_SERIES, to warn once
+        self._series_capped: bool = False
+        # set in the collector process of HTTP_WORKERS mode
+        self.region: SnapshotRegion | None = None
+
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._scrape_refresh: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """
+        Starts the exporter.
+
+        This method starts the Docker collector and schedules the refresh
+        loop.
+
+        :return: None
+        """
+        logger.info("Starting exporter")
+        await self.collector.start()
+        self._task = asyncio.create_task(self._loop(), name="docker-refresh-loop")
+
+    async def stop(self) -> None:
+        """
+        Stops the exporter.
+
+        This method stops the Docker collector and cancels the refresh loop.
+
+        :return: None
+        """
+        logger.info("Stopping exporter")
+        self._stop.set()
+        if self._scrape_refresh is not None:
+            self._scrape_refresh.cancel()
+            await asyncio.gather(self._scrape_refresh, return_exceptions=True)
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.textfile is not None:
+            try:
+                await asyncio.wait_for(
+                    self.textfile.flush(), timeout=TEXTFILE_FLUSH_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"Metrics file write did not finish within {TEXTFILE_FLUSH_TIMEOUT_SECONDS}s, "
+                    "giving up on it"
+                )
+        await self.collector.stop()
+
+    async def run_once(self) -> bool:
+        """
+        Collects a single snapshot and writes it to the metrics file, if any.
+
+        Runs without the refresh loop, for cron jobs and systemd timers. A
+        failed metrics file write raises instead of being logged.
+
+        :return: True if the collection succeeded, False otherwise.
+        """
+        await self.collector.start()
+        try:
+            ok = await self._refresh()
+        finally:
+            await self.collector.stop()
+        if self.textfile is not None:
+            await self.textfile.write(self._render_head() + self._render_container_block())
+        return ok
+
+    async def _loop(self) -> None:
+        """
+        Internal loop that runs the exporter.
+
+        This method runs an infinite loop that waits for the configured
+        refresh interval, collects the container health status, and updates
+        the exporter's metrics.
+
+        If the configured metrics file is set, the loop will write the metrics
+        to the file after each successful collection.
+
+        In "events" refresh mode the loop is delegated to `_events_loop`. In
+        "scrape" refresh mode there is no loop; see `ensure_fresh`.
+
+        :return: None
+        """
+        if self.settings.refresh_mode == "events":
+            await self._events_loop()
+            return
+        if self.settings.refresh_mode == "scrape":
+            return
+
+        interval = max(1.0, self.settings.refresh_interval_seconds)
+        while not self._stop.is_set():
+            await self._refresh()
+            self._write_metrics()
+            await self._sleep(interval)
+
+    def ready(self) -> bool:
+        """
+        Checks whether metrics can be served.
+
+        Always True: before the first refresh the self-metrics already report
+        exporter_up=0.
+
+        :return: True
+        """
+        return True
+
+    async def ensure_fresh(self) -> None:
+        """
+        Refreshes the snapshot for a scrape in the "scrape" refresh mode.
+
+        A refresh is started only if the last successful one is older than
+        `SCRAPE_MAX_AGE_SECONDS`. Concurrent scrapes share the one in-flight
+        refresh instead of starting their own. A scrape waits at most
+        `SCRAPE_TIMEOUT_SECONDS` and is then served the last snapshot, while
+        the refresh keeps running for the next scrape.
+
+        In the other refresh modes this method returns immediately.
+
+        :return: None
+        """
+        if self.settings.refresh_mode != "scrape":
+            return
+        if (
+            self.last_ok_ts
+            and time.time() - self.last_ok_ts <= self.settings.scrape_max_age_seconds
+        ):
+            return
+        task = self._scrape_refresh
+        if task is None or task.done():
+            task = asyncio.create_task(self._refresh_for_scrape(), name="docker-scrape-refresh")
+            self._scrape_refresh = task
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(task), timeout=self.settings.scrape_timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Refresh did not finish within {self.settings.scrape_timeout_seconds}s, "
+                "serving the last snapshot"
+            )
+
+    async def _refresh_for_scrape(self) -> None:
+        """
+        Runs one scrape-triggered refresh and writes the metrics file.
+
+        :return: None
+        """
+        await self._refresh()
+        self._write_metrics()
+
+    async def _events_loop(self) -> None:
+        """
+        Internal loop for the "events" refresh mode.
+
+        The loop takes one full snapshot and then follows the Docker events
+        stream, re-inspecting only the containers named in the events. The
+        stream is replayed from the time the full snapshot was started, so
+        no event is lost in between. A full resync is done every
+        `EVENTS_RESYNC_SECONDS` and whenever the stream fails or ends.
+
+        :return: None
+        """
+        interval = max(1.0, self.settings.refresh_interval_seconds)
+        resync = max(interval, self.settings.events_resync_seconds)
+        while not self._stop.is_set():
+            since = time.time()
+            if await self._refresh():
+                self._write_metrics()
+                try:
+                    await asyncio.wait_for(self._follow_events(since, interval), timeout=resync)
+                    logger.warning("Docker events stream ended, resyncing")
+                except asyncio.TimeoutError:
+                    continue
+                except Exception as e:
+                    self.refresh_errors_total += 1
+                    self.last_refresh_error = (type(e).__name__, time.time())
+                    self.exporter_up = 0
+                    logger.exception("Failed to follow Docker events")
+            else:
+                self._write_metrics()
+            await self._sleep(interval)
+
+    async def _follow_events(self, since: float, interval: float) -> None:
+        """
+        Applies Docker events to the snapshot until the stream ends.
+
+        The snapshot counts as fresh after each applied event. On an idle
+        heartbeat the daemon is probed with a cheap API call first, since a
+        quiet stream may also be a stalled connection or a hung daemon; if the
+        probe fails the stream is given up and the caller resyncs.
+
+        :param since: Replay events newer than this UNIX timestamp.
+        :param interval: Heartbeat and metrics file write interval in seconds.
+        :return: None
+        """
+        written = time.monotonic()
+        async for item in self.collector.events(since=since, heartbeat=interval):
+            if item is not None:
+                await self._apply_event(*item)
+            else:
+                try:
+                    await asyncio.wait_for(self.collector.ping(), timeout=interval)
+                except Exception as e:
+                    raise RuntimeError("Docker daemon did not answer the heartbeat probe") from e
+            self.last_ok_ts = time.time()
+            self.exporter_up = 1
+            if item is None or time.monotonic() - written >= interval:
+                self._write_metrics()
+                written = time.monotonic()
+
+    async def _apply_event(self, action: str, container_id: str) -> None:
+        """
+        Patches the snapshot for a single container event.
+
+        The generation only advances if the snapshot, the transitions or the
+        aggregates changed, so events on filtered-out containers and
+        re-inspects with an unchanged result keep the rendered output cached.
+
+        :param action: The event action, one of `EVENT_ACTIONS`.
+        :param container_id: The full container id from the event.
+        :return: None
+        """
+        short_id = container_id[:12]
+        try:
+            st = None if action == "destroy" else await self.collector.inspect_one(container_id)
+        except Exception:
+            logger.exception(f"Failed to inspect container {short_id}, keeping last known status")
+            self._mark_stale(short_id)
+            return
+        now = time.time()
+        changed = False
+        for name in [n for n, cur in self.snapshot.items() if cur.container_id == short_id]:
+            if st is not None and name == st.name:
+                continue
+            del self.snapshot[name]
+            self.transitions.remove(name, now)
+            self.aggregates.remove(name)
+            changed = True
+        if st is not None:
+            prev = self.snapshot.get(st.name)
+            if prev != st:
+                self.snapshot[st.name] = prev = st
+                changed = True
+            changed = self.transitions.observe(st.name, prev, now) or changed
+            changed = self.aggregates.observe(st.name, prev) or changed
+        if changed:
+            self.generation += 1
+
+    def _mark_stale(self, short_id: str) -> None:
+        """
+        Marks the snapshot entries of a container as stale.
+
+        :param short_id: The 12 character container id.
+        :return: None
+        """
+        now = time.time()
+        for name, cur in list(self.snapshot.items()):
+            if cur.container_id == short_id and not cur.stale_since:
+                self.snapshot[name] = replace(cur, stale_since=now)
+                self.transitions.observe(name, self.snapshot[name], now)
+                self.aggregates.observe(name, self.snapshot[name])
+                self.generation += 1
+
+    async def _refresh(self) -> bool:
+        """
+        Replaces the snapshot with a full collection.
+
+        :return: True if the collection succeeded, False otherwise.
+        """
+        t0 = time.perf_counter()
+        try:
+            snap = await self.collector.collect()
+            tracked = self.transitions.update(snap, time.time())
+            if tracked or snap != self.snapshot:
+                self.snapshot = snap
+                self.aggregates.update(snap)
+                self.generation += 1
+            self.last_ok_ts = time.time()
+            self.exporter_up = 1
+            return True
+        except Exception as e:
+            self.refresh_errors_total += 1
+            self.last_refresh_error = (type(e).__name__, time.time())
+            self.exporter_up = 0
+            logger.exception("Failed to collect Docker health status")
+            return False
+        finally:
+            self.refresh_duration_seconds = max(0.0, time.perf_counter() - t0)
+            self.instruments.observe("refresh", self.refresh_duration_seconds)
+
+    def _write_metrics(self) -> None:
+        """
+        Schedules a write of the metrics to the configured metrics file, if
+        any, and publishes them to the shared snapshot region, if any.
+
+        The file write runs in the background and is skipped when the
+        container block, exporter_up and refresh_errors_total are unchanged;
+        the other self-metrics in the file are refreshed at least every
+        `METRICS_FILE_MAX_AGE_SECONDS`.
+
+        :return: None
+        """
+        if self.region is not None:
+            self._publish(self.region)
+        if self.textfile is None:
+            return
+        block = self._render_container_block()
+        fingerprint = f"{self.exporter_up} {self.refresh_errors_total}\n".encode() + block
+        self.textfile.submit(self._render_head() + block, fingerprint)
+
+    def _publish(self, region: SnapshotRegion) -> None:
+        """
+        Publishes the rendered metrics and a compact snapshot to a shared region.
+
+        The self-metrics are published without the snapshot age, which the
+        HTTP workers render per scrape from ``last_ok_ts`` in the metadata.
+
+        :param region: The region to publish to.
+        :return: None
+        """
+        meta = {
+            "instance_name": self.settings.instance_name,
+            "last_ok_ts": self.last_ok_ts,
+            "exporter_up": self.exporter_up,
+            "containers": {name: st.status for name, st in self.snapshot.items()},
+        }
+        head = self._render_head(with_age=False)
+        head_om = self._render_head(openmetrics=True, with_age=False)
+        try:
+            region.publish(
+                self.generation,
+                json.dumps(meta, separators=(",", ":")).encode("utf-8"),
+                head + self._render_container_block(),
+                gzip.compress(head, mtime=0) + self._render_container_block_gzip(),
+                head_om + self._render_container_block(openmetrics=True),
+                gzip.compress(head_om, mtime=0)
+                + self._render_container_block_gzip(openmetrics=True),
+            )
+        except ValueError:
+            logger.exception("Failed to publish the snapshot, increase SNAPSHOT_SHM_BYTES")
+
+    async def _sleep(self, seconds: float) -> None:
+        """
+        Waits for the given number of seconds or until the exporter is stopped.
+
+        :param seconds: The number of seconds to wait.
+        :return: None
+        """
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def metrics_bytes(self, openmetrics: bool = False) -> bytes:
+        """
+        Returns the encoded metrics for the exporter.
+
+        The per-container block is rendered once per snapshot generation and
+        cached as bytes; only the small self-metrics (such as
+        snapshot_age_seconds) are rendered per call. The snapshot_age_seconds
+        metric is calculated by subtracting the last_ok_ts from the current time.
+
+        :param openmetrics: True for the OpenMetrics format, False for the classic text format.
+        :return: The metrics for the exporter as UTF-8 bytes.
+        :rtype: bytes
+        """
+        body = self._render_head(openmetrics) + self._render_container_block(openmetrics)
+        if openmetrics:
+            body += OPENMETRICS_EOF
+        self.response_size_bytes["identity"] = len(body)
+        return body
+
+    def metrics_gzip(self, openmetrics: bool = False) -> bytes:
+        """
+        Returns the gzip-compressed metrics for the exporter.
+
+        The body is a multi-member gzip stream: the self-metrics are
+        compressed per call, while the per-container block is compressed once
+        per snapshot generation and reused. Decoders concatenate the members.
+
+        :param openmetrics: True for the OpenMetrics format, False for the classic text format.
+        :return: The metrics for the exporter as gzip-compressed UTF-8 bytes.
+        :rtype: bytes
+        """
+        body = gzip.compress(self._render_head(openmetrics), mtime=0)
+        body += self._render_container_block_gzip(openmetrics)
+        if openmetrics:
+            body += _OPENMETRICS_EOF_GZIP
+        self.response_size_bytes["gzip"] = len(body)
+        return body
+
+    def metrics_text(self) -> str:
+        """
+        Returns a string containing the metrics for the exporter.
+
+        :return: A string containing the metrics for the exporter.
+        :rtype: str
+        """
+        return (self._render_head() + self._render_container_block()).decode("utf-8")
+
+    def _render_head(self, openmetrics: bool = False, with_age: bool = True) -> bytes:
+        """
+        Renders the self-metrics for the current call.
+
+        :param openmetrics: True for the OpenMetrics format, False for the classic text format.
+        :param with_age: Whether to include the snapshot age.
+        :return: The rendered self-metrics as UTF-8 bytes.
+        """
+        now = time.time()
+        age = (now - self.last_ok_ts) if self.last_ok_ts else float("inf")
+        refresh_error = self.last_refresh_error
+        inspect_failure = self.collector.last_inspect_failure
+        return render_self_metrics(
+            instance_name=self.settings.instance_name,
+            exporter_up=self.exporter_up,
+            refresh_errors_total=self.refresh_errors_total,
+            refresh_duration_seconds=self.refresh_duration_seconds,
+            snapshot_age_seconds=(age if age != float("inf") else 0.0) if with_age else None,
+            inspect_cache_hits_total=self.collector.cache_hits_total,
+            inspect_cache_misses_total=self.collector.cache_misses_total,
+            inspect_failures_total=self.collector.inspect_failures_total,
+            inspect_concurrency_limit=self.collector.limiter.limit,
+            inspect_latency=self.collector.limiter.latency,
+            stats_failures_total=(
+                self.collector.stats_failures_total if self.settings.stats_budget_calls else None
+            ),
+            hosts=(
+                self.collector.host_status() if isinstance(self.collector, CollectorPool) else None
+            ),
+            response_size_bytes=self.response_size_bytes,
+            compression_ratio=self.compression_ratio,
+            phases=self.instruments.phases,
+            api_calls=self.instruments.api_calls,
+            series_dropped=self.series_dropped if self.settings.max_container_series else None,
+            created=self.started_at,
+            refresh_error_exemplar=(
+                ({"error": refresh_error[0]}, refresh_error[1]) if refresh_error else None
+            ),
+            inspect_failure_exemplar=(
+                ({"container_id": inspect_failure[0]}, inspect_failure[1])
+                if inspect_failure
+                else None
+            ),
+            openmetrics=openmetrics,
+        ).encode("utf-8")
+
+    @property
+    def series_dropped(self) -> int:
+        """
+        Returns the number of containers the series cap currently leaves out.
+
+        Derived from the snapshot itself, so the self-metrics always agree with
+        the per-container block rendered for the same snapshot.
+
+        :return: The number of containers beyond MAX_CONTAINER_SERIES, 0 without a cap.
+        """
+        cap = self.settings.max_container_series
+        return max(0, len(self.snapshot) - cap) if cap else 0
+
+    def _container_metrics(self) -> Exposition:
+        """
+        Returns the per-container metrics for the current generation.
+
+        Both output formats are rendered from this one cached exposition.
+        With MAX_CONTAINER_SERIES, containers beyond the cap are left out
+        (see `series_dropped`).
+
+        :return: The per-container metrics.
+        """
+        cached = self._container_exposition
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        t0 = time.perf_counter()
+        snapshot, dropped = limit_series(self.snapshot, self.settings.max_container_series)
+        transitions = self.transitions.tracked
+        if dropped and not self._series_capped:
+            logger.warning(
+                f"{len(self.snapshot)} containers exceed MAX_CONTAINER_SERIES="
+                f"{self.settings.max_container_series}, leaving {dropped} out"
+            )
+        self._series_capped = bool(dropped)
+        if dropped:
+            transitions = {k: t for k, t in transitions.items() if k in snapshot or t.removed_at}
+        exposition = container_exposition(
+            instance_name=self.settings.instance_name,
+            snapshot=snapshot,
+            transitions=transitions,
+            extra_label_names=[name for _, name in self.settings.container_labels],
+            info_series=self.settings.container_info_series,
+            aggregates=self.aggregates if self.settings.aggregate_metrics else None,
+        )
+        self.instruments.observe("render", time.perf_counter() - t0)
+        self._container_exposition = (self.generation, exposition)
+        return exposition
+
+    def _render_container_block(self, openmetrics: bool = False) -> bytes:
+        """
+        Returns the per-container metrics block for the current generation.
+
+        :param openmetrics: True for the OpenMetrics format, False for the classic text format.
+        :return: The rendered per-container metrics as UTF-8 bytes.
+        """
+        cached = self._container_block.get(openmetrics)
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        block = self._container_metrics().render(openmetrics).encode("utf-8")
+        self._container_block[openmetrics] = (self.generation, block)
+        return block
+
+    def _render_container_block_gzip(self, openmetrics: bool = False) -> bytes:
+        """
+        Returns the gzip-compressed per-container block for the current generation.
+
+        :param openmetrics: True for the OpenMetrics format, False for the classic text format.
+        :return: The per-container metrics as a gzip member.
+        """
+        cached = self._container_block_gzip.get(openmetrics)
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        raw = self._render_container_block(openmetrics)
+        block = gzip.compress(raw, mtime=0)
+        self._container_block_gzip[openmetrics] = (self.generation, block)
+        self.compression_ratio = len(raw) / len(block)
+        return block
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import aiodocker
+
+from docker_healthcheck_exporter.instruments import Instruments
+from docker_healthcheck_exporter.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class ContainerStats:
+    cpu_seconds_total: float
+    memory_usage_bytes: int
+    memory_limit_bytes: int
+    pids: int
+    # UNIX time the sample was taken
+    sampled_at: float
+
+
+def _parse_stats(payload: dict, sampled_at: float) -> ContainerStats:
+    """
+    Extract the exported numbers from a ``GET /containers/{id}/stats`` payload.
+
+    Memory usage excludes the inactive page cache, the same as ``docker stats``
+    (``inactive_file`` on cgroup v2, ``total_inactive_file`` on cgroup v1).
+
+    Args:
+        payload (dict): The stats payload.
+        sampled_at (float): The UNIX time of the sample.
+
+    Returns:
+        ContainerStats: The parsed sample.
+    """
+    cpu = (payload.get("cpu_stats") or {}).get("cpu_usage") or {}
+    mem = payload.get("memory_stats") or {}
+    mem_stats = mem.get("stats") or {}
+    inactive = mem_stats.get("inactive_file", mem_stats.get("total_inactive_file", 0)) or 0
+    usage = int(mem.get("usage") or 0)
+    return ContainerStats(
+        cpu_seconds_total=int(cpu.get("total_usage") or 0) / 1e9,
+        memory_usage_bytes=max(0, usage - int(inactive)) if usage else 0,
+        memory_limit_bytes=int(mem.get("limit") or 0),
+        pids=int((payload.get("pids_stats") or {}).get("current") or 0),
+        sampled_at=sampled_at,
+    )
+
+
+class StatsSampler:
+    def __init__(
+        self,
+        budget_calls: int,
+        budget_seconds: float = 2.0,
+        instruments: Instruments | None = None,
+    ) -> None:
+        """
+        Initializes a StatsSampler instance.
+
+        Each call to `sample` takes at most ``budget_calls`` one-shot stats
+        samples and waits at most ``budget_seconds`` for them. Up to half of
+        the calls go to priority containers (unhealthy or failing), oldest
+        sample first; the rest rotate through all remaining containers by
+        sample age, so at least half of the budget always goes round-robin and
+        no container is starved.
+
+        Args:
+            budget_calls (int): The maximum number of stats calls per refresh.
+            budget_seconds (float, optional): The maximum time spent per refresh.
+                Defaults to 2.
+            instruments (Instruments | None, optional): Counts the stats API calls.
+                Defaults to None.
+
+        Attributes:
+            samples (dict[str, ContainerStats]): The latest sample per short container id.
+            failures_total (int): The number of failed or timed out stats calls.
+        """
+        self.budget_calls = max(1, budget_calls)
+        self.budget_seconds = budget_seconds
+        self.samples: dict[str, ContainerStats] = {}
+        self.failures_total = 0
+        self.instruments = instruments or Instruments()
+
+    def pick(self, running: Iterable[tuple[str, bool]]) -> list[str]:
+        """
+        Chooses the containers to sample in this refresh.
+
+        :param running: ``(short_id, priority)`` for every running container.
+        :return: The short ids to sample, at most `budget_calls`.
+        """
+
+        def age(cid: str) -> float:
+            s = self.samples.get(cid)
+            return s.sampled_at if s is not None else 0.0
+
+        ids = list(running)
+        urgent = sorted((cid for cid, prio in ids if prio), key=age)
+        picked = urgent[: self.budget_calls // 2]
+        chosen = set(picked)
+        rest = sorted((cid for cid, _ in ids if cid not in chosen), key=age)
+        return picked + rest[: self.budget_calls - len(picked)]
+
+    async def sample(self, docker: aiodocker.Docker, running: list[tuple[str, bool]]) -> None:
+        """
+        Samples the stats of the picked containers within the budget.
+
+        Calls that do not finish within `budget_seconds` are cancelled, and
+        samples of containers that are no longer running are dropped.
+
+        :param docker: The aiodocker client.
+        :param running: ``(short_id, priority)`` for every running container.
+        :return: None
+        """
+        alive = {cid for cid, _ in running}
+        for cid in [k for k in self.samples if k not in alive]:
+            del self.samples[cid]
+        picked = self.pick(running)
+        if not picked:
+            return
+        tasks = [asyncio.create_task(self._sample_one(docker, cid)) for cid in picked]
+        _, pending = await asyncio.wait(tasks, timeout=self.budget_seconds)
+        for t in pending:
+            t.cancel()
+        if pending:
+            self.failures_total += len(pending)
+            for _ in pending:
+                self.instruments.count("containers/{id}/stats", "timeout")
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _sample_one(self, docker: aiodocker.Docker, container_id: str) -> None:
+        """
+        Takes one stats sample.
+
+        Uses ``stream=false`` with ``one-shot=true`` so the daemon answers from
+        a single read instead of waiting for a second CPU sample.
+
+        :param docker: The aiodocker client.
+        :param container_id: The short container id.
+        :return: None
+        """
+        try:
+            payload = await self.instruments.call(
+                "containers/{id}/stats",
+                docker._query_json(
+                    f"containers/{container_id}/stats",
+                    params={"stream": "false", "one-shot": "true"},
+                ),
+            )
+        except Exception as e:
+            self.failures_total += 1
+            logger.debug(f"Failed to sample stats of container {container_id}: {e!r}")
+            return
+        self.samples[container_id] = _parse_stats(payload, time.time())
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import time
+
+from docker_healthcheck_exporter.instruments import Instruments
+from docker_healthcheck_exporter.logger import get_logger
+
+logger = get_logger(__name__)
+
+FSYNC_POLICIES = ("none", "file", "dir")
+
+
+class TextfileWriter:
+    def __init__(
+        self,
+        path: str,
+        fsync: str = "none",
+        max_age_seconds: float = 60.0,
+        instruments: Instruments | None = None,
+    ) -> None:
+        """
+        Initializes a TextfileWriter instance.
+
+        The writer atomically replaces ``path`` with new content for
+        textfile collectors. Writes run in a worker thread, so a stalled
+        disk cannot block the event loop, and content that did not change
+        since the last write is skipped.
+
+        Args:
+            path (str): The path of the metrics file.
+            fsync (str, optional): "none" to rely on the page cache, "file" to fsync the
+                temporary file before the rename, or "dir" to also fsync the directory
+                after the rename. Defaults to "none".
+            max_age_seconds (float, optional): Rewrite unchanged content at least this
+                often, so timestamps and timing gauges in the file do not go stale.
+                Defaults to 60.
+            instruments (Instruments | None, optional): Records the duration of each
+                write as the "textfile_write" phase. Defaults to None.
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = path
+        self.fsync = fsync
+        self.max_age_seconds = max_age_seconds
+        self.instruments = instruments or Instruments()
+
+        self._digest: bytes | None = None
+        self._written_at: float = 0.0
+        self._pending: tuple[bytes, bytes] | None = None
+        self._task: asyncio.Task | None = None
+        self._dir_ready = False
+
+    def submit(self, content: bytes, fingerprint: bytes | None = None) -> bool:
+        """
+        Schedules a write of ``content`` unless it is unchanged.
+
+        Only the latest content is kept while a write is in flight, so
+        repeated submits during a slow write coalesce into one write.
+
+        :param content: The full file content.
+        :param fingerprint: The bytes used for change detection instead of the
+            full content, e.g. without volatile timing gauges.
+        :return: True if a write was scheduled, False if it was skipped.
+        """
+        digest = hashlib.sha256(content if fingerprint is None else fingerprint).digest()
+        fresh = time.monotonic() - self._written_at < self.max_age_seconds
+        if (digest == self._digest and fresh) or (
+            self._pending is not None and self._pending[1] == digest
+        ):
+            return False
+        self._pending = (content, digest)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain(), name="metrics-file-writer")
+        return True
+
+    async def write(self, content: bytes) -> None:
+        """
+        Writes ``content`` now and waits for it, raising if the write fails.
+
+        Used by one-shot runs, which must fail loudly instead of logging.
+
+        :param content: The full file content.
+        :return: None
+        """
+        await self.flush()
+        await asyncio.to_thread(self._write, content)
+        self._digest = hashlib.sha256(content).digest()
+        self._written_at = time.monotonic()
+
+    async def flush(self) -> None:
+        """
+        Waits until all scheduled writes are done.
+
+        :return: None
+        """
+        if self._task is not None:
+            await self._task
+
+    async def _drain(self) -> None:
+        """
+        Writes pending content until nothing is left.
+
+        :return: None
+        """
+        while self._pending is not None:
+            content, digest = self._pending
+            self._pending = None
+            t0 = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, content)
+            except Exception:
+                logger.exception(f"Failed to write metrics file: {self.path}")
+                continue
+            finally:
+                self.instruments.observe("textfile_write", time.perf_counter() - t0)
+            self._digest = digest
+            self._written_at = time.monotonic()
+
+    def _write(self, content: bytes) -> None:
+        """
+        Atomically write content to the metrics file.
+
+        :param content: The file content.
+        :return: None
+        """
+        dir_name = os.path.dirname(self.path)
+        if dir_name and not self._dir_ready:
+            os.makedirs(dir_name, exist_ok=True)
+            self._dir_ready = True
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+            if self.fsync != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        if self.fsync == "dir":
+            fd = os.open(dir_name or ".", os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+from docker_healthcheck_exporter.collector import ContainerStatus
+
+
+class TrackedContainer:
+    __slots__ = ("status", "since", "transitions", "removed_at")
+
+    def __init__(self, status: ContainerStatus, since: float) -> None:
+        """
+        Initializes a TrackedContainer instance.
+
+        Args:
+            status (ContainerStatus): The last seen status of the container.
+            since (float): UNIX time since which the container is in its status.
+
+        Attributes:
+            transitions (dict[tuple[str, str], int]): Counts per ``(from, to)`` status text.
+            removed_at (float): UNIX time the container left the snapshot (0 = present).
+        """
+        self.status = status
+        self.since = since
+        self.transitions: dict[tuple[str, str], int] = {}
+        self.removed_at = 0.0
+
+
+class TransitionTracker:
+    def __init__(self, retention_seconds: float = 3600.0, max_tracked: int = 10000) -> None:
+        """
+        Initializes a TransitionTracker instance.
+
+        The tracker diffs consecutive snapshots, so flaps between two scrapes
+        still show up as counted transitions, and remembers since when each
+        container is in its current status.
+
+        Containers that leave the snapshot are kept for ``retention_seconds``
+        so their last transitions can still be scraped, then forgotten. At
+        most ``max_tracked`` containers are kept; beyond that the longest
+        removed ones are forgotten first.
+
+        Args:
+            retention_seconds (float, optional): How long removed containers are kept.
+                Defaults to 3600.
+            max_tracked (int, optional): The maximum number of tracked containers.
+                Defaults to 10000.
+        """
+        self.retention_seconds = retention_seconds
+        self.max_tracked = max(1, max_tracked)
+        self.tracked: dict[str, TrackedContainer] = {}
+
+    def observe(self, key: str, status: ContainerStatus, now: float) -> bool:
+        """
+        Records the current status of one container.
+
+        :param key: The snapshot key of the container.
+        :param status: The current status.
+        :param now: The current UNIX time.
+        :return: True if the tracked state changed.
+        """
+        cur = self.tracked.get(key)
+        if cur is None:
+            self.tracked[key] = TrackedContainer(status, now)
+            self._bound()
+            return True
+        changed = cur.removed_at != 0.0
+        cur.removed_at = 0.0
+        if cur.status.status != status.status:
+            edge = (cur.status.status_text, status.status_text)
+            cur.transitions[edge] = cur.transitions.get(edge, 0) + 1
+            cur.since = now
+            changed = True
+        if cur.status is not status:
+            changed = changed or cur.status != status
+            cur.status = status
+        return changed
+
+    def remove(self, key: str, now: float) -> bool:
+        """
+        Marks a container as gone from the snapshot.
+
+        :param key: The snapshot key of the container.
+        :param now: The current UNIX time.
+        :return: True if the tracked state changed.
+        """
+        cur = self.tracked.get(key)
+        if cur is None or cur.removed_at:
+            return False
+        cur.removed_at = now
+        return True
+
+    def update(self, snapshot: Mapping[str, ContainerStatus], now: float) -> bool:
+        """
+        Diffs a full snapshot against the tracked state.
+
+        Containers missing from the snapshot are marked removed, and removed
+        containers past the retention are forgotten.
+
+        :param snapshot: The new snapshot.
+        :param now: The current UNIX time.
+        :return: True if the tracked state changed.
+        """
+        changed = False
+        for key, st in snapshot.items():
+            changed = self.observe(key, st, now) or changed
+        expired = now - self.retention_seconds
+        for key, cur in list(self.tracked.items()):
+            if key in snapshot:
+                continue
+            if not cur.removed_at:
+                cur.removed_at = now
+                changed = True
+            elif cur.removed_at <= expired:
+                del self.tracked[key]
+                changed = True
+        return changed
+
+    def _bound(self) -> None:
+        """
+        Forgets containers until at most `max_tracked` are left.
+
+        Removed containers go first, oldest removal first; present ones are
+        only forgotten if there is nothing else left.
+
+        :return: None
+        """
+        excess = len(self.tracked) - self.max_tracked
+        if excess <= 0:
+            return
+        order = sorted(
+            self.tracked, key=lambda k: (not self.tracked[k].removed_at, self.tracked[k].removed_at)
+        )
+        for key in order[:excess]:
+            del self.tracked[key]
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import multiprocessing
+import signal
+import threading
+import time
+from multiprocessing.connection import wait
+
+from docker_healthcheck_exporter.config import Settings, load_settings
+from docker_healthcheck_exporter.logger import configure_logging, get_logger
+from docker_healthcheck_exporter.metrics import OPENMETRICS_EOF, render_snapshot_age
+from docker_healthcheck_exporter.server import Body, HttpServer
+from docker_healthcheck_exporter.shm import Published, SnapshotRegion
+from docker_healthcheck_exporter.state import ExporterState, wait_for_shutdown_signal
+
+logger = get_logger(__name__)
+
+# How long stopping waits for a worker process before killing it.
+WORKER_STOP_TIMEOUT_SECONDS = 10.0
+
+_OPENMETRICS_EOF_GZIP = gzip.compress(OPENMETRICS_EOF, mtime=0)
+
+
+class SharedSnapshot:
+    def __init__(self, region: SnapshotRegion) -> None:
+        """
+        Initializes a SharedSnapshot instance.
+
+        Serves the metrics the collector process published to ``region``.
+        Only the snapshot age is rendered per scrape; the published sections
+        are written to the socket as they are, without joining them.
+
+        Args:
+            region (SnapshotRegion): The region the collector publishes to.
+        """
+        self.region = region
+        self._meta: tuple[Published, str, float] | None = None
+
+    async def ensure_fresh(self) -> None:
+        """
+        Does nothing; the collector process refreshes on its own schedule.
+
+        :return: None
+        """
+
+    def _age(self, published: Published, openmetrics: bool) -> bytes:
+        """
+        Renders the snapshot age from the published metadata.
+
+        The metadata is decoded once per publish.
+
+        :param published: The published sections.
+        :param openmetrics: True for the OpenMetrics format.
+        :return: The rendered snapshot age as UTF-8 bytes.
+        """
+        cached = self._meta
+        if cached is None or cached[0] is not published:
+            info = json.loads(bytes(published.meta))
+            cached = (published, info["instance_name"], info["last_ok_ts"])
+            self._meta = cached
+        _, instance_name, last_ok_ts = cached
+        age = time.time() - last_ok_ts if last_ok_ts else 0.0
+        return render_snapshot_age(instance_name, age, openmetrics).encode("utf-8")
+
+    def ready(self) -> bool:
+        """
+        Checks whether the collector process has published metrics yet.
+
+        Until then the HTTP workers answer 503, so a scrape before the first
+        publish fails visibly instead of succeeding without any series.
+
+        :return: True after the first publish.
+        """
+        return self.region.read() is not None
+
+    def metrics_bytes(self, openmetrics: bool = False) -> Body:
+        """
+        Returns the published metrics.
+
+        :param openmetrics: True for the OpenMetrics format, False for the classic text format.
+        :return: The body chunks, empty before the first publish.
+        """
+        published = self.region.read()
+        if published is None:
+            return b""
+        age = self._age(published, openmetrics)
+        if openmetrics:
+            return (age, published.openmetrics, OPENMETRICS_EOF)
+        return (age, published.text)
+
+    def metrics_gzip(self, openmetrics: bool = False) -> Body:
+        """
+        Returns the published gzip-compressed metrics.
+
+        :param openmetrics: True for the OpenMetrics format, False for the classic text format.
+        :return: The body chunks as gzip members, empty before the first publish.
+        """
+        published = self.region.read()
+        if published is None:
+            return gzip.compress(b"", mtime=0)
+        age = gzip.compress(self._age(published, openmetrics), mtime=0)
+        if openmetrics:
+            return (age, published.openmetrics_gzip, _OPENMETRICS_EOF_GZIP)
+        return (age, published.text_gzip)
+
+
+async def _collect(region_path: str, size: int) -> None:
+    """
+    Runs the refresh loop and publishes every refresh until SIGINT or SIGTERM.
+
+    :param region_path: The path of the shared region.
+    :param size: The size of the shared region.
+    :return: None
+    """
+    region = SnapshotRegion(region_path, size)
+    state = ExporterState()
+    state.region = region
+    await state.start()
+    try:
+        await wait_for_shutdown_signal()
+    finally:
+        await state.stop()
+        region.close()
+
+
+async def _serve(region_path: str, size: int, host: str, port: int) -> None:
+    """
+    Serves the shared region over HTTP until SIGINT or SIGTERM.
+
+    :param region_path: The path of the shared region.
+    :param size: The size of the shared region.
+    :param host: The address to listen on.
+    :param port: The port to listen on.
+    :return: None
+    """
+    region = SnapshotRegion(region_path, size)
+    server = HttpServer(SharedSnapshot(region), host, port, reuse_port=True)
+    await server.start()
+    try:
+        await wait_for_shutdown_signal()
+    finally:
+        await server.stop()
+        region.close()
+
+
+def _collector_main(region_path: str, size: int) -> None:
+    configure_logging()
+    asyncio.run(_collect(region_path, size))
+
+
+def _http_main(region_path: str, size: int, host: str, port: int) -> None:
+    configure_logging()
+    asyncio.run(_serve(region_path, size, host, port))
+
+
+def run_workers(settings: Settings | None = None) -> int:
+    """
+    Runs one collector process and ``HTTP_WORKERS`` HTTP processes.
+
+    The collector process runs the refresh loop and publishes the rendered
+    metrics to a shared memory region after every refresh. The HTTP
+    processes share the listen port with SO_REUSEPORT and serve the region,
+    so scrapes never wait for JSON decoding or rendering in the collector.
+
+    Returns when SIGINT or SIGTERM is received, or as soon as any worker
+    process exits, stopping the others.
+
+    :param settings: The settings, loaded from the environment if None.
+    :return: The process exit code: 0 on a signal, 1 if a worker exited.
+    """
+    s = settings or load_settings()
+    region = SnapshotRegion.create(s.snapshot_shm_bytes)
+    ctx = multiprocessing.get_context("spawn")
+    procs = [
+        ctx.Process(
+            target=_collector_main,
+            args=(region.path, region.size),
+            name="docker-healthcheck-collector",
+        )
+    ]
+    procs += [
+        ctx.Process(
+            target=_http_main,
+            args=(region.path, region.size, s.listen_host, s.listen_port),
+            name=f"docker-healthcheck-http-{i}",
+        )
+        for i in range(s.http_workers)
+    ]
+
+    stop = threading.Event()
+    previous = {
+        sig: signal.signal(sig, lambda *_: stop.set()) for sig in (signal.SIGINT, signal.SIGTERM)
+    }
+    code = 0
+    try:
+        for p in procs:
+            p.start()
+        while not stop.is_set():
+            exited = wait([p.sentinel for p in procs], timeout=0.5)
+            if exited:
+                dead = [p for p in procs if p.sentinel in exited]
+                for p in dead:
+                    logger.error(f"Worker {p.name} exited with code {p.exitcode}, stopping")
+                code = 1
+                break
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT_SECONDS
+        for p in procs:
+            if p.pid is None:
+                continue
+            p.join(max(0.0, deadline - time.monotonic()))
+            if p.is_alive():
+                logger.warning(f"Worker {p.name} did not stop, killing it")
+                p.kill()
+                p.join()
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+        region.close()
+        region.unlink()
+    return code
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import random
+from dataclasses import replace
+
+from docker_healthcheck_exporter.aggregates import Aggregates, worst_status
+from docker_healthcheck_exporter.collector import ContainerStatus, ServiceStatus
+from docker_healthcheck_exporter.metrics import container_exposition
+
+
+def _status(name: str, status: int, project: str = "p", service: str = "s", image: str = "img"):
+    return ContainerStatus(
+        name=name,
+        status=status,
+        status_text=ServiceStatus(status).name,
+        container_id=name,
+        image=image,
+        compose_project=project,
+        compose_service=service,
+    )
+
+
+def _recount(snapshot: dict[str, ContainerStatus]) -> Aggregates:
+    fresh = Aggregates()
+    for key, st in snapshot.items():
+        fresh.observe(key, st)
+    return fresh
+
+
+def test_counts_and_worst_status() -> None:
+    agg = Aggregates()
+    assert agg.update({"a": _status("a", 2), "b": _status("b", 0), "c": _status("c", 2, "", "")})
+
+    assert agg.projects == {("", "p"): [0, 0, 1, 0, 1]}
+    assert agg.services == {("", "p", "s"): [0, 0, 1, 0, 1]}
+    assert agg.images == {("", "img"): [0, 0, 1, 0, 2]}
+    assert worst_status(agg.projects[("", "p")]) == int(ServiceStatus.UNHEALTHY)
+
+    assert agg.observe("b", _status("b", 2)) is True
+    assert agg.observe("b", _status("b", 2)) is False
+    assert worst_status(agg.projects[("", "p")]) == int(ServiceStatus.HEALTHY)
+
+    assert agg.remove("a") is True
+    assert agg.remove("a") is False
+    assert agg.update({}) is True
+    assert (agg.projects, agg.services, agg.images) == ({}, {}, {})
+
+
+def test_incremental_updates_match_a_full_recount() -> None:
+    rng = random.Random(7)
+    agg = Aggregates()
+    snapshot: dict[str, ContainerStatus] = {}
+    for _ in range(300):
+        snapshot = dict(snapshot)
+        for _ in range(rng.randint(1, 5)):
+            key = f"c{rng.randint(0, 30)}"
+            if key in snapshot and rng.random() < 0.3:
+                del snapshot[key]
+            else:
+                snapshot[key] = _status(
+                    key,
+                    rng.choice(list(ServiceStatus)),
+                    project=rng.choice(["", "shop", "billing"]),
+                    service=rng.choice(["", "web", "db"]),
+                    image=rng.choice(["a:1", "b:1"]),
+                )
+        if rng.random() < 0.5:
+            agg.update(snapshot)
+        else:
+            for key in [k for k in agg._members if k not in snapshot]:
+                agg.remove(key)
+            for key, st in snapshot.items():
+                agg.observe(key, st)
+        expected = _recount(snapshot)
+        assert (agg.projects, agg.services, agg.images) == (
+            expected.projects,
+            expected.services,
+            expected.images,
+        )
+
+
+def test_update_skips_unchanged_records() -> None:
+    a = _status("a", 2)
+    agg = Aggregates()
+    agg.update({"a": a})
+    assert agg.update({"a": a}) is False
+    assert agg.update({"a": replace(a, stale_since=1.0)}) is False
+    assert agg.update({"a": replace(a, status=-2)}) is True
+
+
+def test_render_aggregates() -> None:
+    snapshot = {
+        "a": _status("a", 2),
+        "b": _status("b", -1),
+        "x": replace(_status("x", 1, image="img"), docker_host="edge"),
+    }
+    agg = Aggregates()
+    agg.update(snapshot)
+
+    text = container_exposition("h", snapshot, aggregates=agg).render()
+
+    assert "# TYPE docker_compose_project_containers gauge" in text
+    assert (
+        'docker_compose_project_containers{instance="h",compose_project="p",status_text="FAIL"} 1'
+        in text
+    )
+    assert (
+        'docker_compose_project_containers{instance="h",compose_project="p",status_text="CRIT"} 0'
+        in text
+    )
+    assert 'docker_compose_project_worst_status{instance="h",compose_project="p"} -1' in text
+    assert (
+        'docker_compose_service_worst_status{instance="h",docker_host="edge",'
+        'compose_project="p",compose_service="s"} 1'
+    ) in text
+    assert 'docker_image_containers{instance="h",image="img",status_text="HEALTHY"} 1' in text
+    assert "docker_image_" not in container_exposition("h", snapshot).render()
@@ -1,16 +1,37 @@
 from __future__ import annotations
 
+import gzip
+
 import pytest
+from starlette.requests import Request
 
 import docker_healthcheck_exporter.app as app_module
 
 
+def _request(accept_encoding: str | None = None, accept: str | None = None) -> Request:
+    headers = []
+    if accept_encoding is not None:
+        headers.append((b"accept-encoding", accept_encoding.encode()))
+    if accept is not None:
+        headers.append((b"accept", accept.encode()))
+    return Request({"type": "http", "headers": headers})
+
+
 class DummyState:
     def __init__(self, text: str) -> None:
         self._text = text
+        self.fresh_calls = 0
+        self.formats: list[bool] = []
+
+    async def ensure_fresh(self) -> None:
+        self.fresh_calls += 1
+
+    def metrics_bytes(self, openmetrics: bool = False) -> bytes:
+        self.formats.append(openmetrics)
+        return self._text.encode("utf-8")
 
-    def metrics_text(self) -> str:
-        return self._text
+    def metrics_gzip(self, openmetrics: bool = False) -> bytes:
+        return gzip.compress(self.metrics_bytes())
 
 
 @pytest.mark.asyncio
@@ -18,8 +39,21 @@ async def test_metrics_endpoint(monkeypatch: pytest.MonkeyPatch) -> None:
     dummy = DummyState("metrics-ok")
     monkeypatch.setattr(app_module, "state", dummy)
 
-    result = await app_module.metrics()
-    assert result == "metrics-ok"
+    result = await app_module.metrics(_request())
+    assert result.body == b"metrics-ok"
+    assert result.media_type == "text/plain; version=0.0.4; charset=utf-8"
+    assert "content-encoding" not in result.headers
+
+    result = await app_module.metrics(_request("deflate, gzip;q=0.5"))
+    assert result.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(result.body) == b"metrics-ok"
+    assert dummy.fresh_calls == 2
+
+    result = await app_module.metrics(
+        _request(accept="application/openmetrics-text;version=1.0.0;q=0.5,text/plain;q=0.3")
+    )
+    assert result.media_type == "application/openmetrics-text; version=1.0.0; charset=utf-8"
+    assert dummy.formats == [False, False, True]
 
 
 @pytest.mark.asyncio
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 import asyncio
+import gzip
 import time
 from types import SimpleNamespace
 
 import pytest
 
 import docker_healthcheck_exporter.app as app_module
+import docker_healthcheck_exporter.state as state_module
 from docker_healthcheck_exporter.collector import ContainerStatus
+from docker_healthcheck_exporter.limiter import ConcurrencyLimiter
 
 
 class DummyCollector:
@@ -16,6 +19,11 @@ class DummyCollector:
         self._delay = delay
         self.started = False
         self.stopped = False
+        self.cache_hits_total = 0
+        self.cache_misses_total = 0
+        self.inspect_failures_total = 0
+        self.last_inspect_failure = None
+        self.limiter = ConcurrencyLimiter(1)
 
     async def start(self) -> None:
         self.started = True
@@ -32,19 +40,44 @@ class DummyCollector:
 
 
 def _make_state(
-    monkeypatch: pytest.MonkeyPatch, collector: DummyCollector, metrics_file: str | None = None
+    monkeypatch: pytest.MonkeyPatch,
+    collector: DummyCollector,
+    metrics_file: str | None = None,
+    refresh_mode: str = "poll",
 ):
     settings = SimpleNamespace(
         refresh_interval_seconds=0.01,
         services_ignore_list=set(),
         include_label=None,
+        container_filter=None,
+        container_labels=(),
+        max_container_series=0,
+        container_info_series=False,
+        aggregate_metrics=False,
         max_concurrency=1,
+        adaptive_concurrency=False,
+        inspect_latency_target_seconds=0.25,
         instance_name="test",
         metrics_file=metrics_file,
+        metrics_file_fsync="none",
+        metrics_file_max_age_seconds=60.0,
+        collect_mode="inspect",
+        inspect_cache_size=0,
+        inspect_timeout_seconds=1.0,
+        refresh_mode=refresh_mode,
+        events_resync_seconds=60.0,
+        docker_hosts=(),
+        health_probe_metrics=False,
+        scrape_max_age_seconds=5.0,
+        scrape_timeout_seconds=1.0,
+        transitions_retention_seconds=3600.0,
+        stats_budget_calls=0,
+        stats_budget_seconds=2.0,
+        docker_host=None,
     )
-    monkeypatch.setattr(app_module, "load_settings", lambda: settings)
-    monkeypatch.setattr(app_module, "DockerCollector", lambda **kwargs: collector)
-    return app_module.ExporterState()
+    monkeypatch.setattr(state_module, "load_settings", lambda: settings)
+    monkeypatch.setattr(state_module, "DockerCollector", lambda **kwargs: collector)
+    return state_module.ExporterState()
 
 
 @pytest.mark.asyncio
@@ -79,6 +112,97 @@ async def test_exporter_state_success_cycle(monkeypatch: pytest.MonkeyPatch) ->
     assert state.refresh_duration_seconds >= 0.0
 
 
+def _status(name: str, cid: str, status: int = 2) -> ContainerStatus:
+    return ContainerStatus(
+        name=name,
+        status=status,
+        status_text="HEALTHY" if status == 2 else "UNHEALTHY",
+        container_id=cid,
+        image="img",
+        compose_project="p",
+        compose_service="s",
+    )
+
+
+class EventsCollector(DummyCollector):
+    def __init__(self, snapshots, events, inspected) -> None:
+        super().__init__(snapshots)
+        self._events = list(events)
+        self._inspected = inspected
+        self.since: list[float | None] = []
+        self.pings = 0
+        self.ping_error: Exception | None = None
+
+    async def ping(self) -> None:
+        self.pings += 1
+        if self.ping_error is not None:
+            raise self.ping_error
+
+    async def inspect_one(self, container_id: str):
+        st = self._inspected.get(container_id)
+        if isinstance(st, Exception):
+            raise st
+        return st
+
+    async def events(self, since=None, heartbeat=None):
+        self.since.append(since)
+        while self._events:
+            yield self._events.pop(0)
+        await asyncio.sleep(3600)
+
+
+@pytest.mark.asyncio
+async def test_exporter_state_events_patch_snapshot(monkeypatch: pytest.MonkeyPatch) -> None:
+    initial = {"a": _status("a", "aaaaaaaaaaaa"), "b": _status("b", "bbbbbbbbbbbb")}
+    collector = EventsCollector(
+        [initial],
+        [
+            ("health_status", "aaaaaaaaaaaa0000"),
+            None,
+            ("destroy", "bbbbbbbbbbbb0000"),
+            ("rename", "cccccccccccc0000"),
+        ],
+        {
+            "aaaaaaaaaaaa0000": _status("a", "aaaaaaaaaaaa", status=0),
+            "cccccccccccc0000": _status("c", "cccccccccccc"),
+        },
+    )
+    state = _make_state(monkeypatch, collector, refresh_mode="events")
+
+    await state.start()
+    await asyncio.sleep(0.03)
+    try:
+        await state.stop()
+    except asyncio.CancelledError:
+        pass
+
+    assert collector.since and collector.since[0] is not None
+    assert set(state.snapshot) == {"a", "c"}
+    assert state.snapshot["a"].status == 0
+    assert state.exporter_up == 1
+    assert state.refresh_errors_total == 0
+    assert collector.pings == 1
+    assert state.transitions.tracked["a"].transitions == {("HEALTHY", "UNHEALTHY"): 1}
+    assert state.transitions.tracked["b"].removed_at > 0
+    # a unhealthy, c healthy; b destroyed
+    assert state.aggregates.projects == {("", "p"): [0, 0, 1, 0, 1]}
+
+
+async def test_events_heartbeat_probe_failure_does_not_refresh_age(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    collector = EventsCollector([{}], [None], {})
+    collector.ping_error = RuntimeError("daemon hung")
+    state = _make_state(monkeypatch, collector, refresh_mode="events")
+    state.last_ok_ts = 1.0
+
+    with pytest.raises(RuntimeError):
+        await state._follow_events(since=0.0, interval=1.0)
+
+    assert collector.pings == 1
+    assert state.last_ok_ts == 1.0
+
+
 @pytest.mark.asyncio
 async def test_exporter_state_error_cycle(monkeypatch: pytest.MonkeyPatch) -> None:
     collector = DummyCollector([])
@@ -149,3 +273,251 @@ async def test_metrics_file_write(tmp_path, monkeypatch: pytest.MonkeyPatch) ->
     assert metrics_path.exists()
     content = metrics_path.read_text()
     assert "docker_container_health_status" in content
+
+
+class FailingEventsCollector(EventsCollector):
+    async def events(self, since=None, heartbeat=None):
+        raise RuntimeError("stream broken")
+        yield  # pragma: no cover
+
+
+@pytest.mark.asyncio
+async def test_exporter_state_events_failure_counts_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    collector = FailingEventsCollector([{}], [], {})
+    state = _make_state(monkeypatch, collector, refresh_mode="events")
+
+    await state.start()
+    await asyncio.sleep(0.03)
+    try:
+        await state.stop()
+    except asyncio.CancelledError:
+        pass
+
+    assert state.exporter_up == 0
+    assert state.refresh_errors_total == 1
+
+
+@pytest.mark.asyncio
+async def test_container_block_cached_per_generation(monkeypatch: pytest.MonkeyPatch) -> None:
+    first = {"a": _status("a", "aaaaaaaaaaaa")}
+    collector = DummyCollector([first, dict(first), {"b": _status("b", "bbbbbbbbbbbb")}])
+    state = _make_state(monkeypatch, collector)
+
+    assert await state._refresh() is True
+    gen = state.generation
+    block = state._render_container_block()
+    assert state._render_container_block() is block
+
+    assert await state._refresh() is True
+    assert state.generation == gen
+    assert state._render_container_block() is block
+
+    assert await state._refresh() is True
+    assert state.generation == gen + 1
+    text = state.metrics_text()
+    assert 'name="b"' in text and 'name="a"' not in text
+    assert text.startswith("# HELP docker_healthcheck_exporter_up")
+
+
+@pytest.mark.asyncio
+async def test_metrics_gzip_reuses_compressed_block(monkeypatch: pytest.MonkeyPatch) -> None:
+    collector = DummyCollector([{"a": _status("a", "aaaaaaaaaaaa")}])
+    state = _make_state(monkeypatch, collector)
+    assert await state._refresh() is True
+    assert "compression_ratio" not in state.metrics_text()
+
+    body = state.metrics_gzip()
+    block = state._render_container_block_gzip()
+    assert body.endswith(block)
+    assert state._render_container_block_gzip() is block
+    assert gzip.decompress(body).endswith(state._render_container_block())
+    assert state.compression_ratio is not None and state.compression_ratio > 0
+    assert state.response_size_bytes["gzip"] == len(body)
+
+    plain = state.metrics_bytes()
+    assert state.response_size_bytes["identity"] == len(plain)
+    assert 'encoding="gzip"' in state.metrics_text()
+    assert "docker_healthcheck_exporter_compression_ratio{" in state.metrics_text()
+
+
+async def test_openmetrics_shares_container_exposition(monkeypatch: pytest.MonkeyPatch) -> None:
+    collector = DummyCollector([{"a": _status("a", "aaaaaaaaaaaa")}])
+    collector.last_inspect_failure = ("bbbbbbbbbbbb", 1700000000.0)
+    state = _make_state(monkeypatch, collector)
+    state.refresh_errors_total = 1
+    state.last_refresh_error = ("TimeoutError", 1700000001.0)
+    assert await state._refresh() is True
+
+    text = state.metrics_bytes()
+    exposition = state._container_metrics()
+    om = state.metrics_bytes(openmetrics=True)
+    assert state._container_metrics() is exposition
+    assert not text.endswith(b"# EOF\n")
+    assert om.endswith(b"# EOF\n") and om.count(b"# EOF") == 1
+    assert gzip.decompress(state.metrics_gzip(openmetrics=True)).endswith(
+        state._render_container_block(openmetrics=True) + b"# EOF\n"
+    )
+    assert b"# TYPE docker_healthcheck_exporter_refresh_errors counter" in om
+    assert b'_refresh_errors_total{instance="test"} 1 # {error="TimeoutError"} 1 1700000001.0' in om
+    assert b'# {container_id="bbbbbbbbbbbb"} 1 1700000000.0' in om
+    assert f'refresh_errors_created{{instance="test"}} {state.started_at}'.encode() in om
+    assert b"# UNIT docker_healthcheck_exporter_snapshot_age_seconds seconds" in om
+    assert b"_created" not in text and b"# {" not in text
+
+
+@pytest.mark.asyncio
+async def test_events_inspect_failure_marks_stale(monkeypatch: pytest.MonkeyPatch) -> None:
+    collector = EventsCollector([], [], {"aaaaaaaaaaaa0000": TimeoutError()})
+    state = _make_state(monkeypatch, collector, refresh_mode="events")
+    state.snapshot = {"a": _status("a", "aaaaaaaaaaaa")}
+    gen = state.generation
+
+    await state._apply_event("health_status", "aaaaaaaaaaaa0000")
+    since = state.snapshot["a"].stale_since
+    assert since > 0
+    assert state.generation == gen + 1
+
+    await state._apply_event("health_status", "aaaaaaaaaaaa0000")
+    assert state.snapshot["a"].stale_since == since
+    assert state.generation == gen + 1
+    assert "docker_container_stale_since_timestamp_seconds" in state.metrics_text()
+
+
+@pytest.mark.asyncio
+async def test_events_without_changes_keep_the_generation(monkeypatch: pytest.MonkeyPatch) -> None:
+    collector = EventsCollector(
+        [],
+        [],
+        {
+            "aaaaaaaaaaaa0000": _status("a", "aaaaaaaaaaaa"),
+            "bbbbbbbbbbbb0000": _status("b", "bbbbbbbbbbbb", status=0),
+        },
+    )
+    state = _make_state(monkeypatch, collector, refresh_mode="events")
+    await state._apply_event("start", "aaaaaaaaaaaa0000")
+    block = state._render_container_block()
+    gen = state.generation
+
+    # An equal re-inspect and an event on a filtered-out container
+    await state._apply_event("health_status", "aaaaaaaaaaaa0000")
+    await state._apply_event("die", "ffffffffffff0000")
+    assert state.generation == gen
+    assert state._render_container_block() is block
+
+    await state._apply_event("health_status", "bbbbbbbbbbbb0000")
+    assert state.generation == gen + 1
+
+
+class HangingTextfile:
+    async def flush(self) -> None:
+        await asyncio.sleep(3600)
+
+
+@pytest.mark.asyncio
+async def test_stop_bounds_textfile_flush(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(state_module, "TEXTFILE_FLUSH_TIMEOUT_SECONDS", 0.01)
+    collector = DummyCollector([{}])
+    state = _make_state(monkeypatch, collector)
+    state.textfile = HangingTextfile()  # type: ignore[assignment]
+
+    await asyncio.wait_for(state.stop(), timeout=1.0)
+
+
+@pytest.mark.asyncio
+async def test_scrape_mode_coalesces_refreshes(monkeypatch: pytest.MonkeyPatch) -> None:
+    collector = DummyCollector([{"a": _status("a", "aaaaaaaaaaaa")}] * 3, delay=0.05)
+    state = _make_state(monkeypatch, collector, refresh_mode="scrape")
+    await state.start()
+    try:
+        await asyncio.gather(*(state.ensure_fresh() for _ in range(5)))
+        assert len(collector._snapshots) == 2
+        assert "a" in state.snapshot
+
+        # Fresh enough: served without a refresh.
+        await state.ensure_fresh()
+        assert len(collector._snapshots) == 2
+
+        state.last_ok_ts -= 10
+        await state.ensure_fresh()
+        assert len(collector._snapshots) == 1
+    finally:
+        await state.stop()
+
+
+@pytest.mark.asyncio
+async def test_scrape_mode_serves_last_snapshot_after_timeout(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    collector = DummyCollector([{"a": _status("a", "aaaaaaaaaaaa")}], delay=0.2)
+    state = _make_state(monkeypatch, collector, refresh_mode="scrape")
+    state.settings.scrape_timeout_seconds = 0.01
+
+    await state.ensure_fresh()
+    assert state.snapshot == {}
+
+    # The refresh keeps running and the next scrape joins it.
+    state.settings.scrape_timeout_seconds = 1.0
+    await state.ensure_fresh()
+    assert "a" in state.snapshot
+    assert collector._snapshots == []
+    await state.stop()
+
+
+async def test_run_once_writes_metrics_file(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    metrics_path = tmp_path / "metrics.prom"
+    collector = DummyCollector([{"svc": _status("svc", "abc")}])
+    state = _make_state(monkeypatch, collector, metrics_file=str(metrics_path))
+
+    assert await state.run_once() is True
+    assert collector.started is True
+    assert collector.stopped is True
+    assert state._task is None
+    assert 'name="svc"' in metrics_path.read_text()
+
+
+async def test_run_once_reports_failure(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    metrics_path = tmp_path / "metrics.prom"
+    collector = DummyCollector([])
+    state = _make_state(monkeypatch, collector, metrics_file=str(metrics_path))
+
+    assert await state.run_once() is False
+    assert collector.stopped is True
+    assert "docker_healthcheck_exporter_up" in metrics_path.read_text()
+
+
+@pytest.mark.asyncio
+async def test_max_container_series_counts_dropped(monkeypatch: pytest.MonkeyPatch) -> None:
+    snapshot = {n: _status(n, n * 12) for n in ("a", "b", "c")}
+    collector = DummyCollector([snapshot, {**snapshot, "d": _status("d", "d" * 12)}])
+    state = _make_state(monkeypatch, collector)
+    state.settings.max_container_series = 2
+
+    assert await state._refresh() is True
+    text = state.metrics_text()
+    assert 'name="a"' in text and 'name="c"' not in text
+    assert state.series_dropped == 1
+    assert 'docker_healthcheck_exporter_series_dropped{instance="test"} 1' in text
+
+    assert await state._refresh() is True
+    text = state.metrics_text()
+    assert state.series_dropped == 2
+    assert 'docker_healthcheck_exporter_series_dropped{instance="test"} 2' in text
+    # Scraping again does not change the value.
+    assert 'docker_healthcheck_exporter_series_dropped{instance="test"} 2' in state.metrics_text()
+
+
+@pytest.mark.asyncio
+async def test_aggregate_metrics_follow_the_snapshot(monkeypatch: pytest.MonkeyPatch) -> None:
+    first = {"a": _status("a", "a" * 12), "b": _status("b", "b" * 12, status=0)}
+    collector = DummyCollector([first, {"a": first["a"]}])
+    state = _make_state(monkeypatch, collector)
+    state.settings.aggregate_metrics = True
+
+    assert await state._refresh() is True
+    text = state.metrics_text()
+    assert 'docker_compose_project_worst_status{instance="test",compose_project="p"} 0' in text
+
+    assert await state._refresh() is True
+    text = state.metrics_text()
+    assert 'docker_compose_project_worst_status{instance="test",compose_project="p"} 2' in text
+    assert 'docker_image_containers{instance="test",image="img",status_text="UNHEALTHY"} 0' in text
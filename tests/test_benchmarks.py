@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from benchmarks.run import _percentiles, run_case
+
+
+def test_percentiles() -> None:
+    assert _percentiles([]) == {"min": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    summary = _percentiles([float(i) for i in range(101)])
+    assert summary["p50"] == 50.0
+    assert summary["p99"] == 99.0
+    assert summary["max"] == 100.0
+
+
+def test_benchmark_smoke() -> None:
+    result = run_case(40, refreshes=2, scrapes=3, collect_mode="list", timeout=60)
+
+    assert "error" not in result
+    first, second = result["refreshes"]
+    assert first["ok"] and second["ok"]
+    assert first["containers"] == second["containers"] > 0
+    assert first["docker_calls"]["containers_list"] == 1
+    assert second["docker_calls"].get("containers_inspect", 0) == 0
+    assert result["scrape"]["gzip"]["bytes"] < result["scrape"]["identity"]["bytes"]
+    assert result["peak_rss_bytes"] > 0
+    assert {"list", "inspect", "refresh"} <= set(result["phase_mean_seconds"])
@@ -1,41 +1,97 @@
 from __future__ import annotations
 
+import asyncio
+import gc
+import ssl
+import tracemalloc
+
 import pytest
+from aiodocker.exceptions import DockerError
 
 from docker_healthcheck_exporter.collector import (
     ContainerStatus,
     DockerCollector,
     ServiceStatus,
-    _is_ignored,
+    _list_exit_code,
+    _list_name,
+    _list_status,
     _parse_include_label,
+    _parse_time,
+    tls_context,
 )
 
 
 class FakeContainer:
-    def __init__(self, info: dict) -> None:
+    def __init__(self, info: dict, entry: dict | None = None) -> None:
         self._info = info
+        self._container = entry or {}
+        self.show_calls = 0
 
     async def show(self) -> dict:
+        self.show_calls += 1
         return self._info
 
 
 class FakeContainers:
     def __init__(self, items: list[FakeContainer]) -> None:
         self._items = items
+        self.filters: dict | None = None
 
-    async def list(self, all: bool = True) -> list[FakeContainer]:
+    async def list(self, all: bool = True, filters: dict | None = None) -> list[FakeContainer]:
+        self.filters = filters
         return self._items
 
+    def container(self, container_id: str) -> FakeContainer:
+        for item in self._items:
+            if item._info.get("Id") == container_id:
+                return item
+        return MissingContainer()
+
+
+class MissingContainer:
+    async def show(self) -> dict:
+        raise DockerError(404, {"message": "No such container"})
+
+
+class FakeSubscriber:
+    def __init__(self, events: list) -> None:
+        self._events = list(events)
+
+    async def get(self):
+        if not self._events:
+            return None
+        return self._events.pop(0)
+
+
+class FakeEvents:
+    def __init__(self, events: list) -> None:
+        self._events = events
+        # Raised from stop(), as aiodocker does when opening the stream failed
+        self.error: Exception | None = None
+        self.json_stream = None
+        self.params: dict = {}
+        self.stopped = False
+
+    def subscribe(self, **params) -> FakeSubscriber:
+        self.params = params
+        return FakeSubscriber(self._events)
+
+    async def stop(self) -> None:
+        self.stopped = True
+        if self.error is not None:
+            raise self.error
+
 
 class FakeDocker:
-    def __init__(self, items: list[FakeContainer]) -> None:
+    def __init__(self, items: list[FakeContainer], events: list | None = None) -> None:
         self.containers = FakeContainers(items)
+        self.events = FakeEvents(events or [])
 
 
-def test_is_ignored() -> None:
-    assert _is_ignored("anything", {"IGNORE_ALL"}) is True
-    assert _is_ignored("name", {"name"}) is True
-    assert _is_ignored("name", {"other"}) is False
+def test_ignore_list() -> None:
+    assert DockerCollector({"IGNORE_ALL"}, None).filter.accepts("anything", "", {}) is False
+    assert DockerCollector({"name"}, None).filter.accepts("name", "", {}) is False
+    assert DockerCollector({"other"}, None).filter.accepts("name", "", {}) is True
 
 
 def test_parse_include_label() -> None:
@@ -139,13 +195,668 @@ async def test_collect_requires_start() -> None:
 
 def test_label_match() -> None:
     collector = DockerCollector(ignore_list=set(), include_label="monitor=true", max_concurrency=1)
-    assert collector._label_match({"monitor": "true"}) is True
-    assert collector._label_match({"monitor": "false"}) is False
-    assert collector._label_match({"other": "true"}) is False
+    assert collector.filter.accepts("c", "img", {"monitor": "true"}) is True
+    assert collector.filter.accepts("c", "img", {"monitor": "false"}) is False
+    assert collector.filter.accepts("c", "img", {"other": "true"}) is False
 
     collector_any = DockerCollector(ignore_list=set(), include_label="monitor", max_concurrency=1)
-    assert collector_any._label_match({"monitor": "anything"}) is True
-    assert collector_any._label_match({"other": "x"}) is False
+    assert collector_any.filter.accepts("c", "img", {"monitor": "anything"}) is True
+    assert collector_any.filter.accepts("c", "img", {"other": "x"}) is False
 
     collector_none = DockerCollector(ignore_list=set(), include_label=None, max_concurrency=1)
-    assert collector_none._label_match({}) is True
+    assert collector_none.filter.accepts("c", "img", {}) is True
+
+
+def test_list_status_mapping() -> None:
+    assert _list_status("running", "Up 3 hours (healthy)") == ServiceStatus.HEALTHY
+    assert _list_status("running", "Up 3 hours (unhealthy)") == ServiceStatus.UNHEALTHY
+    assert _list_status("running", "Up 3 seconds (health: starting)") == ServiceStatus.FAIL
+    assert _list_status("running", "Up 3 hours") == ServiceStatus.RUNNING
+    assert _list_status("running", "Up 3 hours (Paused)") is None
+    assert _list_status("restarting", "Restarting (1) 2 seconds ago") == ServiceStatus.FAIL
+    assert _list_status("exited", "Exited (137) 2 minutes ago") == ServiceStatus.CRIT
+    assert _list_status("exited", "garbage") is None
+    assert _list_status("created", "Created") == ServiceStatus.CRIT
+    assert _list_status("paused", "Up 2 hours (Paused)") is None
+    assert _list_exit_code("Exited (0) 1 hour ago") == 0
+    assert _list_exit_code("Up 1 hour") is None
+    assert _list_name({"Names": ["/web/db", "/db"]}) == "db"
+    assert _list_name({}) == ""
+
+
+@pytest.mark.asyncio
+async def test_collect_list_mode_uses_list_payload() -> None:
+    def entry(cid: str, name: str, state: str, status: str, **extra) -> dict:
+        return {
+            "Id": cid,
+            "Names": [f"/{name}"],
+            "Image": extra.get("image", "img"),
+            "Labels": extra.get("labels", {"com.docker.compose.project": "p"}),
+            "State": state,
+            "Status": status,
+        }
+
+    healthy = FakeContainer({}, entry("healthy1234567890", "healthy", "running", "Up (healthy)"))
+    plain = FakeContainer({}, entry("plain12345678", "plain", "running", "Up 2 hours"))
+    oneshot = FakeContainer({}, entry("oneshot123456", "oneshot", "exited", "Exited (0) 1m ago"))
+    ignored = FakeContainer({}, entry("ignored123456", "ignored", "running", "Up 2 hours"))
+    paused = FakeContainer(
+        {
+            "Id": "paused1234567",
+            "Name": "/paused",
+            "Config": {"Image": "img", "Labels": {}},
+            "State": {"Status": "paused", "Running": True, "Health": {"Status": "healthy"}},
+        },
+        entry("paused1234567", "paused", "paused", "Up 2 hours (Paused)"),
+    )
+    retagged = FakeContainer(
+        {
+            "Id": "retagged12345",
+            "Name": "/retagged",
+            "Config": {"Image": "img:1", "Labels": {}},
+            "State": {"Status": "running", "Running": True},
+        },
+        entry("retagged12345", "retagged", "running", "Up 1 hour", image="sha256:abc"),
+    )
+    items = [healthy, plain, oneshot, ignored, paused, retagged]
+
+    collector = DockerCollector(
+        ignore_list={"ignored"}, include_label=None, max_concurrency=2, collect_mode="list"
+    )
+    collector.docker = FakeDocker(items)
+
+    snap = await collector.collect()
+
+    assert set(snap.keys()) == {"healthy", "plain", "paused", "retagged"}
+    assert snap["healthy"].status == int(ServiceStatus.HEALTHY)
+    assert snap["healthy"].container_id == "healthy12345"
+    assert snap["healthy"].compose_project == "p"
+    assert snap["plain"].status == int(ServiceStatus.RUNNING)
+    assert snap["paused"].status == int(ServiceStatus.HEALTHY)
+    assert snap["retagged"].image == "img:1"
+    assert [c.show_calls for c in items] == [0, 0, 0, 0, 1, 1]
+
+
+async def test_collect_list_mode_filters_entries_without_labels() -> None:
+    def item(name: str, labels: dict) -> FakeContainer:
+        return FakeContainer(
+            {
+                "Id": f"{name}123456789",
+                "Name": f"/{name}",
+                "Config": {"Image": "img", "Labels": labels},
+                "State": {"Status": "running", "Running": True},
+            },
+            {
+                "Id": f"{name}123456789",
+                "Names": [f"/{name}"],
+                "Image": "img",
+                "Labels": None,
+                "State": "running",
+                "Status": "Up 2 hours",
+            },
+        )
+
+    items = [item("kept", {"monitor": "true"}), item("other", {})]
+    collector = DockerCollector(set(), "monitor=true", collect_mode="list")
+    collector.docker = FakeDocker(items)
+
+    snap = await collector.collect()
+
+    assert set(snap) == {"kept"}
+    assert [c.show_calls for c in items] == [1, 1]
+
+
+async def test_snapshot_records_are_compact_and_reused() -> None:
+    count = 5000
+
+    def payload() -> list[FakeContainer]:
+        # Fresh string objects per container, as decoded from a JSON response
+        return [
+            FakeContainer(
+                {},
+                {
+                    "Id": f"{i:012x}" + "f" * 52,
+                    "Names": [f"/svc-{i}"],
+                    "Image": f"registry/img-{i % 20}:1.0",
+                    "Labels": {
+                        "com.docker.compose.project": f"proj-{i % 50}",
+                        "com.docker.compose.service": f"svc-{i % 200}",
+                    },
+                    "State": "running",
+                    "Status": "Up 2 hours",
+                },
+            )
+            for i in range(count)
+        ]
+
+    collector = DockerCollector(
+        ignore_list=set(), include_label=None, collect_mode="list", inspect_cache_size=0
+    )
+
+    async def refresh() -> dict[str, ContainerStatus]:
+        collector.docker = FakeDocker(payload())
+        snap = await collector.collect()
+        collector.docker = None
+        # Let the event loop drop its reference to the finished gather
+        await asyncio.sleep(0)
+        gc.collect()
+        return snap
+
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        first = await refresh()
+        one = tracemalloc.get_traced_memory()[0] - base
+        second = await refresh()
+        two = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+
+    assert not hasattr(first["svc-0"], "__dict__")
+    assert first["svc-0"].image is first["svc-20"].image
+    assert first["svc-0"].compose_project is first["svc-50"].compose_project
+    assert all(second[name] is st for name, st in first.items())
+    # A plain dataclass keeping the decoded strings takes about 600 bytes per
+    # container, and a second generation doubles it.
+    assert one / count < 500
+    assert two - one < one / 4
+
+
+async def test_shared_strings_are_pruned_to_live_containers() -> None:
+    def entry(i: int) -> FakeContainer:
+        return FakeContainer(
+            {},
+            {
+                "Id": f"{i:012x}" + "f" * 52,
+                "Names": [f"/ci-{i}"],
+                "Image": f"registry/ci:{i}",
+                "Labels": {"com.docker.compose.project": f"job-{i}", "team": "ci"},
+                "State": "running",
+                "Status": "Up 1 minute",
+            },
+        )
+
+    collector = DockerCollector(
+        set(), None, collect_mode="list", inspect_cache_size=0, label_projection=("team",)
+    )
+    for i in range(3):
+        collector.docker = FakeDocker([entry(i)])
+        await collector.collect()
+
+    assert set(collector._strings) == {"registry/ci:2", "job-2", "", "ci"}
+    assert "ci-2" not in collector._strings
+
+
+def test_label_projection() -> None:
+    collector = DockerCollector(set(), None, label_projection=("team", "tier"))
+    entry = {
+        "Id": "web123456789",
+        "Names": ["/web"],
+        "Image": "img",
+        "Labels": {"team": "payments"},
+        "State": "running",
+        "Status": "Up 1 hour",
+    }
+    assert collector._from_list(entry).extra_labels == ("payments", "")
+    info = {
+        "Id": "web123456789",
+        "Name": "/web",
+        "Config": {"Image": "img", "Labels": {"tier": "prod"}},
+        "State": {"Status": "running", "Running": True},
+    }
+    assert collector._from_inspect(info).extra_labels == ("", "prod")
+
+
+def test_invalid_collect_mode() -> None:
+    with pytest.raises(ValueError):
+        DockerCollector(ignore_list=set(), include_label=None, collect_mode="bogus")
+
+
+@pytest.mark.asyncio
+async def test_inspect_one() -> None:
+    info = {
+        "Id": "web1234567890",
+        "Name": "/web",
+        "Config": {"Image": "img", "Labels": {}},
+        "State": {"Status": "running", "Running": True, "Health": {"Status": "unhealthy"}},
+    }
+    collector = DockerCollector(ignore_list=set(), include_label=None)
+    with pytest.raises(RuntimeError):
+        await collector.inspect_one("web1234567890")
+    collector.docker = FakeDocker([FakeContainer(info)])
+
+    st = await collector.inspect_one("web1234567890")
+    assert st is not None and st.status == int(ServiceStatus.UNHEALTHY)
+    assert await collector.inspect_one("gone") is None
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_shrink_adaptive_limit() -> None:
+    collector = DockerCollector(
+        ignore_list=set(), include_label=None, max_concurrency=16, adaptive_concurrency=True
+    )
+    collector.limiter._limit = 16.0
+    collector.limiter._slow_start = False
+    collector.docker = FakeDocker([FakeContainer({}, {"Id": "gone"})])
+    collector.docker.containers._items[0].show = MissingContainer().show  # type: ignore[method-assign]
+
+    assert await collector.inspect_one("gone") is None
+    assert await collector.collect() == {}
+    assert collector.limiter.limit == 16
+    assert collector.inspect_failures_total == 0
+
+
+@pytest.mark.asyncio
+async def test_events_stream() -> None:
+    events = [
+        {"Type": "container", "Action": "health_status: healthy", "Actor": {"ID": "abc"}},
+        {"Type": "container", "Action": "exec_start: sh", "Actor": {"ID": "abc"}},
+        {"Type": "container", "status": "die", "id": "def"},
+    ]
+    collector = DockerCollector(ignore_list=set(), include_label=None)
+    collector.docker = FakeDocker([], events)
+
+    got = [item async for item in collector.events(since=123.9)]
+
+    assert got == [("health_status", "abc"), ("die", "def")]
+    assert collector.docker.events.params["since"] == 123
+    assert collector.docker.events.params["filters"]["type"] == ["container"]
+    assert collector.docker.events.stopped is True
+    assert collector.instruments.api_calls == {("events", "200"): 1}
+
+
+@pytest.mark.asyncio
+async def test_events_counts_failed_subscription() -> None:
+    collector = DockerCollector(ignore_list=set(), include_label=None)
+    collector.docker = FakeDocker([])
+    collector.docker.events.error = DockerError(500, {"message": "boom"})
+
+    with pytest.raises(DockerError):
+        _ = [item async for item in collector.events()]
+
+    assert collector.instruments.api_calls == {("events", "500"): 1}
+
+
+@pytest.mark.asyncio
+async def test_inspect_cache_reuses_results_until_fingerprint_changes() -> None:
+    def make(cid: str, status: str) -> FakeContainer:
+        info = {
+            "Id": cid,
+            "Name": f"/{cid}",
+            "Config": {"Image": "img", "Labels": {}},
+            "State": {"Status": "running", "Running": True},
+        }
+        entry = {"Id": cid, "Names": [f"/{cid}"], "State": "running", "Status": status}
+        return FakeContainer(info, entry)
+
+    a, b = make("a", "Up 1 minute"), make("b", "Up 1 minute")
+    collector = DockerCollector(ignore_list=set(), include_label=None, inspect_cache_size=8)
+    collector.docker = FakeDocker([a, b])
+
+    first = await collector.collect()
+    second = await collector.collect()
+    assert first == second
+    assert (a.show_calls, b.show_calls) == (1, 1)
+    assert (collector.cache_hits_total, collector.cache_misses_total) == (2, 2)
+
+    b._container["Status"] = "Up 2 minutes"
+    collector.docker = FakeDocker([b])
+    await collector.collect()
+    assert (a.show_calls, b.show_calls) == (1, 2)
+    assert list(collector._cache) == ["b"]
+
+    disabled = DockerCollector(ignore_list=set(), include_label=None, inspect_cache_size=0)
+    disabled.docker = FakeDocker([b])
+    await disabled.collect()
+    await disabled.collect()
+    assert b.show_calls == 4
+    assert disabled.cache_misses_total == 0
+
+
+@pytest.mark.asyncio
+async def test_inspect_cache_is_bounded() -> None:
+    items = []
+    for i in range(4):
+        cid = f"c{i}"
+        info = {
+            "Id": cid,
+            "Name": f"/{cid}",
+            "Config": {"Image": "img", "Labels": {}},
+            "State": {"Status": "running", "Running": True},
+        }
+        items.append(FakeContainer(info, {"Id": cid, "State": "running", "Status": "Up"}))
+    collector = DockerCollector(
+        ignore_list=set(), include_label=None, max_concurrency=1, inspect_cache_size=2
+    )
+    collector.docker = FakeDocker(items)
+
+    snap = await collector.collect()
+    assert len(snap) == 4
+    assert len(collector._cache) == 2
+
+
+@pytest.mark.asyncio
+async def test_collect_pushes_filters_down_before_inspect() -> None:
+    def make(name: str, state: str, status: str, labels: dict) -> FakeContainer:
+        info = {
+            "Id": name,
+            "Name": f"/{name}",
+            "Config": {"Image": "img", "Labels": labels},
+            "State": {"Status": state, "Running": state == "running", "ExitCode": 0},
+        }
+        entry = {"Id": name, "Names": [f"/{name}"], "State": state, "Status": status}
+        entry["Labels"] = labels
+        return FakeContainer(info, entry)
+
+    keep = make("keep", "running", "Up 1 hour", {"monitor": "true"})
+    ignored = make("ignored", "running", "Up 1 hour", {"monitor": "true"})
+    unlabeled = make("unlabeled", "running", "Up 1 hour", {})
+    oneshot = make("oneshot", "exited", "Exited (0) 1 hour ago", {"monitor": "true"})
+    items = [keep, ignored, unlabeled, oneshot]
+
+    collector = DockerCollector(
+        ignore_list={"ignored"}, include_label="monitor=true", inspect_cache_size=0
+    )
+    collector.docker = FakeDocker(items)
+
+    snap = await collector.collect()
+
+    assert set(snap) == {"keep"}
+    assert collector.docker.containers.filters == {"label": ["monitor=true"]}
+    assert [c.show_calls for c in items] == [1, 0, 0, 0]
+
+
+def test_label_filters() -> None:
+    assert DockerCollector(set(), None)._label_filters() == {}
+    assert DockerCollector(set(), "monitor")._label_filters() == {"label": ["monitor"]}
+    assert DockerCollector(set(), "a=b")._label_filters() == {"label": ["a=b"]}
+    assert DockerCollector(
+        set(), "monitor", container_filter='project = shop and label.tier in ("prod")'
+    )._label_filters() == {
+        "label": ["com.docker.compose.project=shop", "monitor", "tier=prod"],
+    }
+
+
+async def test_collect_applies_container_filter() -> None:
+    def make(name: str, image: str, labels: dict) -> FakeContainer:
+        info = {
+            "Id": name,
+            "Name": f"/{name}",
+            "Config": {"Image": image, "Labels": labels},
+            "State": {"Status": "running", "Running": True},
+        }
+        entry = {
+            "Id": name,
+            "Names": [f"/{name}"],
+            "Image": image,
+            "Labels": labels,
+            "State": "running",
+            "Status": "Up 1 hour",
+        }
+        return FakeContainer(info, entry)
+
+    shop = {"com.docker.compose.project": "shop"}
+    items = [
+        make("web", "registry.local/web:1", shop),
+        make("ci-runner-1", "registry.local/runner:1", {}),
+        make("tmp", "docker.io/busybox", {}),
+        make("retagged", "sha256:abc", {}),
+        make("scratch", "registry.local/scratch:1", {"com.docker.compose.project": "ci"}),
+    ]
+    collector = DockerCollector(
+        ignore_list=set(),
+        include_label=None,
+        inspect_cache_size=0,
+        container_filter='image = registry.local/* and project != ci or name =~ "ci-runner-.*"',
+    )
+    collector.docker = FakeDocker(items)
+
+    snap = await collector.collect()
+
+    assert set(snap) == {"web", "ci-runner-1"}
+    assert collector.docker.containers.filters is None
+    # Image rules cannot be decided from a list entry that reports the image id
+    assert [c.show_calls for c in items] == [1, 1, 0, 1, 0]
+
+
+class FailingContainer(FakeContainer):
+    def __init__(self, info: dict, entry: dict, error: BaseException) -> None:
+        super().__init__(info, entry)
+        self.error: BaseException | None = error
+
+    async def show(self) -> dict:
+        self.show_calls += 1
+        if self.error is not None:
+            raise self.error
+        return self._info
+
+
+class SlowContainer(FakeContainer):
+    async def show(self) -> dict:
+        await asyncio.sleep(1)
+        return self._info
+
+
+@pytest.mark.asyncio
+async def test_collect_isolates_per_container_failures() -> None:
+    def parts(cid: str) -> tuple[dict, dict]:
+        info = {
+            "Id": cid,
+            "Name": f"/{cid}",
+            "Config": {"Image": "img", "Labels": {}},
+            "State": {"Status": "running", "Running": True, "Health": {"Status": "healthy"}},
+        }
+        return info, {"Id": cid, "Names": [f"/{cid}"], "State": "running", "Status": "Up"}
+
+    ok = FakeContainer(*parts("ok"))
+    flaky = FailingContainer(*parts("flaky"), error=DockerError(500, {"message": "boom"}))
+    flaky.error = None
+    gone = FailingContainer(*parts("gone"), error=DockerError(404, {"message": "gone"}))
+    slow = SlowContainer(*parts("slow"))
+    never = FailingContainer(*parts("never"), error=DockerError(500, {"message": "boom"}))
+
+    collector = DockerCollector(
+        ignore_list=set(), include_label=None, inspect_cache_size=0, inspect_timeout_seconds=0.05
+    )
+    collector.docker = FakeDocker([ok, flaky])
+    first = await collector.collect()
+    assert first["flaky"].stale_since == 0.0
+
+    flaky.error = DockerError(500, {"message": "boom"})
+    collector.docker = FakeDocker([ok, flaky, gone, slow, never])
+    second = await collector.collect()
+
+    assert set(second) == {"ok", "flaky"}
+    assert second["ok"].stale_since == 0.0
+    assert second["flaky"].stale_since > 0
+    assert second["flaky"].status == int(ServiceStatus.HEALTHY)
+    assert collector.inspect_failures_total == 3
+
+    third = await collector.collect()
+    assert third["flaky"].stale_since == second["flaky"].stale_since
+
+
+@pytest.mark.asyncio
+async def test_collect_records_phases_and_api_calls() -> None:
+    info = {
+        "Id": "ok",
+        "Name": "/ok",
+        "Config": {"Image": "img", "Labels": {}},
+        "State": {"Status": "running", "Running": True},
+    }
+    entry = {"Id": "ok", "Names": ["/ok"], "State": "running", "Status": "Up"}
+    gone = FailingContainer(
+        {**info, "Id": "gone"}, {**entry, "Id": "gone"}, DockerError(404, {"message": "gone"})
+    )
+    slow = SlowContainer({**info, "Id": "slow"}, {**entry, "Id": "slow"})
+    collector = DockerCollector(
+        ignore_list=set(), include_label=None, inspect_cache_size=0, inspect_timeout_seconds=0.05
+    )
+    collector.docker = FakeDocker([FakeContainer(info, entry), gone, slow])
+
+    await collector.collect()
+
+    assert collector.instruments.api_calls == {
+        ("containers/json", "200"): 1,
+        ("containers/{id}/json", "200"): 1,
+        ("containers/{id}/json", "404"): 1,
+        ("containers/{id}/json", "timeout"): 1,
+    }
+    phases = collector.instruments.phases
+    assert phases["list"].count == phases["inspect"].count == phases["build"].count == 1
+    assert phases["inspect_wait"].count == 3
+    assert phases["inspect"].sum >= 0.05
+    assert phases["stats"].count == 0
+
+
+def test_tls_context() -> None:
+    assert tls_context(None, None) is None
+    assert tls_context("0", None) is None
+
+    ctx = tls_context("1", None)
+    assert ctx is not None
+    assert ctx.verify_mode == ssl.CERT_REQUIRED
+
+
+def test_parse_time() -> None:
+    assert _parse_time("2024-01-01T00:00:00Z") == 1704067200.0
+    assert _parse_time("2024-01-01T00:00:00.123456789Z") == pytest.approx(1704067200.123456789)
+    assert _parse_time("2024-01-01T01:00:00.5+01:00") == 1704067200.5
+    assert _parse_time("0001-01-01T00:00:00Z") == 0.0
+    assert _parse_time("garbage") == 0.0
+    assert _parse_time(None) == 0.0
+
+
+def _probe(second: int, duration_ms: int, exit_code: int = 0) -> dict:
+    return {
+        "Start": f"2024-01-01T00:00:{second:02d}Z",
+        "End": f"2024-01-01T00:00:{second:02d}.{duration_ms:03d}Z",
+        "ExitCode": exit_code,
+    }
+
+
+@pytest.mark.asyncio
+async def test_health_probe_metrics_count_each_log_entry_once() -> None:
+    health = {"Status": "healthy", "FailingStreak": 0, "Log": [_probe(0, 20), _probe(10, 30)]}
+    info = {
+        "Id": "web1234567890",
+        "Name": "/web",
+        "Config": {"Image": "img", "Labels": {}},
+        "State": {"Status": "running", "Running": True, "Health": health},
+    }
+    entry = {
+        "Id": "web1234567890",
+        "Names": ["/web"],
+        "Image": "img",
+        "State": "running",
+        "Status": "Up 2 hours (healthy)",
+        "Labels": {},
+    }
+    container = FakeContainer(info, entry)
+    collector = DockerCollector(
+        ignore_list=set(), include_label=None, collect_mode="list", health_probe_metrics=True
+    )
+    collector.docker = FakeDocker([container])
+
+    first = (await collector.collect())["web"]
+    assert first.health_probe is not None and first.health_probe.count == 2
+    assert first.health_failing_streak == 0
+    assert first.health_exit_code == 0
+
+    # Unchanged log: nothing new is counted and the histogram object is reused.
+    again = (await collector.collect())["web"]
+    assert again.health_probe is first.health_probe
+    assert again == first
+
+    health["Log"] = [_probe(10, 30), _probe(20, 900, exit_code=1)]
+    health["FailingStreak"] = 1
+    third = (await collector.collect())["web"]
+    assert third.health_probe is not None and third.health_probe.count == 3
+    assert third.health_probe.sum == pytest.approx(0.95)
+    assert first.health_probe.count == 2
+    assert (third.health_failing_streak, third.health_exit_code) == (1, 1)
+    # The list fast path and the inspect cache are bypassed for probed containers.
+    assert container.show_calls == 3
+
+    collector.docker.containers._items.clear()
+    await collector.collect()
+    assert collector._probes == {}
+
+
+@pytest.mark.asyncio
+async def test_health_probe_metrics_disabled_by_default() -> None:
+    info = {
+        "Id": "web1234567890",
+        "Name": "/web",
+        "Config": {"Image": "img", "Labels": {}},
+        "State": {
+            "Status": "running",
+            "Running": True,
+            "Health": {"Status": "healthy", "FailingStreak": 0, "Log": [_probe(0, 20)]},
+        },
+    }
+    collector = DockerCollector(ignore_list=set(), include_label=None)
+    collector.docker = FakeDocker([FakeContainer(info)])
+
+    st = (await collector.collect())["web"]
+    assert st.health_probe is None and st.health_failing_streak is None
+
+
+@pytest.mark.asyncio
+async def test_collect_reads_runtime_details_from_inspect() -> None:
+    info = {
+        "Id": "crash1234567890",
+        "Name": "/crash",
+        "RestartCount": 7,
+        "Config": {"Image": "img", "Labels": {}},
+        "State": {
+            "Status": "exited",
+            "Running": False,
+            "ExitCode": 137,
+            "OOMKilled": True,
+            "StartedAt": "2024-01-01T00:00:00Z",
+            "FinishedAt": "2024-01-01T00:01:00Z",
+        },
+    }
+    collector = DockerCollector(ignore_list=set(), include_label=None)
+    collector.docker = FakeDocker([FakeContainer(info)])
+
+    st = (await collector.collect())["crash"]
+
+    assert (st.restart_count, st.oom_killed, st.exit_code) == (7, True, 137)
+    assert st.started_at == 1704067200.0
+
+
+@pytest.mark.asyncio
+async def test_collector_attaches_stats_samples() -> None:
+    info = {
+        "Id": "web1234567890",
+        "Name": "/web",
+        "Config": {"Image": "img", "Labels": {}},
+        "State": {"Status": "running", "Running": True},
+    }
+    stopped = {
+        "Id": "down1234567890",
+        "Name": "/down",
+        "Config": {"Image": "img", "Labels": {}},
+        "State": {"Status": "exited", "Running": False, "ExitCode": 1},
+    }
+    collector = DockerCollector(ignore_list=set(), include_label=None, stats_budget_calls=2)
+    docker = FakeDocker([FakeContainer(info), FakeContainer(stopped)])
+    calls: list[str] = []
+
+    async def query_json(path: str, params: dict | None = None) -> dict:
+        calls.append(path)
+        return {"pids_stats": {"current": 7}}
+
+    docker._query_json = query_json  # type: ignore[attr-defined]
+    collector.docker = docker
+
+    snap = await collector.collect()
+
+    assert snap["web"].stats is not None and snap["web"].stats.pids == 7
+    assert snap["down"].stats is None
+    assert calls == ["containers/web123456789/stats"]
+
+    st = await collector.inspect_one("web1234567890")
+    assert st is not None and st.stats is snap["web"].stats
@@ -23,6 +23,13 @@ def test_parse_set_csv() -> None:
     assert config._parse_set_csv("a, b, c", {"base"}) == {"base", "a", "b", "c"}
 
 
+def test_parse_bool() -> None:
+    assert config._parse_bool(None) is False
+    assert config._parse_bool(None, True) is True
+    assert config._parse_bool(" ON ") is True
+    assert config._parse_bool("0", True) is False
+
+
 def test_load_settings_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setenv("LISTEN", "127.0.0.1:9999")
     monkeypatch.setenv("INSTANCE_NAME", "test-instance")
@@ -30,7 +37,13 @@ def test_load_settings_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setenv("SERVICES_IGNORE_LIST", "one,two")
     monkeypatch.setenv("INCLUDE_LABEL", "monitor=true")
     monkeypatch.setenv("MAX_CONCURRENCY", "3")
+    monkeypatch.setenv("ADAPTIVE_CONCURRENCY", "Yes")
     monkeypatch.setenv("METRICS_FILE", "/tmp/metrics.prom")
+    monkeypatch.setenv("METRICS_FILE_FSYNC", "dir")
+    monkeypatch.setenv("COLLECT_MODE", "LIST")
+    monkeypatch.setenv("REFRESH_MODE", "events")
+    monkeypatch.setenv("INSPECT_CACHE_SIZE", "16")
+    monkeypatch.setenv("EVENTS_RESYNC_SECONDS", "120")
 
     settings = config.load_settings()
 
@@ -41,7 +54,34 @@ def test_load_settings_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
     assert settings.services_ignore_list == {"vmagent", "health-exporter", "one", "two"}
     assert settings.include_label == "monitor=true"
     assert settings.max_concurrency == 3
+    assert settings.adaptive_concurrency is True
+    assert settings.inspect_latency_target_seconds == 0.25
     assert settings.metrics_file == "/tmp/metrics.prom"
+    assert settings.metrics_file_fsync == "dir"
+    assert settings.metrics_file_max_age_seconds == 60.0
+    assert settings.collect_mode == "list"
+    assert settings.refresh_mode == "events"
+    assert settings.inspect_cache_size == 16
+    assert settings.inspect_timeout_seconds == 10.0
+    assert settings.events_resync_seconds == 120.0
+
+
+@pytest.mark.parametrize(
+    ("name", "value"),
+    [
+        ("COLLECT_MODE", "events"),
+        ("REFRESH_MODE", "x"),
+        ("METRICS_FILE_FSYNC", "always"),
+        ("CONTAINER_FILTER", "name ="),
+    ],
+)
+def test_load_settings_invalid_modes(
+    monkeypatch: pytest.MonkeyPatch, name: str, value: str
+) -> None:
+    monkeypatch.setenv("LISTEN", "0.0.0.0:9102")
+    monkeypatch.setenv(name, value)
+    with pytest.raises(ValueError):
+        config.load_settings()
 
 
 def test_load_settings_invalid_listen(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -62,3 +102,52 @@ def test_load_settings_instance_from_uname(monkeypatch: pytest.MonkeyPatch) -> N
 
     settings = config.load_settings()
     assert settings.instance_name == "dummy-host"
+
+
+def test_parse_docker_hosts() -> None:
+    assert config._parse_docker_hosts(None) == ()
+    assert config._parse_docker_hosts(
+        "tcp://10.0.0.1:2376, edge=tcp://edge:2375,unix:///var/run/docker.sock"
+    ) == (
+        ("10.0.0.1:2376", "tcp://10.0.0.1:2376"),
+        ("edge", "tcp://edge:2375"),
+        ("/var/run/docker.sock", "unix:///var/run/docker.sock"),
+    )
+    with pytest.raises(ValueError):
+        config._parse_docker_hosts("edge=somehost")
+    with pytest.raises(ValueError):
+        config._parse_docker_hosts("a=tcp://x:1,a=tcp://y:1")
+
+
+def test_docker_hosts_conflict_with_events_mode(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("DOCKER_HOSTS", "tcp://a:2376,tcp://b:2376")
+    monkeypatch.setenv("REFRESH_MODE", "events")
+    with pytest.raises(ValueError):
+        config.load_settings()
+
+
+def test_http_workers_validation(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("LISTEN", "0.0.0.0:9102")
+    monkeypatch.setenv("HTTP_WORKERS", "4")
+    assert config.load_settings().http_workers == 4
+
+    monkeypatch.setenv("REFRESH_MODE", "scrape")
+    with pytest.raises(ValueError):
+        config.load_settings()
+
+    monkeypatch.setenv("REFRESH_MODE", "poll")
+    monkeypatch.setenv("HTTP_WORKERS", "-1")
+    with pytest.raises(ValueError):
+        config.load_settings()
+
+
+def test_parse_label_map() -> None:
+    assert config._parse_label_map(None) == ()
+    assert config._parse_label_map("com.example.team=team, tier,") == (
+        ("com.example.team", "team"),
+        ("tier", "label_tier"),
+    )
+    assert config._parse_label_map("io.k8s/owner") == (("io.k8s/owner", "label_io_k8s_owner"),)
+    for bad in ("a=image", "a=1x", "a=__x", "a=x,b=x", "=x"):
+        with pytest.raises(ValueError):
+            config._parse_label_map(bad)
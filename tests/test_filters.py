@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import pytest
+
+from docker_healthcheck_exporter.filters import _Not, _Parser, _Pred, _simplify, compile_filter
+
+SHOP = {"com.docker.compose.project": "shop", "com.docker.compose.service": "web"}
+
+
+def test_empty_filter_accepts_everything() -> None:
+    f = compile_filter(None)
+    assert f.accepts("any", "img", {}) is True
+    assert f.label_filters == ()
+    assert f.fields == frozenset()
+
+
+@pytest.mark.parametrize(
+    ("expr", "name", "image", "labels", "expected"),
+    [
+        ("name = web", "web", "", {}, True),
+        ("name = web", "web-1", "", {}, False),
+        ('name =~ "ci-runner-.*"', "ci-runner-7", "", {}, True),
+        ('name =~ "ci-runner-.*"', "my-ci-runner-7", "", {}, False),
+        ('name !~ "ci-.*"', "ci-1", "", {}, False),
+        ("name != web", "db", "", {}, True),
+        ("image = registry.local/*", "x", "registry.local/a/b:1", {}, True),
+        ("image = registry.local/*", "x", "docker.io/registry.local/a", {}, False),
+        ('image = "registry.local/*"', "x", "registry.local/a", {}, False),
+        ("project in (shop, billing)", "x", "", SHOP, True),
+        ("project not in (shop, billing)", "x", "", SHOP, False),
+        ("service = web and project = shop", "x", "", SHOP, True),
+        ("label.team", "x", "", {"team": ""}, True),
+        ("not label.team", "x", "", {}, True),
+        ('label.team = ""', "x", "", {}, True),
+        ("label.team = a or label.team = b", "x", "", {"team": "b"}, True),
+        ("name = a or name = b and image = c", "a", "", {}, True),
+        ("(name = a or name = b) and image = c", "a", "", {}, False),
+        ("NOT (name = a OR name = b)", "c", "", {}, True),
+        ('name = "a \\"quoted\\" name"', 'a "quoted" name', "", {}, True),
+    ],
+)
+def test_rules(expr: str, name: str, image: str, labels: dict, expected: bool) -> None:
+    assert compile_filter(expr).accepts(name, image, labels) is expected
+
+
+def test_ignore_list_and_include_label_are_folded_in() -> None:
+    f = compile_filter("name != db", {"vmagent"}, "monitor", None)
+    assert f.accepts("web", "", {"monitor": "1"}) is True
+    assert f.accepts("vmagent", "", {"monitor": "1"}) is False
+    assert f.accepts("db", "", {"monitor": "1"}) is False
+    assert f.accepts("web", "", {}) is False
+    assert f.label_filters == ("monitor",)
+    assert f.fields == frozenset(("name", "labels"))
+
+    assert compile_filter(None, {"IGNORE_ALL"}).accepts("web", "", {}) is False
+
+
+def test_label_pushdown() -> None:
+    assert compile_filter("label.tier = prod and name = web").label_filters == ("tier=prod",)
+    assert compile_filter("project = a or project = b").label_filters == ()
+    assert compile_filter("(label.x and name = a) or (label.x and name = b)").label_filters == (
+        "x",
+    )
+    assert compile_filter("not label.x").label_filters == ()
+    assert compile_filter('label.x =~ "a.*"').label_filters == ()
+    assert compile_filter("label.x in (a)").label_filters == ("x=a",)
+
+
+def test_same_field_rules_are_merged() -> None:
+    names = ", ".join(f"svc-{i}" for i in range(1000))
+    expr = f'name not in ({names}) and name !~ "tmp-.*" and name != x'
+    # One set lookup and one regex for the whole deny list
+    node = _simplify(_Parser(expr).parse())
+    assert isinstance(node, _Not) and isinstance(node.node, _Pred)
+    assert (len(node.node.values), node.node.patterns) == (1001, ("tmp-.*",))
+    f = compile_filter(expr)
+    assert f.accepts("svc-999", "", {}) is False
+    assert f.accepts("tmp-1", "", {}) is False
+    assert f.accepts("x", "", {}) is False
+    assert f.accepts("svc-1000", "", {}) is True
+
+
+@pytest.mark.parametrize(
+    "expr",
+    [
+        "name",
+        "name =",
+        "bogus = x",
+        "name = (a",
+        "name in a",
+        "name not = a",
+        '"a" = b',
+        "name =~ [",
+    ],
+)
+def test_invalid_rules(expr: str) -> None:
+    with pytest.raises(ValueError):
+        compile_filter(expr)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from docker_healthcheck_exporter.histogram import Histogram
+from docker_healthcheck_exporter.limiter import ConcurrencyLimiter
+
+
+def test_histogram_cumulative() -> None:
+    hist = Histogram(buckets=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(v)
+    assert hist.cumulative() == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert hist.count == 4
+    assert hist.sum == pytest.approx(3.65)
+
+
+@pytest.mark.asyncio
+async def test_fixed_limiter_caps_concurrency() -> None:
+    limiter = ConcurrencyLimiter(2)
+    in_flight = 0
+    peak = 0
+
+    async def call() -> None:
+        nonlocal in_flight, peak
+        async with limiter.slot():
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    await asyncio.gather(*(call() for _ in range(6)))
+
+    assert peak == 2
+    assert limiter.limit == 2
+    assert limiter.latency.count == 6
+
+
+def test_adaptive_limiter_aimd() -> None:
+    limiter = ConcurrencyLimiter(8, adaptive=True, latency_target_seconds=0.1)
+    assert limiter.limit == 1
+
+    for _ in range(3):
+        limiter._in_flight += 1
+        limiter.release(0.01)
+    assert limiter.limit == 4
+
+    limiter._in_flight += 1
+    limiter.release(0.5)
+    assert limiter.limit == 2
+    limiter._in_flight += 1
+    limiter.release(0.5)
+    assert limiter.limit == 2
+
+    for _ in range(4):
+        limiter._in_flight += 1
+        limiter.release(0.01)
+    assert limiter.limit == 3
+
+    limiter._last_decrease = 0.0
+    limiter._in_flight += 1
+    limiter.release(0.01, failed=True)
+    assert limiter.limit == 1
+
+    for _ in range(100):
+        limiter._in_flight += 1
+        limiter.release(0.01)
+    assert limiter.limit == 8
+
+
+@pytest.mark.asyncio
+async def test_limiter_failed_block_and_cancelled_waiter() -> None:
+    limiter = ConcurrencyLimiter(1)
+    with pytest.raises(RuntimeError):
+        async with limiter.slot():
+            raise RuntimeError("boom")
+    assert limiter._in_flight == 0
+
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert not limiter._waiters
+    limiter.release(0.0)
+    await asyncio.wait_for(limiter.acquire(), timeout=1)
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import types
 
+import pytest
+
 import docker_healthcheck_exporter.__main__ as main_module
 
 
@@ -10,6 +12,8 @@ def test_main_runs_uvicorn(monkeypatch) -> None:
         listen_host="127.0.0.1",
         listen_port=1234,
         metrics_file=None,
+        http_server="fastapi",
+        http_workers=0,
     )
 
     called = {}
@@ -21,11 +25,13 @@ def test_main_runs_uvicorn(monkeypatch) -> None:
         called["log_level"] = log_level
 
     monkeypatch.setattr(main_module, "load_settings", lambda: settings)
-    monkeypatch.setattr(main_module.uvicorn, "run", fake_run)
+    monkeypatch.setattr("uvicorn.run", fake_run)
+
+    main_module.main([])
 
-    main_module.main()
+    import docker_healthcheck_exporter.app as app_module
 
-    assert called["app"] is main_module.app
+    assert called["app"] is app_module.app
     assert called["host"] == "127.0.0.1"
     assert called["port"] == 1234
     assert called["log_level"] == "info"
@@ -48,6 +54,7 @@ def test_module_entrypoint_executes(monkeypatch) -> None:
     fake_uvicorn.run = fake_run
     monkeypatch.setitem(sys.modules, "uvicorn", fake_uvicorn)
     monkeypatch.setenv("LISTEN", "127.0.0.1:7777")
+    monkeypatch.setattr(sys, "argv", ["docker-healthcheck-exporter"])
     if "docker_healthcheck_exporter.__main__" in sys.modules:
         monkeypatch.delitem(sys.modules, "docker_healthcheck_exporter.__main__", raising=False)
 
@@ -56,3 +63,86 @@ def test_module_entrypoint_executes(monkeypatch) -> None:
     assert called["host"] == "127.0.0.1"
     assert called["port"] == 7777
     assert called["log_level"] == "info"
+
+
+def test_main_runs_builtin_server(monkeypatch) -> None:
+    settings = types.SimpleNamespace(
+        listen_host="127.0.0.1",
+        listen_port=1234,
+        metrics_file=None,
+        http_server="fastapi",
+        http_workers=0,
+    )
+    called = {}
+
+    async def fake_serve(host: str, port: int) -> None:
+        called["addr"] = (host, port)
+
+    monkeypatch.setattr(main_module, "load_settings", lambda: settings)
+    monkeypatch.setattr("docker_healthcheck_exporter.server.serve", fake_serve)
+
+    main_module.main(["--server", "builtin"])
+
+    assert called["addr"] == ("127.0.0.1", 1234)
+
+
+def _mode_settings(metrics_file: str | None, refresh_mode: str = "poll") -> types.SimpleNamespace:
+    return types.SimpleNamespace(
+        listen_host="127.0.0.1",
+        listen_port=1234,
+        metrics_file=metrics_file,
+        http_server="fastapi",
+        http_workers=0,
+        refresh_mode=refresh_mode,
+    )
+
+
+def test_main_once_prints_and_exits_nonzero_on_failure(monkeypatch, capsys) -> None:
+    import docker_healthcheck_exporter.state as state_module
+
+    results = iter([True, False])
+
+    class FakeState:
+        textfile = None
+
+        async def run_once(self) -> bool:
+            self.ok = next(results)
+            return self.ok
+
+        def metrics_text(self) -> str:
+            return f'docker_healthcheck_exporter_up{{instance="h"}} {int(self.ok)}\n'
+
+    monkeypatch.setattr(main_module, "load_settings", lambda: _mode_settings(None))
+    monkeypatch.setattr(state_module, "ExporterState", FakeState)
+
+    main_module.main(["--once"])
+    assert capsys.readouterr().out == 'docker_healthcheck_exporter_up{instance="h"} 1\n'
+    with pytest.raises(SystemExit) as exc:
+        main_module.main(["--once"])
+    assert exc.value.code == 1
+    assert capsys.readouterr().out == 'docker_healthcheck_exporter_up{instance="h"} 0\n'
+
+
+def test_main_textfile_only(monkeypatch) -> None:
+    called = []
+
+    async def fake_run() -> None:
+        called.append(True)
+
+    monkeypatch.setattr(main_module, "run_textfile_only", fake_run)
+
+    monkeypatch.setattr(main_module, "load_settings", lambda: _mode_settings(None))
+    with pytest.raises(SystemExit):
+        main_module.main(["--textfile-only"])
+    monkeypatch.setattr(
+        main_module, "load_settings", lambda: _mode_settings("/tmp/m.prom", "scrape")
+    )
+    with pytest.raises(SystemExit):
+        main_module.main(["--textfile-only"])
+    with pytest.raises(SystemExit):
+        main_module.main(["--textfile-only", "--once"])
+    assert called == []
+
+    monkeypatch.setattr(main_module, "load_settings", lambda: _mode_settings("/tmp/m.prom"))
+    main_module.main(["--textfile-only"])
+    assert called == [True]
@@ -1,7 +1,15 @@
 from __future__ import annotations
 
 from docker_healthcheck_exporter.collector import ContainerStatus
-from docker_healthcheck_exporter.metrics import _esc, render_metrics
+from docker_healthcheck_exporter.histogram import Histogram
+from docker_healthcheck_exporter.metrics import (
+    _esc,
+    container_exposition,
+    limit_series,
+    render_container_metrics,
+    render_metrics,
+    render_self_metrics,
+)
 
 
 def test_escape() -> None:
@@ -20,7 +28,17 @@ def test_render_metrics() -> None:
             image="img:latest",
             compose_project="proj",
             compose_service="svc",
-        )
+        ),
+        "db": ContainerStatus(
+            name="db",
+            status=0,
+            status_text="UNHEALTHY",
+            container_id="def456",
+            image="db:latest",
+            compose_project="proj",
+            compose_service="db",
+            stale_since=1700000000.0,
+        ),
     }
     text = render_metrics(
         instance_name='host"name',
@@ -29,11 +47,251 @@ def test_render_metrics() -> None:
         refresh_errors_total=2,
         refresh_duration_seconds=0.5,
         snapshot_age_seconds=1.5,
+        inspect_cache_hits_total=7,
     )
 
     assert 'docker_healthcheck_exporter_up{instance="host\\"name"} 1' in text
     assert "docker_healthcheck_exporter_refresh_errors_total" in text
     assert "docker_healthcheck_exporter_refresh_duration_seconds" in text
     assert "docker_healthcheck_exporter_snapshot_age_seconds" in text
+    assert 'docker_healthcheck_exporter_inspect_cache_hits_total{instance="host\\"name"} 7' in text
     assert 'name="web"' in text
     assert 'status_text="HEALTHY"' in text
+    assert 'docker_healthcheck_exporter_inspect_failures_total{instance="host\\"name"} 0' in text
+    assert (
+        'docker_container_stale_since_timestamp_seconds{instance="host\\"name",name="db",'
+        'container_id="def456"} 1700000000.0'
+    ) in text
+    assert 'name="web",container_id="abc123"} ' not in text
+
+
+def test_render_inspect_concurrency_and_latency() -> None:
+    hist = Histogram(buckets=(0.1,))
+    hist.observe(0.05)
+    text = render_self_metrics(
+        instance_name="h",
+        exporter_up=1,
+        refresh_errors_total=0,
+        refresh_duration_seconds=0.0,
+        snapshot_age_seconds=0.0,
+        inspect_concurrency_limit=5,
+        inspect_latency=hist,
+    )
+
+    assert 'docker_healthcheck_exporter_inspect_concurrency_limit{instance="h"} 5' in text
+    assert "# TYPE docker_healthcheck_exporter_inspect_duration_seconds histogram" in text
+    assert (
+        'docker_healthcheck_exporter_inspect_duration_seconds_bucket{instance="h",le="0.1"} 1'
+        in text
+    )
+    assert (
+        'docker_healthcheck_exporter_inspect_duration_seconds_bucket{instance="h",le="+Inf"} 1'
+        in text
+    )
+    assert 'docker_healthcheck_exporter_inspect_duration_seconds_count{instance="h"} 1' in text
+
+
+def test_render_multi_host_labels_and_host_metrics() -> None:
+    snapshot = {
+        "edge/web": ContainerStatus(
+            name="web",
+            status=2,
+            status_text="HEALTHY",
+            container_id="abc123",
+            image="img",
+            compose_project="",
+            compose_service="",
+            docker_host="edge",
+        )
+    }
+    text = render_metrics(
+        instance_name="h",
+        snapshot=snapshot,
+        exporter_up=1,
+        refresh_errors_total=0,
+        refresh_duration_seconds=0.0,
+        snapshot_age_seconds=0.0,
+    )
+    assert 'instance="h",docker_host="edge",name="web"' in text
+
+    text = render_self_metrics(
+        instance_name="h",
+        exporter_up=1,
+        refresh_errors_total=0,
+        refresh_duration_seconds=0.0,
+        snapshot_age_seconds=0.0,
+        hosts=[("edge", 0, 3)],
+    )
+    assert 'docker_healthcheck_exporter_host_up{instance="h",docker_host="edge"} 0' in text
+    assert (
+        'docker_healthcheck_exporter_host_refresh_errors_total{instance="h",docker_host="edge"} 3'
+        in text
+    )
+
+
+def test_render_health_probe_metrics() -> None:
+    hist = Histogram(buckets=(0.1,))
+    hist.observe(0.02)
+    base = dict(
+        status=2,
+        status_text="HEALTHY",
+        image="img",
+        compose_project="",
+        compose_service="",
+    )
+    snapshot = {
+        "web": ContainerStatus(
+            name="web",
+            container_id="abc",
+            health_failing_streak=2,
+            health_exit_code=1,
+            health_probe=hist,
+            **base,
+        ),
+        "db": ContainerStatus(name="db", container_id="def", **base),
+    }
+    text = render_container_metrics(instance_name="h", snapshot=snapshot)
+
+    labels = 'instance="h",name="web",container_id="abc"'
+    assert f"docker_container_health_failing_streak{{{labels}}} 2" in text
+    assert f"docker_container_health_probe_exit_code{{{labels}}} 1" in text
+    assert f'docker_container_health_probe_duration_seconds_bucket{{{labels},le="0.1"}} 1' in text
+    assert f"docker_container_health_probe_duration_seconds_count{{{labels}}} 1" in text
+    assert 'name="db",container_id="def"} ' not in text.split("docker_container_health_failing")[1]
+
+
+def test_render_runtime_details() -> None:
+    base = dict(
+        status=-2,
+        status_text="CRIT",
+        image="img",
+        compose_project="",
+        compose_service="",
+    )
+    snapshot = {
+        "crash": ContainerStatus(
+            name="crash",
+            container_id="abc",
+            restart_count=7,
+            oom_killed=True,
+            exit_code=137,
+            started_at=1704067200.0,
+            **base,
+        ),
+        "listed": ContainerStatus(name="listed", container_id="def", **base),
+    }
+    text = render_container_metrics(instance_name="h", snapshot=snapshot)
+
+    labels = 'instance="h",name="crash",container_id="abc"'
+    assert f"docker_container_restarts_total{{{labels}}} 7" in text
+    assert f"docker_container_oom_killed{{{labels}}} 1" in text
+    assert f"docker_container_exit_code{{{labels}}} 137" in text
+    assert f"docker_container_start_time_seconds{{{labels}}} 1704067200.0" in text
+    assert 'docker_container_restarts_total{instance="h",name="listed"' not in text
+
+
+def test_container_exposition_formats() -> None:
+    snapshot = {
+        "crash": ContainerStatus(
+            name="crash",
+            status=-2,
+            status_text="CRIT",
+            container_id="abc",
+            image="img",
+            compose_project="",
+            compose_service="",
+            restart_count=7,
+            started_at=1704067200.0,
+        ),
+    }
+    exposition = container_exposition(instance_name="h", snapshot=snapshot)
+    text = exposition.render()
+    om = exposition.render(openmetrics=True)
+
+    assert text == render_container_metrics(instance_name="h", snapshot=snapshot)
+    assert "# TYPE docker_container_restarts_total counter" in text
+    assert "# TYPE docker_container_restarts counter" in om
+    assert "# UNIT docker_container_start_time_seconds seconds" in om
+    assert "# UNIT" not in text
+    # Sample lines are identical in both formats.
+    samples = [line for line in text.splitlines() if not line.startswith("#")]
+    assert samples == [line for line in om.splitlines() if not line.startswith("#")]
+    assert "# EOF" not in om
+
+
+def test_render_phases_and_api_calls() -> None:
+    phases = {"list": Histogram(buckets=(0.1,)), "stats": Histogram(buckets=(0.1,))}
+    phases["list"].observe(0.05)
+    text = render_self_metrics(
+        instance_name="h",
+        exporter_up=1,
+        refresh_errors_total=0,
+        refresh_duration_seconds=0.1,
+        snapshot_age_seconds=0.0,
+        phases=phases,
+        api_calls={("containers/json", "200"): 3, ("containers/{id}/json", "timeout"): 1},
+    )
+
+    assert (
+        'docker_healthcheck_exporter_phase_duration_seconds_bucket{instance="h",phase="list",le="0.1"} 1'
+    ) in text
+    assert 'phase="stats"' not in text
+    assert (
+        'docker_healthcheck_exporter_docker_api_calls_total{instance="h",'
+        'endpoint="containers/{id}/json",status="timeout"} 1'
+    ) in text
+
+
+def _container(name: str, status: int, **kwargs) -> ContainerStatus:
+    return ContainerStatus(
+        name=name,
+        status=status,
+        status_text="HEALTHY" if status == 2 else "CRIT",
+        container_id=f"{name}-id",
+        image="img:1",
+        compose_project="p",
+        compose_service="s",
+        **kwargs,
+    )
+
+
+def test_projected_labels_and_info_series() -> None:
+    snapshot = {"web": _container("web", 2, extra_labels=("payments", ""), restart_count=1)}
+
+    text = container_exposition(
+        "h", snapshot, extra_label_names=["team", "tier"], info_series=False
+    ).render()
+    assert (
+        'docker_container_health_status{instance="h",name="web",container_id="web-id",'
+        'image="img:1",compose_project="p",compose_service="s",status_text="HEALTHY",'
+        'team="payments",tier=""} 2'
+    ) in text
+    assert "docker_container_info" not in text
+
+    split = container_exposition(
+        "h", snapshot, extra_label_names=["team", "tier"], info_series=True
+    ).render()
+    assert (
+        'docker_container_health_status{instance="h",name="web",compose_project="p",'
+        'compose_service="s",status_text="HEALTHY",team="payments",tier=""} 2'
+    ) in split
+    assert (
+        'docker_container_info{instance="h",name="web",container_id="web-id",image="img:1"} 1'
+        in split
+    )
+    assert 'docker_container_restarts_total{instance="h",name="web"} 1' in split
+    assert split.count("container_id=") == 1
+
+
+def test_limit_series_keeps_worst_statuses() -> None:
+    snapshot = {n: _container(n, 2) for n in ("a", "b", "c")} | {"z": _container("z", -2)}
+
+    assert limit_series(snapshot, 0) == (snapshot, 0)
+    assert limit_series(snapshot, 4) == (snapshot, 0)
+    kept, dropped = limit_series(snapshot, 2)
+    assert (list(kept), dropped) == (["z", "a"], 2)
+
+    text = render_self_metrics("h", 1, 0, 0.1, 1.0, series_dropped=2)
+    assert "# TYPE docker_healthcheck_exporter_series_dropped gauge" in text
+    assert 'docker_healthcheck_exporter_series_dropped{instance="h"} 2' in text
+    assert "series_dropped" not in render_self_metrics("h", 1, 0, 0.1, 1.0)
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import ssl
+
+import pytest
+
+from docker_healthcheck_exporter.collector import ContainerStatus
+from docker_healthcheck_exporter.pool import MAX_BACKOFF_SECONDS, CollectorPool
+
+
+def _status(name: str) -> ContainerStatus:
+    return ContainerStatus(
+        name=name,
+        status=2,
+        status_text="HEALTHY",
+        container_id=f"{name}-id",
+        image="img",
+        compose_project="",
+        compose_service="",
+    )
+
+
+class FakeCollector:
+    def __init__(self, names: list[str]) -> None:
+        self.names = names
+        self.fail = False
+        self.hang = False
+        self.calls = 0
+        self.cache_hits_total = 1
+        self.cache_misses_total = 2
+        self.inspect_failures_total = 3
+
+    async def stop(self) -> None:
+        pass
+
+    async def collect(self) -> dict[str, ContainerStatus]:
+        self.calls += 1
+        if self.hang:
+            await asyncio.sleep(10)
+        if self.fail:
+            raise RuntimeError("boom")
+        return {n: _status(n) for n in self.names}
+
+
+def _pool(**kwargs) -> tuple[CollectorPool, FakeCollector, FakeCollector]:
+    pool = CollectorPool(
+        hosts=(("a", "tcp://a:2376"), ("b", "unix:///var/run/docker.sock")),
+        ignore_list=set(),
+        include_label=None,
+        **kwargs,
+    )
+    fa, fb = FakeCollector(["web"]), FakeCollector(["web", "db"])
+    pool.hosts[0].collector = fa  # type: ignore[assignment]
+    pool.hosts[1].collector = fb  # type: ignore[assignment]
+    return pool, fa, fb
+
+
+def test_pool_shares_one_limiter() -> None:
+    pool = CollectorPool(
+        hosts=(("a", "tcp://a:2376"), ("b", "tcp://b:2376")),
+        ignore_list=set(),
+        include_label=None,
+        max_concurrency=7,
+    )
+    assert pool.limiter.limit == 7
+    assert all(h.collector.limiter is pool.limiter for h in pool.hosts)
+    assert [h.collector.docker_url for h in pool.hosts] == ["tcp://a:2376", "tcp://b:2376"]
+
+
+async def test_pool_merges_hosts_and_aggregates_counters() -> None:
+    pool, _, _ = _pool()
+
+    snap = await pool.collect()
+
+    assert sorted(snap) == ["a/web", "b/db", "b/web"]
+    assert snap["a/web"].docker_host == "a"
+    assert snap["b/web"].docker_host == "b"
+    assert pool.host_status() == [("a", 1, 0), ("b", 1, 0)]
+    assert pool.cache_hits_total == 2
+    assert pool.cache_misses_total == 4
+    assert pool.inspect_failures_total == 6
+
+
+async def test_pool_isolates_failing_host() -> None:
+    pool, fa, fb = _pool(retry_interval_seconds=5.0, host_timeout_seconds=0.05)
+    now = [1000.0]
+    pool._clock = lambda: now[0]
+    await pool.collect()
+
+    fa.hang = True
+    snap = await pool.collect()
+    assert snap["a/web"].stale_since > 0
+    assert snap["b/web"].stale_since == 0
+    assert pool.host_status() == [("a", 0, 1), ("b", 1, 0)]
+
+    # Backing off: the failed host is not retried before the delay.
+    fa.hang = False
+    now[0] += 4.0
+    await pool.collect()
+    assert fa.calls == 2
+    assert pool.hosts[0].up == 0
+
+    now[0] += 2.0
+    snap = await pool.collect()
+    assert fa.calls == 3
+    assert snap["a/web"].stale_since == 0
+    assert pool.host_status() == [("a", 1, 1), ("b", 1, 0)]
+    assert fb.calls == 4
+
+
+async def test_pool_does_not_wait_for_hung_host() -> None:
+    pool, fa, fb = _pool(host_timeout_seconds=30.0, refresh_wait_seconds=0.01)
+    await pool.collect()
+    fa.hang = True
+
+    await pool.collect()
+    fb.names.append("new")
+    snap = await pool.collect()
+
+    # The hung refresh stays in flight and is not restarted.
+    assert fa.calls == 2
+    assert fb.calls == 3
+    assert "b/new" in snap
+    assert "a/web" in snap
+
+    await pool.stop()
+    assert pool.hosts[0].task is None
+
+
+async def test_pool_backoff_is_exponential_and_bounded() -> None:
+    pool, fa, _ = _pool(retry_interval_seconds=5.0)
+    pool._clock = lambda: 0.0
+    fa.fail = True
+    host = pool.hosts[0]
+
+    delays = []
+    for _ in range(8):
+        host.next_attempt = 0.0
+        await pool.collect()
+        delays.append(host.next_attempt)
+
+    assert delays[:3] == [5.0, 10.0, 20.0]
+    assert delays[-1] == MAX_BACKOFF_SECONDS
+
+
+async def test_pool_raises_when_all_hosts_fail() -> None:
+    pool, fa, fb = _pool()
+    fa.fail = fb.fail = True
+
+    with pytest.raises(RuntimeError):
+        await pool.collect()
+    assert pool.host_status() == [("a", 0, 1), ("b", 0, 1)]
+
+
+async def test_pool_slow_first_refresh_is_not_a_failure() -> None:
+    pool, fa, fb = _pool(refresh_wait_seconds=0.01)
+    fa.hang = fb.hang = True
+
+    snap = await pool.collect()
+
+    assert snap == {}
+    assert pool.host_status() == [("a", 0, 0), ("b", 0, 0)]
+    await pool.stop()
+
+
+async def test_pool_tls_endpoints_use_https() -> None:
+    pool = CollectorPool(
+        hosts=(("a", "tcp://a:2376"), ("b", "unix:///var/run/docker.sock")),
+        ignore_list=set(),
+        include_label=None,
+        ssl_context=ssl.create_default_context(),
+    )
+    await pool.start()
+    try:
+        hosts = [h.collector.docker.docker_host for h in pool.hosts]
+    finally:
+        await pool.stop()
+
+    assert hosts[0] == "https://a:2376"
+    assert hosts[1].startswith("unix://")
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import subprocess
+import sys
+
+import pytest
+
+from docker_healthcheck_exporter.server import HttpServer, accepts_gzip, accepts_openmetrics
+
+
+class DummyState:
+    def __init__(self) -> None:
+        self.fresh_calls = 0
+
+    async def ensure_fresh(self) -> None:
+        self.fresh_calls += 1
+
+    def ready(self) -> bool:
+        return True
+
+    def metrics_bytes(self, openmetrics: bool = False) -> bytes:
+        return b"metrics-ok\n"
+
+    def metrics_gzip(self, openmetrics: bool = False) -> bytes:
+        return gzip.compress(self.metrics_bytes())
+
+
+def test_accepts_gzip() -> None:
+    assert accepts_gzip("gzip") is True
+    assert accepts_gzip("br, *") is True
+    assert accepts_gzip("gzip;q=0") is False
+    assert accepts_gzip("gzip;q=x") is False
+    assert accepts_gzip("identity") is False
+    assert accepts_gzip("") is False
+
+
+def test_accepts_openmetrics() -> None:
+    # Prometheus 2.x scrape Accept header
+    assert accepts_openmetrics(
+        "application/openmetrics-text;version=1.0.0,application/openmetrics-text;"
+        "version=0.0.1;q=0.75,text/plain;version=0.0.4;q=0.5,*/*;q=0.1"
+    )
+    assert accepts_openmetrics("application/openmetrics-text")
+    assert not accepts_openmetrics("application/openmetrics-text;version=0.0.1")
+    assert not accepts_openmetrics("text/plain;q=0.9,application/openmetrics-text;q=0.5")
+    assert not accepts_openmetrics("application/openmetrics-text;q=0")
+    assert not accepts_openmetrics("*/*")
+    assert not accepts_openmetrics("")
+
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple[str, dict[str, str], bytes]:
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    status, *lines = head.strip().split("\r\n")
+    headers = {k.lower(): v.strip() for k, _, v in (line.partition(":") for line in lines)}
+    body = await reader.readexactly(int(headers["content-length"]))
+    return status, headers, body
+
+
+async def test_builtin_server_serves_metrics_and_health() -> None:
+    state = DummyState()
+    server = HttpServer(state, "127.0.0.1", 0)  # type: ignore[arg-type]
+    await server.start()
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        # Several requests on one keep-alive connection.
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: x\r\n\r\n")
+        status, headers, body = await _read_response(reader)
+        assert status == "HTTP/1.1 200 OK"
+        assert body == b"metrics-ok\n"
+        assert headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+        assert "content-encoding" not in headers
+
+        writer.write(b"GET /metrics?x=1 HTTP/1.1\r\nAccept-Encoding: gzip\r\n\r\n")
+        status, headers, body = await _read_response(reader)
+        assert headers["content-encoding"] == "gzip"
+        assert gzip.decompress(body) == b"metrics-ok\n"
+
+        writer.write(b"GET /health HTTP/1.1\r\n\r\n")
+        assert (await _read_response(reader))[2] == b"{'status': 'ok'}"
+
+        writer.write(b"HEAD /metrics HTTP/1.1\r\n\r\n")
+        head = await reader.readuntil(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 200 OK")
+
+        writer.write(b"POST /metrics HTTP/1.1\r\n\r\n")
+        status, headers, _ = await _read_response(reader)
+        assert status == "HTTP/1.1 405 Method Not Allowed"
+
+        writer.write(b"GET /nope HTTP/1.1\r\nConnection: close\r\n\r\n")
+        status, headers, _ = await _read_response(reader)
+        assert status == "HTTP/1.1 404 Not Found"
+        assert headers["connection"] == "close"
+        assert await reader.read() == b""
+        writer.close()
+
+        assert state.fresh_calls == 3
+    finally:
+        await server.stop()
+
+
+# Peak RSS is read from /proc where possible: ru_maxrss survives execve on
+# Linux, so it would report the forking pytest process instead.
+_PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+try:
+    with open("/proc/self/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+except OSError:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss": rss,
+    "web_stack": sorted(m for m in ("fastapi", "starlette", "pydantic", "uvicorn") if m in sys.modules),
+}}))
+"""
+
+
+def _probe(module: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module)],
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=120,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="resource is POSIX only")
+def test_builtin_server_starts_lighter_than_fastapi() -> None:
+    builtin = [_probe("docker_healthcheck_exporter.server") for _ in range(3)]
+    fastapi = [_probe("docker_healthcheck_exporter.app") for _ in range(3)]
+
+    assert all(p["web_stack"] == [] for p in builtin)
+    assert "fastapi" in fastapi[0]["web_stack"]
+    assert min(p["rss"] for p in builtin) < min(p["rss"] for p in fastapi)
+    assert min(p["seconds"] for p in builtin) < min(p["seconds"] for p in fastapi)
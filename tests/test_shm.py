@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from docker_healthcheck_exporter.shm import _SEQ, SnapshotRegion
+
+
+def test_region_publish_and_read(tmp_path) -> None:
+    writer = SnapshotRegion.create(4096, directory=str(tmp_path))
+    reader = SnapshotRegion(writer.path, writer.size)
+    try:
+        assert reader.read() is None
+
+        writer.publish(7, b"{}", b"text", b"tgz", b"om", b"omgz")
+        first = reader.read()
+        assert first is not None
+        assert first.generation == 7
+        assert (bytes(first.text), bytes(first.openmetrics_gzip)) == (b"text", b"omgz")
+        # Unchanged region: the cached copy is returned without copying again.
+        assert reader.read() is first
+
+        writer.publish(8, b"{}", b"text2", b"", b"", b"")
+        second = reader.read()
+        assert second is not first
+        assert bytes(second.text) == b"text2"
+        # Earlier views stay valid after the region is overwritten.
+        assert bytes(first.text) == b"text"
+    finally:
+        reader.close()
+        writer.close()
+        writer.unlink()
+    assert not os.path.exists(writer.path)
+
+
+def test_region_reader_skips_torn_publish(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    writer = SnapshotRegion.create(4096, directory=str(tmp_path))
+    reader = SnapshotRegion(writer.path, writer.size)
+    try:
+        writer.publish(1, b"{}", b"old", b"", b"", b"")
+        old = reader.read()
+        # A writer stuck mid-publish leaves an odd sequence number.
+        seq = _SEQ.unpack_from(writer._mm, 0)[0]
+        _SEQ.pack_into(writer._mm, 0, seq + 1)
+        monkeypatch.setattr("docker_healthcheck_exporter.shm.READ_RETRIES", 3)
+        assert reader.read() is old
+    finally:
+        reader.close()
+        writer.close()
+        writer.unlink()
+
+
+def test_region_rejects_oversized_publish(tmp_path) -> None:
+    region = SnapshotRegion.create(128, directory=str(tmp_path))
+    try:
+        with pytest.raises(ValueError):
+            region.publish(1, b"", b"x" * 200, b"", b"", b"")
+        assert region.read() is None
+    finally:
+        region.close()
+        region.unlink()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from docker_healthcheck_exporter.collector import DockerCollector
+from docker_healthcheck_exporter.metrics import render_self_metrics
+from docker_healthcheck_exporter.stats import StatsSampler, _parse_stats
+
+PAYLOAD = {
+    "cpu_stats": {"cpu_usage": {"total_usage": 2_500_000_000}},
+    "memory_stats": {"usage": 1000, "limit": 4096, "stats": {"inactive_file": 200}},
+    "pids_stats": {"current": 7},
+}
+
+
+class FakeStatsDocker:
+    def __init__(self, slow: set[str] | None = None) -> None:
+        self.calls: list[tuple[str, dict]] = []
+        self.slow = slow or set()
+
+    async def _query_json(self, path: str, params: dict | None = None) -> dict:
+        cid = path.split("/")[1]
+        self.calls.append((cid, params or {}))
+        if cid in self.slow:
+            await asyncio.sleep(10)
+        if cid == "broken":
+            raise RuntimeError("boom")
+        return PAYLOAD
+
+
+def test_parse_stats() -> None:
+    s = _parse_stats(PAYLOAD, sampled_at=5.0)
+    assert s.cpu_seconds_total == 2.5
+    assert s.memory_usage_bytes == 800
+    assert s.memory_limit_bytes == 4096
+    assert s.pids == 7
+    assert s.sampled_at == 5.0
+
+    v1 = _parse_stats({"memory_stats": {"usage": 1000, "stats": {"total_inactive_file": 100}}}, 0)
+    assert v1.memory_usage_bytes == 900
+    assert _parse_stats({}, 0).cpu_seconds_total == 0.0
+
+
+async def test_sampler_rotates_and_prioritizes() -> None:
+    sampler = StatsSampler(budget_calls=4)
+    docker = FakeStatsDocker()
+    running = [(f"c{i}", False) for i in range(6)] + [
+        ("bad1", True),
+        ("bad2", True),
+        ("bad3", True),
+    ]
+
+    seen: list[set[str]] = []
+    for _ in range(4):
+        docker.calls.clear()
+        await sampler.sample(docker, running)  # type: ignore[arg-type]
+        seen.append({cid for cid, _ in docker.calls})
+        await asyncio.sleep(0.001)
+
+    assert all(len(s) == 4 for s in seen)
+    # Half of the budget goes to the unhealthy containers, the rest rotates.
+    assert all(len(s & {"bad1", "bad2", "bad3"}) >= 2 for s in seen)
+    assert set().union(*seen) >= {f"c{i}" for i in range(6)}
+    assert docker.calls[0][1] == {"stream": "false", "one-shot": "true"}
+
+    await sampler.sample(docker, [("c0", False)])  # type: ignore[arg-type]
+    assert set(sampler.samples) == {"c0"}
+
+
+async def test_sampler_respects_time_budget() -> None:
+    sampler = StatsSampler(budget_calls=3, budget_seconds=0.05)
+    docker = FakeStatsDocker(slow={"slow"})
+
+    await sampler.sample(docker, [("slow", False), ("ok", False), ("broken", False)])  # type: ignore[arg-type]
+
+    assert set(sampler.samples) == {"ok"}
+    assert sampler.failures_total == 2
+
+    text = render_self_metrics("h", 1, 0, 0.1, 1.0, stats_failures_total=sampler.failures_total)
+    assert 'docker_healthcheck_exporter_stats_failures_total{instance="h"} 2' in text
+    assert "stats_failures" not in render_self_metrics("h", 1, 0, 0.1, 1.0)
+
+
+@pytest.mark.parametrize("budget", [0, -1])
+def test_stats_disabled_without_budget(budget: int) -> None:
+    collector = DockerCollector(ignore_list=set(), include_label=None, stats_budget_calls=budget)
+    assert collector.stats is None
+    assert collector.stats_failures_total == 0
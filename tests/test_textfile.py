@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from docker_healthcheck_exporter.textfile import TextfileWriter
+
+
+@pytest.mark.asyncio
+async def test_writer_skips_unchanged_content(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = tmp_path / "sub" / "metrics.prom"
+    writer = TextfileWriter(str(path), fsync="dir")
+    writes: list[bytes] = []
+    original = writer._write
+
+    def counting_write(content: bytes) -> None:
+        writes.append(content)
+        original(content)
+
+    monkeypatch.setattr(writer, "_write", counting_write)
+
+    assert writer.submit(b"a 1\n") is True
+    await writer.flush()
+    assert writer.submit(b"a 1\n") is False
+    assert writer.submit(b"a 1\nage 5\n", fingerprint=b"a 1\n") is False
+    assert writer.submit(b"a 2\n") is True
+    await writer.flush()
+
+    assert writes == [b"a 1\n", b"a 2\n"]
+    assert path.read_bytes() == b"a 2\n"
+    assert not (tmp_path / "sub" / "metrics.prom.tmp").exists()
+
+
+@pytest.mark.asyncio
+async def test_writer_rewrites_after_max_age(tmp_path) -> None:
+    path = tmp_path / "metrics.prom"
+    writer = TextfileWriter(str(path), fsync="file", max_age_seconds=0.0)
+
+    assert writer.submit(b"x 1\n") is True
+    await writer.flush()
+    assert writer.submit(b"x 1\n") is True
+    await writer.flush()
+    assert path.read_bytes() == b"x 1\n"
+
+
+@pytest.mark.asyncio
+async def test_writer_coalesces_while_write_in_flight(tmp_path, monkeypatch) -> None:
+    writer = TextfileWriter(str(tmp_path / "metrics.prom"))
+    started = asyncio.Event()
+    release = asyncio.Event()
+    writes: list[bytes] = []
+    loop = asyncio.get_running_loop()
+
+    def slow_write(content: bytes) -> None:
+        loop.call_soon_threadsafe(started.set)
+        asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+        writes.append(content)
+
+    monkeypatch.setattr(writer, "_write", slow_write)
+
+    writer.submit(b"1\n")
+    await started.wait()
+    writer.submit(b"2\n")
+    writer.submit(b"3\n")
+    release.set()
+    await writer.flush()
+
+    assert writes == [b"1\n", b"3\n"]
+
+
+@pytest.mark.asyncio
+async def test_writer_logs_and_retries_after_error(tmp_path, monkeypatch) -> None:
+    writer = TextfileWriter(str(tmp_path / "metrics.prom"))
+
+    def failing_write(content: bytes) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(writer, "_write", failing_write)
+    writer.submit(b"1\n")
+    await writer.flush()
+
+    monkeypatch.delattr(writer, "_write")
+    assert writer.submit(b"1\n") is True
+    await writer.flush()
+    assert (tmp_path / "metrics.prom").read_bytes() == b"1\n"
+
+
+def test_writer_rejects_unknown_fsync_policy() -> None:
+    with pytest.raises(ValueError):
+        TextfileWriter("/tmp/x.prom", fsync="always")
+
+
+async def test_writer_write_raises_on_error(tmp_path) -> None:
+    writer = TextfileWriter(str(tmp_path / "missing-parent" / "x" / "m.prom"))
+    await writer.write(b"a 1\n")
+    assert (tmp_path / "missing-parent" / "x" / "m.prom").read_bytes() == b"a 1\n"
+    assert writer.submit(b"a 1\n") is False
+
+    (tmp_path / "dir.prom").mkdir()
+    with pytest.raises(OSError):
+        await TextfileWriter(str(tmp_path / "dir.prom")).write(b"a 1\n")
+
+
+async def test_writer_records_write_duration(tmp_path) -> None:
+    writer = TextfileWriter(str(tmp_path / "m.prom"))
+    writer.submit(b"a 1\n")
+    await writer.flush()
+    assert writer.instruments.phases["textfile_write"].count == 1
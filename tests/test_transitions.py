@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from docker_healthcheck_exporter.collector import ContainerStatus, ServiceStatus
+from docker_healthcheck_exporter.metrics import render_container_metrics
+from docker_healthcheck_exporter.transitions import TransitionTracker
+
+
+def _st(name: str, status: ServiceStatus) -> ContainerStatus:
+    return ContainerStatus(
+        name=name,
+        status=int(status),
+        status_text=status.name,
+        container_id=f"{name}-id",
+        image="img",
+        compose_project="",
+        compose_service="",
+    )
+
+
+def test_tracker_counts_transitions_and_state_since() -> None:
+    tracker = TransitionTracker()
+    healthy, unhealthy = _st("web", ServiceStatus.HEALTHY), _st("web", ServiceStatus.UNHEALTHY)
+
+    assert tracker.update({"web": healthy}, now=100.0) is True
+    assert tracker.update({"web": healthy}, now=105.0) is False
+    assert tracker.update({"web": unhealthy}, now=110.0) is True
+    assert tracker.update({"web": healthy}, now=115.0) is True
+    assert tracker.update({"web": unhealthy}, now=120.0) is True
+
+    web = tracker.tracked["web"]
+    assert web.since == 120.0
+    assert web.transitions == {("HEALTHY", "UNHEALTHY"): 2, ("UNHEALTHY", "HEALTHY"): 1}
+
+    text = render_container_metrics("h", {"web": unhealthy}, tracker.tracked)
+    labels = 'instance="h",name="web",container_id="web-id"'
+    assert f"docker_container_health_status_since_timestamp_seconds{{{labels}}} 120.0" in text
+    assert (
+        f'docker_container_health_transitions_total{{{labels},from="HEALTHY",to="UNHEALTHY"}} 2'
+        in text
+    )
+
+
+def test_tracker_keeps_removed_containers_for_retention() -> None:
+    tracker = TransitionTracker(retention_seconds=60.0)
+    tracker.update({"web": _st("web", ServiceStatus.HEALTHY)}, now=0.0)
+    tracker.update({"web": _st("web", ServiceStatus.CRIT)}, now=1.0)
+
+    assert tracker.update({}, now=10.0) is True
+    assert tracker.tracked["web"].removed_at == 10.0
+    text = render_container_metrics("h", {}, tracker.tracked)
+    assert "transitions_total" in text and "since_timestamp_seconds{" not in text
+
+    # Coming back within the retention keeps the counters.
+    tracker.update({"web": _st("web", ServiceStatus.CRIT)}, now=20.0)
+    assert tracker.tracked["web"].removed_at == 0.0
+    assert sum(tracker.tracked["web"].transitions.values()) == 1
+
+    tracker.update({}, now=30.0)
+    assert tracker.update({}, now=89.0) is False
+    assert tracker.update({}, now=90.0) is True
+    assert tracker.tracked == {}
+
+
+def test_tracker_is_bounded() -> None:
+    tracker = TransitionTracker(max_tracked=2)
+    tracker.update({"a": _st("a", ServiceStatus.HEALTHY)}, now=0.0)
+    tracker.update({"b": _st("b", ServiceStatus.HEALTHY)}, now=1.0)
+    tracker.update({"c": _st("c", ServiceStatus.HEALTHY)}, now=2.0)
+
+    assert set(tracker.tracked) == {"b", "c"}
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import multiprocessing as mp
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+from benchmarks.fake_engine import EngineConfig, serve
+from docker_healthcheck_exporter.server import HttpServer
+from docker_healthcheck_exporter.shm import SnapshotRegion
+from docker_healthcheck_exporter.workers import SharedSnapshot
+
+
+async def test_shared_snapshot_serves_published_metrics(tmp_path) -> None:
+    region = SnapshotRegion.create(4096, directory=str(tmp_path))
+    shared = SharedSnapshot(SnapshotRegion(region.path, region.size))
+    assert shared.ready() is False
+
+    server = HttpServer(shared, "127.0.0.1", 0)
+    await server.start()
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\n\r\n")
+        before = (await reader.readuntil(b"\r\n\r\n")).decode()
+        length = int(before.split("Content-Length: ")[1].split("\r\n")[0])
+        await reader.readexactly(length)
+
+        meta = json.dumps({"instance_name": "h", "last_ok_ts": time.time() - 3}).encode()
+        region.publish(
+            1,
+            meta,
+            b"text 1\n",
+            gzip.compress(b"text 1\n"),
+            b"om 1\n",
+            gzip.compress(b"om 1\n"),
+        )
+        writer.write(b"GET /metrics HTTP/1.1\r\nAccept: application/openmetrics-text\r\n\r\n")
+        head = (await reader.readuntil(b"\r\n\r\n")).decode()
+        length = int(head.split("Content-Length: ")[1].split("\r\n")[0])
+        body = await reader.readexactly(length)
+        writer.close()
+    finally:
+        await server.stop()
+        region.close()
+        region.unlink()
+
+    assert before.startswith("HTTP/1.1 503 ")
+    assert head.startswith("HTTP/1.1 200 ")
+    assert "application/openmetrics-text" in head
+    assert body.startswith(b"# HELP docker_healthcheck_exporter_snapshot_age_seconds")
+    assert b'docker_healthcheck_exporter_snapshot_age_seconds{instance="h"} 3.' in body
+    assert body.endswith(b"om 1\n# EOF\n")
+    text = gzip.decompress(b"".join(shared.metrics_gzip()))
+    assert text.endswith(b"text 1\n")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str, accept: str = "") -> bytes:
+    req = urllib.request.Request(url, headers={"Accept": accept} if accept else {})
+    with urllib.request.urlopen(req, timeout=5) as resp:
+        return resp.read()
+
+
+@pytest.mark.skipif(not hasattr(socket, "SO_REUSEPORT"), reason="needs SO_REUSEPORT")
+def test_http_workers_serve_collector_process(tmp_path) -> None:
+    socket_path = str(tmp_path / "docker.sock")
+    engine = mp.get_context("spawn").Process(
+        target=serve, args=(socket_path, EngineConfig(containers=5)), daemon=True
+    )
+    engine.start()
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DOCKER_HOST": f"unix://{socket_path}",
+        "LISTEN": f"127.0.0.1:{port}",
+        "INSTANCE_NAME": "workers",
+        "SERVICES_IGNORE_LIST": "none",
+        "REFRESH_INTERVAL_SECONDS": "1",
+        "HTTP_WORKERS": "2",
+    }
+    proc = None
+    try:
+        deadline = time.monotonic() + 30
+        while not os.path.exists(socket_path):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        proc = subprocess.Popen([sys.executable, "-m", "docker_healthcheck_exporter"], env=env)
+        body = b""
+        while b"docker_container_health_status{" not in body:
+            assert time.monotonic() < deadline, body
+            try:
+                body = _get(f"http://127.0.0.1:{port}/metrics")
+            except OSError:
+                time.sleep(0.1)
+        assert b'docker_healthcheck_exporter_up{instance="workers"} 1' in body
+        assert b"docker_healthcheck_exporter_snapshot_age_seconds{" in body
+        om = _get(f"http://127.0.0.1:{port}/metrics", accept="application/openmetrics-text")
+        assert om.endswith(b"# EOF\n")
+
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=20) == 0
+    finally:
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+        engine.terminate()
+        engine.join(5)